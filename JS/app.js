@@ -103,7 +103,7 @@ async function predict() {
     const response = await fetch(`${API_URL}/predict_api`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(formData)
+      body: JSON.stringify({ ...formData, explain: true })
     });
 
     const result = await response.json();
@@ -120,7 +120,8 @@ async function predict() {
         prediction: result.prediction,
         score: result.risk_score,
         date: new Date().toLocaleDateString(),
-        details: formData // Save all inputs for the report
+        details: formData, // Save all inputs for the report
+        explanation: result.explanation
       };
 
       // Save for Result Page
@@ -138,85 +139,311 @@ async function predict() {
   }
 }
 
+/* --- Records API --- */
+// Dates are stored as YYYY-MM-DD; show them as MM/DD/YYYY like before
+function formatDate(iso) {
+  const m = /^(\d{4})-(\d{2})-(\d{2})$/.exec(iso || '');
+  return m ? `${m[2]}/${m[3]}/${m[1]}` : iso;
+}
+
+// Filters are applied server-side: patient, risk ('high'|'low'), date_from, date_to, cursor, limit
+async function fetchRecordsPage(params = {}) {
+  const query = new URLSearchParams(params).toString();
+  const response = await fetch(`${API_URL}/get_records${query ? '?' + query : ''}`);
+  const records = await response.json();
+  records.forEach(r => r.date = formatDate(r.date));
+  return { records: records, nextCursor: response.headers.get('X-Next-Cursor'), changeId: response.headers.get('X-Change-Id') };
+}
+
+async function fetchRecords(params = {}) {
+  return (await fetchRecordsPage(params)).records;
+}
+
+/* --- Live updates --- */
+// Builds a DOM element: el('div', { style: '...', onclick: fn }, child, 'text', ...).
+// Strings are added as text nodes, so names and reasons are never parsed as HTML.
+function el(tag, attrs = {}, ...children) {
+  const node = document.createElement(tag);
+  for (const [key, value] of Object.entries(attrs)) {
+    if (key === 'style') node.style.cssText = value;
+    else if (key.startsWith('on')) node.addEventListener(key.slice(2), value);
+    else node.setAttribute(key, value);
+  }
+  children.flat().forEach(child => {
+    if (child !== null && child !== undefined && child !== false) node.append(child);
+  });
+  return node;
+}
+
+function icon(className, style) {
+  return el('i', style ? { class: className, style: style } : { class: className });
+}
+
+function messageBlock(text, extraStyle = '') {
+  return el('div', { style: `text-align: center; ${extraStyle}color: var(--text-light); padding: 20px;` }, text);
+}
+
+// Keeps a container in step with a set of rows keyed by id. Each row's node is built once and
+// reused, so a delta from /changes only builds nodes for the rows that actually changed.
+class LiveList {
+  constructor(container, options) {
+    this.container = container;
+    this.render = options.render;                  // row -> DOM node
+    this.compare = options.compare;                // display order
+    this.accept = options.accept || (() => true);  // (row, known) -> does this view show it?
+    this.empty = options.empty;                    // () -> node shown when there are no rows
+    this.onChange = options.onChange || (() => { });
+    this.rows = new Map();
+    this.nodes = new Map();
+  }
+
+  set(rows, append = false) {
+    if (!append) {
+      this.rows.clear();
+      this.nodes.clear();
+    }
+    rows.forEach(row => {
+      this.rows.set(row.id, row);
+      this.nodes.delete(row.id);
+    });
+    this.draw();
+  }
+
+  // change: { op: 'upsert' | 'delete', row_id, row } as sent by /changes
+  apply(change) {
+    if (change.op === 'upsert' && this.accept(change.row, this.rows.has(change.row_id))) {
+      this.rows.set(change.row_id, change.row);
+    } else if (!this.rows.delete(change.row_id)) {
+      return;
+    }
+    this.nodes.delete(change.row_id);
+    this.draw();
+  }
+
+  // Rebuilds the nodes of rows whose rendering depends on data that arrived later
+  refresh(ids) {
+    ids.forEach(id => this.nodes.delete(id));
+    this.draw();
+  }
+
+  values() {
+    return [...this.rows.values()].sort(this.compare);
+  }
+
+  draw() {
+    const rows = this.values();
+    const nodes = rows.map(row => {
+      let node = this.nodes.get(row.id);
+      if (!node) {
+        node = this.render(row);
+        this.nodes.set(row.id, node);
+      }
+      return node;
+    });
+    this.container.replaceChildren(...(nodes.length ? nodes : [this.empty()]));
+    this.onChange(rows);
+  }
+}
+
+// Follows /changes from `since` (the X-Change-Id of the initial load) and passes each delta to
+// handlers[table]. On "reset" (too far behind for deltas) handlers.reset should reload instead.
+// EventSource reconnects by itself and resumes from the last event id it received.
+function subscribeChanges(params, since, handlers) {
+  if (!window.EventSource) return null;
+  const query = new URLSearchParams(since ? { ...params, since: since } : params).toString();
+  const source = new EventSource(`${API_URL}/changes?${query}`);
+  source.addEventListener('changes', event => {
+    JSON.parse(event.data).forEach(change => {
+      if (handlers[change.table]) handlers[change.table](change);
+    });
+  });
+  source.addEventListener('reset', () => {
+    if (handlers.reset) handlers.reset();
+  });
+  return source;
+}
+
+/* --- Dashboard Stats (served pre-aggregated by /stats) --- */
+async function loadStats() {
+  try {
+    const response = await fetch(`${API_URL}/stats`);
+    const stats = await response.json();
+
+    const totalCount = document.getElementById('totalPatients');
+    const highCount = document.getElementById('highRiskCount');
+    const lowCount = document.getElementById('lowRiskCount');
+    const predictionsMade = document.getElementById('predictionsMade');
+
+    if (totalCount) totalCount.innerText = stats.total;
+    if (highCount) highCount.innerText = stats.high_risk;
+    if (lowCount) lowCount.innerText = stats.low_risk;
+    if (predictionsMade) predictionsMade.innerText = stats.total;
+  } catch (error) {
+    console.error("Error fetching stats:", error);
+  }
+}
+
 /* --- Load Records (for records.html) --- */
-async function loadRecords() {
+const RECORDS_PAGE_SIZE = 50;
+let recordsNextCursor = null;
+let recordsList = null;
+
+function loadMoreRecords() {
+  if (recordsNextCursor) loadRecords(true);
+}
+
+/* --- Explanations --- */
+const FEATURE_LABELS = {
+  age: 'Age', sex: 'Sex', cp: 'Chest pain type', trestbps: 'Resting blood pressure', chol: 'Cholesterol',
+  fbs: 'Fasting blood sugar', restecg: 'Resting ECG', thalach: 'Max heart rate', exang: 'Exercise angina',
+  oldpeak: 'ST depression'
+};
+
+// explanation.contributions sorted by how much they moved the score, largest first
+function topContributions(explanation, count) {
+  return Object.entries(explanation.contributions)
+    .sort((a, b) => Math.abs(b[1]) - Math.abs(a[1]))
+    .slice(0, count)
+    .map(([feature, points]) => ({ feature, label: FEATURE_LABELS[feature] || feature, points }));
+}
+
+function formatPoints(points) {
+  return `${points > 0 ? '+' : ''}${points.toFixed(1)}`;
+}
+
+// Explanations of records by id, fetched in one /explain_records call per page of rows
+const recordExplanations = new Map();
+
+async function loadRecordExplanations(ids) {
+  const missing = ids.filter(id => !recordExplanations.has(id));
+  if (missing.length === 0) return;
+  try {
+    const response = await fetch(`${API_URL}/explain_records?ids=${missing.join(',')}`);
+    const data = await response.json();
+    if (data.error) throw new Error(data.error);
+    missing.forEach(id => recordExplanations.set(id, data[id] || null));
+    if (recordsList) recordsList.refresh(missing);
+  } catch (error) {
+    console.error("Error fetching explanations:", error);
+  }
+}
+
+function keyFactorCell(id) {
+  if (!recordExplanations.has(id)) return el('td', { style: 'color: var(--text-light);' }, '...');
+  const explanation = recordExplanations.get(id);
+  if (!explanation) return el('td', { style: 'color: var(--text-light);' }, '-');
+  const top = topContributions(explanation, 1)[0];
+  return el('td', { title: 'Contribution to the risk score in points' },
+    `${top.label} `, el('span', { style: `color: ${top.points > 0 ? '#DC2626' : '#059669'};` }, formatPoints(top.points)));
+}
+
+function recordRow(r) {
+  const riskBadge = r.score > 50
+    ? el('span', { class: 'status-tag tag-high' }, 'High Risk')
+    : el('span', { class: 'status-tag tag-low' }, 'Low Risk');
+  const buttonStyle = 'border: none; color: white; padding: 6px 15px; border-radius: 6px; cursor: pointer; font-size: 0.9rem; display: flex; align-items: center; gap: 5px;';
+
+  return el('tr', {},
+    el('td', {},
+      el('div', { style: 'display: flex; align-items: center; gap: 10px;' },
+        el('div', { style: 'width: 35px; height: 35px; background: #E0F7FA; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: var(--primary);' },
+          icon('far fa-user')),
+        r.name)),
+    el('td', {}, `${r.age} yrs`),
+    el('td', {}, r.sex),
+    el('td', {}, riskBadge),
+    el('td', {}, `${r.score}%`),
+    el('td', {}, r.date),
+    keyFactorCell(r.id),
+    el('td', { style: 'display: flex; gap: 8px;' },
+      el('button', { style: 'background: #10B981; ' + buttonStyle, onclick: () => viewRecord(r.id) },
+        icon('fas fa-eye'), ' View'),
+      // Prescription Button
+      el('button', { style: 'background: var(--primary); ' + buttonStyle, onclick: () => openPrescriptionModal(r.patient_username, r.name) },
+        icon('fas fa-pills'), ' Rx')));
+}
+
+function tableMessage(text) {
+  return el('tr', {}, el('td', { colspan: '8', class: 'text-center' }, text));
+}
+
+async function loadRecords(append = false) {
   const tableBody = document.getElementById('recordsTable');
   if (!tableBody) return; // Not on records page
+  if (append !== true) append = false; // Also used directly as a DOMContentLoaded listener
+
+  const role = localStorage.getItem('currentRole');
+  const user = localStorage.getItem('currentUser');
+
+  if (!recordsList) {
+    recordsList = new LiveList(tableBody, {
+      render: recordRow,
+      compare: (a, b) => b.id - a.id,
+      // Patients only see their own records; a doctor's list takes new records on top and
+      // updates to the ones already loaded (older pages come from "load more")
+      accept: (r, known) => role === 'Patient'
+        ? r.patient_username === user
+        : known || recordsList.rows.size === 0 || r.id > Math.max(...recordsList.rows.keys()),
+      empty: () => tableMessage('No records found.'),
+      onChange: rows => {
+        // Save globally so viewRecord doesn't need to re-fetch
+        window.loadedPatientRecords = rows;
+        // A patient's own history is small, the doctor's totals come from /stats
+        if (role === 'Patient') {
+          const highCount = document.getElementById('highRiskCount');
+          const lowCount = document.getElementById('lowRiskCount');
+          if (highCount) highCount.innerText = rows.filter(r => r.score > 50).length;
+          if (lowCount) lowCount.innerText = rows.filter(r => r.score <= 50).length;
+        }
+      }
+    });
+  }
 
   try {
-    const response = await fetch(`${API_URL}/get_records`);
-    let records = await response.json();
+    // Patients only ever see their own records; doctors page through everything
+    let page;
+    if (role === 'Patient') {
+      page = await fetchRecordsPage({ patient: user });
+    } else {
+      const params = { limit: RECORDS_PAGE_SIZE };
+      if (append) params.cursor = recordsNextCursor;
+      page = await fetchRecordsPage(params);
+    }
+    recordsNextCursor = role === 'Patient' ? null : page.nextCursor;
 
-    const role = localStorage.getItem('currentRole');
-    const user = localStorage.getItem('currentUser');
+    const loadMoreBtn = document.getElementById('loadMoreRecords');
+    if (loadMoreBtn) loadMoreBtn.style.display = recordsNextCursor ? 'inline-flex' : 'none';
 
-    // Filter specifically for patients
     if (role === 'Patient') {
-      records = records.filter(r => r.patient_username === user);
       // Hide doctor metrics
       const doctorBadges = document.querySelectorAll('.badge-pill');
       if (doctorBadges.length > 0) doctorBadges[0].style.display = 'none';
 
       const totalPatientsCard = document.getElementById('totalPatientsCard');
       if (totalPatientsCard) totalPatientsCard.style.display = 'none';
+    } else if (!append) {
+      loadStats();
     }
 
-    // Save globally so viewRecord doesn't need to re-fetch
-    window.loadedPatientRecords = records;
-
-    const totalCount = document.getElementById('totalPatients');
-    const highCount = document.getElementById('highRiskCount');
-    const lowCount = document.getElementById('lowRiskCount');
-
-    // Update Stats
-    if (totalCount) totalCount.innerText = records.length;
-    if (highCount) highCount.innerText = records.filter(r => r.score > 50).length;
-    if (lowCount) lowCount.innerText = records.filter(r => r.score <= 50).length;
-
-    // Clear and Populate Table
-    tableBody.innerHTML = '';
-
-    if (records.length === 0) {
-      tableBody.innerHTML = '<tr><td colspan="7" class="text-center">No records found.</td></tr>';
-      return;
+    recordsList.set(page.records, append);
+    loadRecordExplanations(page.records.map(r => r.id));
+
+    if (!append && !recordsList.source) {
+      recordsList.source = subscribeChanges(role === 'Patient' ? { tables: 'records', patient: user } : { tables: 'records' }, page.changeId, {
+        records: change => {
+          if (change.row) change.row.date = formatDate(change.row.date);
+          // A rescore or edit can change what drives the score
+          recordExplanations.delete(change.row_id);
+          recordsList.apply(change);
+          if (recordsList.rows.has(change.row_id)) loadRecordExplanations([change.row_id]);
+          if (role !== 'Patient') loadStats();
+        },
+        reset: () => loadRecords()
+      });
     }
-
-    records.forEach(r => {
-      const riskBadge = r.score > 50
-        ? '<span class="status-tag tag-high">High Risk</span>'
-        : '<span class="status-tag tag-low">Low Risk</span>';
-
-      const row = `
-            <tr>
-                <td>
-                    <div style="display: flex; align-items: center; gap: 10px;">
-                        <div style="width: 35px; height: 35px; background: #E0F7FA; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: var(--primary);">
-                            <i class="far fa-user"></i>
-                        </div>
-                        ${r.name}
-                    </div>
-                </td>
-                <td>${r.age} yrs</td>
-                <td>${r.sex}</td>
-                <td>${riskBadge}</td>
-                <td>${r.score}%</td>
-                <td>${r.date}</td>
-                <td style="display: flex; gap: 8px;">
-                    <button onclick="viewRecord(${r.id})" style="border: none; background: #10B981; color: white; padding: 6px 15px; border-radius: 6px; cursor: pointer; font-size: 0.9rem; display: flex; align-items: center; gap: 5px;">
-                        <i class="fas fa-eye"></i> View
-                    </button>
-                    <!-- Prescription Button -->
-                    <button onclick="openPrescriptionModal('${r.patient_username}', '${r.name}')" style="border: none; background: var(--primary); color: white; padding: 6px 15px; border-radius: 6px; cursor: pointer; font-size: 0.9rem; display: flex; align-items: center; gap: 5px;">
-                        <i class="fas fa-pills"></i> Rx
-                    </button>
-                </td>
-            </tr>
-        `;
-      tableBody.innerHTML += row;
-    });
   } catch (error) {
     console.error("Error fetching records:", error);
-    tableBody.innerHTML = '<tr><td colspan="7" class="text-center">Failed to fetch records. Make sure the server is running.</td></tr>';
+    tableBody.replaceChildren(tableMessage('Failed to fetch records. Make sure the server is running.'));
   }
 }
 
@@ -242,9 +469,7 @@ async function loadPatientDashboard() {
   if (!loggedInUser) return;
 
   try {
-    const response = await fetch(`${API_URL}/get_records`);
-    const allRecords = await response.json();
-    const myRecords = allRecords.filter(r => r.patient_username === loggedInUser);
+    const myRecords = await fetchRecords({ patient: loggedInUser });
 
     if (myRecords.length > 0) {
       const latest = myRecords[0];
@@ -465,9 +690,7 @@ async function scheduleAppointment() {
   // Find patient name from records or set to default
   let patient_name = 'Patient';
   try {
-    const response = await fetch(`${API_URL}/get_records`);
-    const records = await response.json();
-    const myRecs = records.filter(r => r.patient_username === patient_username);
+    const myRecs = await fetchRecords({ patient: patient_username, limit: 1 });
     if (myRecs.length > 0) patient_name = myRecs[0].name;
   } catch (e) { }
 
@@ -557,128 +780,113 @@ async function submitPrescription() {
   }
 }
 
+function prescriptionCard(p) {
+  return el('div', { style: 'padding: 15px; border: 1px solid var(--border); border-radius: 8px; background: #fff4f4; border-left: 4px solid #EF4444; margin-bottom: 5px;' },
+    el('div', { style: 'display: flex; justify-content: space-between; align-items: flex-start;' },
+      el('div', {},
+        el('strong', { style: 'color: #B91C1C; font-size: 1.1rem; display: flex; align-items: center; gap: 8px;' },
+          icon('fas fa-capsules'), ` ${p.medication}`),
+        el('div', { style: 'color: var(--text-main); font-size: 0.95rem; margin-top: 5px;' }, el('strong', {}, 'Dosage:'), ` ${p.dosage}`),
+        el('div', { style: 'color: var(--text-main); font-size: 0.95rem; margin-top: 2px;' }, el('strong', {}, 'Frequency:'), ` ${p.frequency}`),
+        el('div', { style: 'color: var(--text-light); font-size: 0.8rem; margin-top: 8px;' }, `Prescribed on: ${formatDate(p.date)}`)),
+      el('span', { style: 'background: white; padding: 4px 8px; border-radius: 4px; border: 1px solid #FECACA; font-size: 0.8rem; color: #DC2626;' }, 'Active')));
+}
+
 async function loadPrescriptions() {
   const container = document.getElementById('patientPrescriptionsContainer');
   if (!container) return; // Only on patient dashboard
 
   const user = localStorage.getItem('currentUser');
+  const list = new LiveList(container, {
+    render: prescriptionCard,
+    compare: (a, b) => b.id - a.id,
+    empty: () => messageBlock('No current medications.')
+  });
+
+  const reload = async () => {
+    const response = await fetch(`${API_URL}/get_prescriptions?${new URLSearchParams({ patient: user })}`);
+    list.set(await response.json());
+    return response.headers.get('X-Change-Id');
+  };
 
   try {
-    const response = await fetch(`${API_URL}/get_prescriptions`);
-    const allPrescriptions = await response.json();
-
-    const myPrescriptions = allPrescriptions.filter(p => p.patient_username === user);
-
-    container.innerHTML = '';
-
-    if (myPrescriptions.length === 0) {
-      container.innerHTML = '<div style="text-align: center; color: var(--text-light); padding: 20px;">No current medications.</div>';
-      return;
-    }
-
-    myPrescriptions.forEach(p => {
-      container.innerHTML += `
-        <div style="padding: 15px; border: 1px solid var(--border); border-radius: 8px; background: #fff4f4; border-left: 4px solid #EF4444; margin-bottom: 5px;">
-          <div style="display: flex; justify-content: space-between; align-items: flex-start;">
-            <div>
-              <strong style="color: #B91C1C; font-size: 1.1rem; display: flex; align-items: center; gap: 8px;">
-                <i class="fas fa-capsules"></i> ${p.medication}
-              </strong>
-              <div style="color: var(--text-main); font-size: 0.95rem; margin-top: 5px;"><strong>Dosage:</strong> ${p.dosage}</div>
-              <div style="color: var(--text-main); font-size: 0.95rem; margin-top: 2px;"><strong>Frequency:</strong> ${p.frequency}</div>
-              <div style="color: var(--text-light); font-size: 0.8rem; margin-top: 8px;">Prescribed on: ${p.date}</div>
-            </div>
-            <span style="background: white; padding: 4px 8px; border-radius: 4px; border: 1px solid #FECACA; font-size: 0.8rem; color: #DC2626;">Active</span>
-          </div>
-        </div>
-      `;
+    const since = await reload();
+    subscribeChanges({ tables: 'prescriptions', patient: user }, since, {
+      prescriptions: change => list.apply(change),
+      reset: () => reload().catch(error => console.error("Reload prescriptions error:", error))
     });
-
   } catch (error) {
     console.error("Fetch prescriptions error:", error);
-    container.innerHTML = '<div style="text-align: center; color: var(--text-light); padding: 20px;">Failed to load medications.</div>';
+    container.replaceChildren(messageBlock('Failed to load medications.'));
   }
 }
 
+function patientAppointmentCard(app) {
+  return el('div', { style: 'padding: 15px; border: 1px solid var(--border); border-radius: 8px; background: #f8fafc;' },
+    el('div', { style: 'display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;' },
+      el('strong', { style: 'color: var(--secondary);' }, icon('far fa-calendar-alt'), ` ${app.appointment_date} at ${app.appointment_time}`),
+      el('span', { style: 'background: #E0F7FA; color: var(--primary); padding: 5px 10px; border-radius: 20px; font-size: 0.8rem; font-weight: 600;' }, app.status || 'Scheduled')),
+    app.mobile && el('div', { style: 'font-size: 0.95rem; color: var(--text-main); margin-bottom: 5px;' },
+      icon('fas fa-phone', 'color: var(--primary); width: 20px;'), ` ${app.mobile}`),
+    el('div', { style: 'font-size: 0.95rem; color: var(--text-main);' }, el('strong', {}, 'Reason:'), ` ${app.reason}`));
+}
+
+function doctorAppointmentCard(app) {
+  const line = 'margin-bottom: 10px; font-size: 0.95rem; color: var(--text-main);';
+  const lineIcon = 'color: var(--primary); width: 20px;';
+  return el('div', { style: 'padding: 20px; border: 1px solid var(--border); border-radius: 12px; background: white; box-shadow: 0 4px 15px rgba(0,0,0,0.03);' },
+    el('h4', { style: 'color: var(--secondary); margin-bottom: 15px; display: flex; align-items: center; gap: 10px;' },
+      el('div', { style: 'width: 30px; height: 30px; background: #E0F7FA; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: var(--primary);' },
+        icon('far fa-user')),
+      app.patient_name),
+    el('div', { style: line }, icon('far fa-calendar-alt', lineIcon), ` ${app.appointment_date}`),
+    el('div', { style: line }, icon('far fa-clock', lineIcon), ` ${app.appointment_time}`),
+    app.mobile && el('div', { style: line }, icon('fas fa-phone', lineIcon), ` ${app.mobile}`),
+    el('div', { style: 'font-size: 0.9rem; color: var(--text-light); background: #f8fafc; padding: 10px; border-radius: 6px; margin-top: 15px;' },
+      el('strong', {}, 'Reason:'), ` ${app.reason}`));
+}
+
 async function loadAppointments() {
   const role = localStorage.getItem('currentRole');
   const user = localStorage.getItem('currentUser');
-
-  const patientContainer = document.getElementById('patientAppointmentsContainer');
-  const doctorContainer = document.getElementById('doctorAppointmentsContainer');
+  if (role !== 'Patient' && role !== 'Doctor') return;
+
+  const isPatient = role === 'Patient';
+  const container = document.getElementById(isPatient ? 'patientAppointmentsContainer' : 'doctorAppointmentsContainer');
+  if (!container) return;
+  const messageStyle = isPatient ? '' : 'grid-column: 1 / -1; ';
+
+  // The server joins in each patient's mobile number (with_contact) and filters to the patient
+  const filter = isPatient ? { patient: user } : {};
+  const list = new LiveList(container, {
+    render: isPatient ? patientAppointmentCard : doctorAppointmentCard,
+    // Closest date first
+    compare: (a, b) => a.appointment_date.localeCompare(b.appointment_date) || a.appointment_time.localeCompare(b.appointment_time) || a.id - b.id,
+    empty: () => messageBlock('No upcoming appointments.', messageStyle)
+  });
+
+  const reload = async () => {
+    const response = await fetch(`${API_URL}/get_appointments?${new URLSearchParams({ ...filter, with_contact: 1 })}`);
+    list.set(await response.json());
+    return response.headers.get('X-Change-Id');
+  };
 
   try {
-    // We fetch records to get the mobile number of the patients
-    let recordsData = [];
-    try {
-      const recRes = await fetch(`${API_URL}/get_records`);
-      recordsData = await recRes.json();
-    } catch (e) { }
-
-    const response = await fetch(`${API_URL}/get_appointments`);
-    let appointments = await response.json();
-
-    if (role === 'Patient') {
-      appointments = appointments.filter(a => a.patient_username === user);
-      if (patientContainer) {
-        patientContainer.innerHTML = '';
-        if (appointments.length === 0) {
-          patientContainer.innerHTML = '<div style="text-align: center; color: var(--text-light); padding: 20px;">No upcoming appointments.</div>';
-        } else {
-          appointments.forEach(app => {
-            // Find patient's mobile number
-            const matchingRecords = recordsData.filter(r => r.patient_username === app.patient_username);
-            let mobileDisplay = "";
-            if (matchingRecords.length > 0 && matchingRecords[0].details && matchingRecords[0].details.mobile) {
-              mobileDisplay = `<div style="font-size: 0.95rem; color: var(--text-main); margin-bottom: 5px;"><i class="fas fa-phone" style="color: var(--primary); width: 20px;"></i> ${matchingRecords[0].details.mobile}</div>`;
-            }
-
-            patientContainer.innerHTML += `
-              <div style="padding: 15px; border: 1px solid var(--border); border-radius: 8px; background: #f8fafc;">
-                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;">
-                  <strong style="color: var(--secondary);"><i class="far fa-calendar-alt"></i> ${app.appointment_date} at ${app.appointment_time}</strong>
-                  <span style="background: #E0F7FA; color: var(--primary); padding: 5px 10px; border-radius: 20px; font-size: 0.8rem; font-weight: 600;">${app.status || 'Scheduled'}</span>
-                </div>
-                ${mobileDisplay}
-                <div style="font-size: 0.95rem; color: var(--text-main);"><strong>Reason:</strong> ${app.reason}</div>
-              </div>
-            `;
-          });
-        }
-      }
-    } else if (role === 'Doctor') {
-      if (doctorContainer) {
-        doctorContainer.innerHTML = '';
-        if (appointments.length === 0) {
-          doctorContainer.innerHTML = '<div style="text-align: center; grid-column: 1 / -1; color: var(--text-light); padding: 20px;">No upcoming appointments.</div>';
-        } else {
-          appointments.forEach(app => {
-            // Find patient's mobile number
-            const matchingRecords = recordsData.filter(r => r.patient_username === app.patient_username);
-            let mobileDisplay = "";
-            if (matchingRecords.length > 0 && matchingRecords[0].details && matchingRecords[0].details.mobile) {
-              mobileDisplay = `<div style="margin-bottom: 10px; font-size: 0.95rem; color: var(--text-main);"><i class="fas fa-phone" style="color: var(--primary); width: 20px;"></i> ${matchingRecords[0].details.mobile}</div>`;
-            }
-
-            doctorContainer.innerHTML += `
-              <div style="padding: 20px; border: 1px solid var(--border); border-radius: 12px; background: white; box-shadow: 0 4px 15px rgba(0,0,0,0.03);">
-                <h4 style="color: var(--secondary); margin-bottom: 15px; display: flex; align-items: center; gap: 10px;">
-                  <div style="width: 30px; height: 30px; background: #E0F7FA; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: var(--primary);"><i class="far fa-user"></i></div>
-                  ${app.patient_name}
-                </h4>
-                <div style="margin-bottom: 10px; font-size: 0.95rem; color: var(--text-main);"><i class="far fa-calendar-alt" style="color: var(--primary); width: 20px;"></i> ${app.appointment_date}</div>
-                <div style="margin-bottom: 10px; font-size: 0.95rem; color: var(--text-main);"><i class="far fa-clock" style="color: var(--primary); width: 20px;"></i> ${app.appointment_time}</div>
-                ${mobileDisplay}
-                <div style="font-size: 0.9rem; color: var(--text-light); background: #f8fafc; padding: 10px; border-radius: 6px; margin-top: 15px;"><strong>Reason:</strong> ${app.reason}</div>
-              </div>
-            `;
-          });
-        }
-      }
-    }
+    const since = await reload();
+    subscribeChanges({ ...filter, tables: 'appointments,records' }, since, {
+      appointments: change => list.apply(change),
+      // A new record may carry a new mobile number for patients with appointments
+      records: change => {
+        const r = change.row;
+        if (!r || !r.details || !r.details.mobile) return;
+        list.values()
+          .filter(app => app.patient_username === r.patient_username && app.mobile !== r.details.mobile)
+          .forEach(app => list.apply({ op: 'upsert', row_id: app.id, row: { ...app, mobile: r.details.mobile } }));
+      },
+      reset: () => reload().catch(error => console.error("Reload appointments error:", error))
+    });
   } catch (error) {
     console.error("Fetch appointments error:", error);
-    if (patientContainer) patientContainer.innerHTML = '<div style="text-align: center; color: var(--text-light); padding: 20px;">Failed to load appointments.</div>';
-    if (doctorContainer) doctorContainer.innerHTML = '<div style="text-align: center; grid-column: 1 / -1; color: var(--text-light); padding: 20px;">Failed to load appointments.</div>';
+    container.replaceChildren(messageBlock('Failed to load appointments.', messageStyle));
   }
 }
@@ -1,43 +1,193 @@
-import pandas as pd
-import random
-
-rows = []
-
-for _ in range(300):
-    age = random.randint(29, 77)
-    sex = random.randint(0, 1)
-    cp = random.randint(0, 3)
-    trestbps = random.randint(90, 180)
-    chol = random.randint(150, 350)
-    fbs = random.randint(0, 1)
-    restecg = random.randint(0, 2)
-    thalach = random.randint(100, 200)
-    exang = random.randint(0, 1)
-    oldpeak = round(random.uniform(0.0, 4.0), 1)
-
-    # simple realistic rule for target
-    risk_score = (
-        (age > 55) +
-        (trestbps > 140) +
-        (chol > 240) +
-        (thalach < 140) +
-        (oldpeak > 1.5)
-    )
+import argparse
+import os
+import sys
+import time
 
-    target = 1 if risk_score >= 3 else 0
+import numpy as np
+import pandas as pd
 
-    rows.append([
-        age, sex, cp, trestbps, chol,
-        fbs, restecg, thalach, exang,
-        oldpeak, target
-    ])
+# Synthetic heart disease data, generated column-wise with NumPy in fixed-size chunks.
+#   python generate_heart_csv.py                                   # 300 rows -> heart.csv
+#   python generate_heart_csv.py --rows 5000000 --seed 1 --out big.csv
+#   python generate_heart_csv.py --rows 1000000 --format parquet --out big.parquet
+#   python generate_heart_csv.py --rows 200000 --format sqlite --out ../database.db
+# Output is streamed chunk by chunk, so memory stays flat however many rows are written.
 
-df = pd.DataFrame(rows, columns=[
+COLUMNS = [
     "age","sex","cp","trestbps","chol",
     "fbs","restecg","thalach","exang",
     "oldpeak","target"
-])
+]
+
+CHUNK_SIZE = 100000
+
+
+def _sample(rng, n):
+    # Draws n rows; the target follows the same simple rule as the original generator
+    columns = {
+        "age": rng.integers(29, 78, n, dtype=np.int8),
+        "sex": rng.integers(0, 2, n, dtype=np.int8),
+        "cp": rng.integers(0, 4, n, dtype=np.int8),
+        "trestbps": rng.integers(90, 181, n, dtype=np.int16),
+        "chol": rng.integers(150, 351, n, dtype=np.int16),
+        "fbs": rng.integers(0, 2, n, dtype=np.int8),
+        "restecg": rng.integers(0, 3, n, dtype=np.int8),
+        "thalach": rng.integers(100, 201, n, dtype=np.int16),
+        "exang": rng.integers(0, 2, n, dtype=np.int8),
+        "oldpeak": np.round(rng.uniform(0.0, 4.0, n), 1).astype(np.float32)
+    }
+    risk_score = (
+        (columns["age"] > 55).astype(np.int8) +
+        (columns["trestbps"] > 140) +
+        (columns["chol"] > 240) +
+        (columns["thalach"] < 140) +
+        (columns["oldpeak"] > 1.5)
+    )
+    columns["target"] = (risk_score >= 3).astype(np.int8)
+    return columns
+
+
+def generate_chunk(n, rng, positive_rate=None):
+    # One chunk of n rows as a DataFrame. With positive_rate, rows are drawn until there are enough
+    # of each class and then mixed, so the labels keep following the features.
+    if positive_rate is None:
+        return pd.DataFrame(_sample(rng, n), columns=COLUMNS)
+
+    n_pos = int(rng.binomial(n, positive_rate))
+    wanted = {1: n_pos, 0: n - n_pos}
+    parts = {1: [], 0: []}
+    while any(wanted.values()):
+        draw = pd.DataFrame(_sample(rng, max(n, 1024)), columns=COLUMNS)
+        for label in (0, 1):
+            if wanted[label]:
+                rows = draw[draw["target"] == label].iloc[:wanted[label]]
+                parts[label].append(rows)
+                wanted[label] -= len(rows)
+    chunk = pd.concat(parts[0] + parts[1], ignore_index=True)
+    return chunk.iloc[rng.permutation(len(chunk))].reset_index(drop=True)
+
+
+def generate_chunks(rows, seed=None, positive_rate=None, chunk_size=CHUNK_SIZE):
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_size):
+        yield generate_chunk(min(chunk_size, rows - start), rng, positive_rate)
+
+
+def write_csv(chunks, path):
+    with open(path, "w", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet output needs pyarrow (pip install pyarrow)")
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _random_dates(rng, n, start, days):
+    return (np.datetime64(start) + rng.integers(0, days, n)).astype(str)
+
+
+def write_sqlite(chunks, path=None, seed=None, patients=None, rows=None):
+    # Loads the rows into Records (with matching Users, Appointments and Prescriptions) in one
+    # transaction per chunk. Returns the number of patients created.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import database
+
+    if path:
+        database.DB_PATH = path
+    database.init_db()
+    conn = database.connect(path)
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+
+    n_patients = patients or max(1, (rows or CHUNK_SIZE) // 5)
+    conn.execute("BEGIN IMMEDIATE")
+    database.bulk_insert(conn, 'Users', "INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, ?, 'Patient')",
+                         [(f"patient{i}", "secret") for i in range(n_patients)])
+    conn.execute("COMMIT")
+
+    offset = 0
+    for chunk in chunks:
+        n = len(chunk)
+        patient_ids = (np.arange(offset, offset + n) % n_patients).astype(str)
+        usernames = np.char.add("patient", patient_ids).tolist()
+        names = np.char.add("Patient ", patient_ids).tolist()
+        # Scores loosely follow the label so dashboards and risk filters see a realistic split
+        scores = np.clip(chunk["target"].to_numpy() * 45 + rng.integers(5, 55, n), 0, 100)
+        dates = _random_dates(rng, n, "2025-01-01", 365).tolist()
+        mobiles = np.char.add("555", rng.integers(1000000, 10000000, n).astype(str)).tolist()
+        slope, ca, thal = rng.integers(0, 3, n), rng.integers(0, 4, n), rng.integers(1, 4, n)
+
+        # Columns in database.RECORD_COLUMNS order
+        values = zip(
+            usernames, names, chunk["age"].tolist(), np.where(chunk["sex"] == 1, "Male", "Female").tolist(),
+            (scores > 50).astype(int).tolist(), scores.tolist(), dates, ["{}"] * n,
+            *(chunk[c].astype(np.float64).round(1).tolist() for c in ["cp", "trestbps", "chol", "fbs", "restecg", "thalach", "exang", "oldpeak"]),
+            slope.astype(float).tolist(), ca.astype(float).tolist(), thal.astype(float).tolist(),
+            mobiles, chunk["target"].tolist()
+        )
+        # Roughly one appointment per four records and one prescription per three
+        appt = rng.choice(n, n // 4, replace=False)
+        presc = rng.choice(n, n // 3, replace=False)
+        appointments = zip([usernames[i] for i in appt], [names[i] for i in appt],
+                           _random_dates(rng, len(appt), "2026-01-01", 365).tolist(),
+                           [f"{h:02d}:00" for h in rng.integers(8, 18, len(appt))], ["Follow-up"] * len(appt))
+        prescriptions = zip([usernames[i] for i in presc], ["doctor"] * len(presc), ["Aspirin 81mg"] * len(presc),
+                            ["1 tablet"] * len(presc), ["daily"] * len(presc), [dates[i] for i in presc])
+
+        conn.execute("BEGIN IMMEDIATE")
+        # Stats, table versions and change log entries are written once per chunk (database.bulk_insert)
+        database.bulk_insert(conn, 'Records', database.INSERT_RECORD, values)
+        database.bulk_insert(conn, 'Appointments', "INSERT INTO Appointments (patient_username, patient_name, appointment_date, appointment_time, reason) VALUES (?, ?, ?, ?, ?)", appointments)
+        database.bulk_insert(conn, 'Prescriptions', "INSERT INTO Prescriptions (patient_username, doctor_username, medication, dosage, frequency, date) VALUES (?, ?, ?, ?, ?, ?)", prescriptions)
+        conn.execute("COMMIT")
+        offset += n
+
+    conn.close()
+    return n_patients
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic heart disease data")
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=None, help="fixed seed for reproducible output")
+    parser.add_argument("--positive-rate", type=float, default=None, help="fraction of target=1 rows (default: whatever the rule yields)")
+    parser.add_argument("--format", choices=["csv", "parquet", "sqlite"], default="csv")
+    parser.add_argument("--out", default=None, help="output file (default heart.csv / heart.parquet / database.db)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--patients", type=int, default=None, help="sqlite: distinct patients (default rows / 5)")
+    args = parser.parse_args()
+
+    if args.positive_rate is not None and not 0.0 <= args.positive_rate <= 1.0:
+        parser.error("--positive-rate must be between 0 and 1")
+    out = args.out or {"csv": "heart.csv", "parquet": "heart.parquet", "sqlite": "database.db"}[args.format]
+
+    started = time.perf_counter()
+    chunks = generate_chunks(args.rows, args.seed, args.positive_rate, args.chunk_size)
+    if args.format == "csv":
+        write_csv(chunks, out)
+    elif args.format == "parquet":
+        write_parquet(chunks, out)
+    else:
+        write_sqlite(chunks, out, args.seed, args.patients, args.rows)
+    elapsed = time.perf_counter() - started
+
+    print(f"{out} with {args.rows} samples created successfully "
+          f"({elapsed:.1f}s, {args.rows / elapsed * 60 / 1e6:.1f}M rows/min)")
 
-df.to_csv("heart.csv", index=False)
 
-print("heart.csv with 300 samples created successfully")
+if __name__ == '__main__':
+    main()
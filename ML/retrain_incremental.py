@@ -0,0 +1,157 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import joblib
+import sklearn
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+# Incremental retraining from labeled Records (rows whose outcome a doctor has confirmed).
+#   python ML/retrain_incremental.py --extra-estimators 20
+# Only records with an id above the watermark stored in the current artifact's sidecar are read.
+# The forest is grown with warm_start: the existing trees are kept and --extra-estimators new ones
+# are fitted on the new rows, so the cost depends on the new data only. The old and new forests
+# are scored on the same evaluation set (the held-out split of the training CSV plus a
+# deterministic slice of the new records) and the new artifact is published only if neither
+# accuracy nor ROC AUC drops by more than --tolerance.
+# Records labeled after the watermark has passed them are only picked up by a full retrain.
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(ML_DIR)
+sys.path.insert(0, ROOT)
+
+import database
+from model_registry import ModelRegistry, read_metadata
+from train_pipeline import FEATURES, load_data, publish
+
+# Every HOLDOUT_MOD-th record (by id) is kept out of training and used for evaluation
+HOLDOUT_MOD = 5
+
+
+def labeled_records(conn, watermark, chunk_size=5000):
+    # (ids, X, y) for labeled records past the watermark with all model features present,
+    # read by id in chunks
+    ids, rows, labels = [], [], []
+    last_id = watermark
+    columns = ', '.join(f for f in FEATURES if f not in ('age', 'sex'))
+    while True:
+        chunk = conn.execute(f"SELECT id, age, sex, {columns}, outcome FROM Records "
+                             "WHERE outcome IS NOT NULL AND id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)).fetchall()
+        if not chunk:
+            break
+        for r in chunk:
+            values = [r["age"], 1 if r["sex"] == "Male" else 0] + [r[f] for f in FEATURES[2:]]
+            if any(v is None for v in values):
+                continue
+            ids.append(r["id"])
+            rows.append(values)
+            labels.append(r["outcome"])
+        last_id = chunk[-1]["id"]
+    X = np.asarray(rows, dtype=np.float32).reshape(-1, len(FEATURES))
+    return np.asarray(ids, dtype=np.int64), X, np.asarray(labels, dtype=np.int8), last_id
+
+
+def evaluate(model, X, y):
+    probs = model.predict_proba(X)[:, list(model.classes_).index(1)]
+    return {
+        "accuracy": round(float(accuracy_score(y, (probs > 0.5).astype(np.int8))), 4),
+        "roc_auc": round(float(roc_auc_score(y, probs)), 4) if len(np.unique(y)) > 1 else None,
+        "rows": int(len(y))
+    }
+
+
+def regressed(new, old, tolerance):
+    for metric in ("accuracy", "roc_auc"):
+        if new[metric] is not None and old[metric] is not None and new[metric] < old[metric] - tolerance:
+            return metric
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grow the current forest with trees fitted on newly labeled Records")
+    parser.add_argument("--db", default=database.DB_PATH)
+    parser.add_argument("--model-dir", default=os.path.join(ML_DIR, "models"))
+    parser.add_argument("--default-model", default=os.path.join(ML_DIR, "heart_model.pkl"))
+    parser.add_argument("--data", default=os.path.join(ML_DIR, "heart.csv"), help="CSV whose held-out split is part of the evaluation set")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--extra-estimators", type=int, default=20)
+    parser.add_argument("--min-rows", type=int, default=50, help="skip retraining below this many new training rows")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="allowed drop in accuracy / ROC AUC")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = ModelRegistry(model_dir=args.model_dir, default_path=args.default_model, warmup_runs=0)
+    artifact = registry.latest_artifact()
+    if artifact is None:
+        sys.exit("No model artifact to grow; run ML/train_pipeline.py first")
+    base_path, base_version, _ = artifact
+    base_metadata = read_metadata(base_path) or {}
+    watermark = base_metadata.get("records_watermark", 0)
+
+    conn = database.connect(args.db)
+    ids, X_new, y_new, last_id = labeled_records(conn, watermark)
+    conn.close()
+    load_seconds = time.perf_counter() - started
+
+    holdout = ids % HOLDOUT_MOD == 0
+    X_train, y_train = X_new[~holdout], y_new[~holdout]
+    print(f"{len(ids)} labeled records since id {watermark} ({len(y_train)} for training, {int(holdout.sum())} held out)")
+    if len(y_train) < args.min_rows:
+        print(f"Fewer than {args.min_rows} new training rows; nothing to do.")
+        return
+    if len(np.unique(y_train)) < 2:
+        print("New records contain a single outcome class; waiting for more data.")
+        return
+
+    # Evaluation set: the reference held-out split of the training CSV plus the held-out new records
+    X_ref, y_ref = load_data(args.data)
+    _, X_eval, _, y_eval = train_test_split(X_ref, y_ref, test_size=args.test_size, stratify=y_ref, random_state=args.seed)
+    X_eval = np.concatenate([X_eval, X_new[holdout]])
+    y_eval = np.concatenate([y_eval, y_new[holdout]])
+
+    base_model = joblib.load(base_path)
+    model = joblib.load(base_path) # fitted separately so base_model stays untouched for comparison
+    baseline = evaluate(base_model, X_eval, y_eval)
+
+    fit_start = time.perf_counter()
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + args.extra_estimators)
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    fit_seconds = time.perf_counter() - fit_start
+    candidate = evaluate(model, X_eval, y_eval)
+
+    print(f"Base {base_version}: accuracy {baseline['accuracy']}, auc {baseline['roc_auc']}")
+    print(f"Grown ({model.n_estimators} trees, fitted in {fit_seconds:.2f}s): accuracy {candidate['accuracy']}, auc {candidate['roc_auc']}")
+
+    metric = regressed(candidate, baseline, args.tolerance)
+    if metric:
+        print(f"Not publishing: {metric} regressed beyond tolerance {args.tolerance}")
+        sys.exit(1)
+
+    metadata = {
+        "features": FEATURES,
+        "classes": [int(c) for c in model.classes_],
+        "params": dict(base_metadata.get("params") or {}, n_estimators=model.n_estimators),
+        "metrics": {"test": candidate, "baseline": baseline},
+        "timing": {
+            "load_seconds": round(load_seconds, 3),
+            "fit_seconds": round(fit_seconds, 3),
+            "total_seconds": round(time.perf_counter() - started, 3)
+        },
+        "base_version": base_version,
+        "records_watermark": int(last_id),
+        "new_rows": int(len(y_train)),
+        "seed": args.seed,
+        "sklearn_version": sklearn.__version__,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    path = publish(model, metadata, args.model_dir)
+    print(f"Published {path} (records watermark {last_id})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+# Cross-validated hyperparameter search for the heart disease model.
+#   python ML/train_pipeline.py --data ML/heart.csv --folds 5 --workers 4
+# Every (parameter set, fold) pair is fitted in a process pool, the best parameter set is refitted on
+# the training split and scored on a held-out test split, and the result is published as the next
+# versioned artifact ML/models/heart_model_v<N>.pkl with a heart_model_v<N>.json metadata sidecar
+# (feature order, metrics, timings) that model_registry.py checks before serving the model.
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ML_DIR))
+
+from flat_forest import FlatForest
+from model_registry import file_sha256
+
+# Feature order the server sends (server.FEATURES) and the compact dtypes they are read as
+FEATURES = ['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak']
+DTYPES = {
+    'age': 'int8', 'sex': 'int8', 'cp': 'int8', 'trestbps': 'int16', 'chol': 'int16', 'fbs': 'int8',
+    'restecg': 'int8', 'thalach': 'int16', 'exang': 'int8', 'oldpeak': 'float32', 'target': 'int8'
+}
+
+DEFAULT_GRID = {
+    'n_estimators': [80, 150],
+    'max_depth': [4, 6, 8],
+    'min_samples_split': [10],
+    'min_samples_leaf': [1, 5]
+}
+
+# Set once per worker process by _init_worker so the training data is not pickled for every task
+_X = None
+_y = None
+
+
+def load_data(path):
+    data = pd.read_csv(path, usecols=FEATURES + ['target'], dtype=DTYPES)
+    X = data[FEATURES].to_numpy(dtype=np.float32)
+    y = data['target'].to_numpy()
+    return X, y
+
+
+def expand_grid(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+
+
+def _fit_fold(task):
+    # One (parameter set, fold) fit; returns its scores and timings
+    params_index, params, fold, train_idx, val_idx, seed = task
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    model.fit(_X[train_idx], _y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    probs = model.predict_proba(_X[val_idx])[:, 1]
+    return {
+        "params_index": params_index,
+        "fold": fold,
+        "accuracy": float(accuracy_score(_y[val_idx], (probs > 0.5).astype(np.int8))),
+        "roc_auc": float(roc_auc_score(_y[val_idx], probs)) if len(np.unique(_y[val_idx])) > 1 else None,
+        "fit_seconds": round(fit_seconds, 4)
+    }
+
+
+def cross_validate(X, y, grid, folds, seed, workers):
+    candidates = expand_grid(grid)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    splits = list(splitter.split(X, y))
+    tasks = [(i, params, fold, train_idx, val_idx, seed)
+             for i, params in enumerate(candidates)
+             for fold, (train_idx, val_idx) in enumerate(splits)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        fold_results = list(pool.map(_fit_fold, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    results = []
+    for i, params in enumerate(candidates):
+        runs = [r for r in fold_results if r["params_index"] == i]
+        accuracies = [r["accuracy"] for r in runs]
+        aucs = [r["roc_auc"] for r in runs if r["roc_auc"] is not None]
+        results.append({
+            "params": params,
+            "accuracy_mean": round(float(np.mean(accuracies)), 4),
+            "accuracy_std": round(float(np.std(accuracies)), 4),
+            "roc_auc_mean": round(float(np.mean(aucs)), 4) if aucs else None,
+            "fit_seconds_total": round(sum(r["fit_seconds"] for r in runs), 3)
+        })
+    return results
+
+
+def next_version(model_dir):
+    versions = [0]
+    if os.path.isdir(model_dir):
+        for name in os.listdir(model_dir):
+            if name.startswith('heart_model_v') and name.endswith('.pkl'):
+                try:
+                    versions.append(int(name[len('heart_model_v'):-len('.pkl')]))
+                except ValueError:
+                    pass
+    return max(versions) + 1
+
+
+def publish(model, metadata, model_dir):
+    # Sidecar and flattened forest first, the .pkl last: the registry only looks for .pkl files,
+    # so a watcher never picks up a model whose metadata is not there yet. The .pkl is serialized
+    # up front so the sidecar can record its hash, which is how the registry tells that the
+    # flattened forest belongs to it.
+    os.makedirs(model_dir, exist_ok=True)
+    version = next_version(model_dir)
+    stem = os.path.join(model_dir, f"heart_model_v{version}")
+    metadata["version"] = f"v{version}"
+
+    joblib.dump(model, stem + ".pkl.tmp")
+    metadata["artifact_sha256"] = file_sha256(stem + ".pkl.tmp")
+    with open(stem + ".json.tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(stem + ".json.tmp", stem + ".json")
+
+    try:
+        FlatForest.from_sklearn(model).save(stem + ".flat.tmp.joblib")
+        os.replace(stem + ".flat.tmp.joblib", stem + ".flat.joblib")
+    except Exception as e:
+        print(f"Skipping flattened forest export ({e})")
+
+    os.replace(stem + ".pkl.tmp", stem + ".pkl")
+    return stem + ".pkl"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated, parallel training of the heart disease model")
+    parser.add_argument("--data", default=os.path.join(ML_DIR, "heart.csv"))
+    parser.add_argument("--out-dir", default=os.path.join(ML_DIR, "models"))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-size", type=float, default=0.2, help="held-out fraction for the final metrics")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--grid", help="JSON object of parameter lists, replaces the default grid")
+    parser.add_argument("--dry-run", action="store_true", help="search and report without publishing an artifact")
+    args = parser.parse_args()
+
+    grid = json.loads(args.grid) if args.grid else DEFAULT_GRID
+    started = time.perf_counter()
+
+    X, y = load_data(args.data)
+    load_seconds = time.perf_counter() - started
+    print(f"Loaded {len(y)} rows ({X.nbytes / 1e6:.1f} MB of features) in {load_seconds:.2f}s")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, stratify=y, random_state=args.seed)
+
+    search_start = time.perf_counter()
+    results = cross_validate(X_train, y_train, grid, args.folds, args.seed, args.workers)
+    search_seconds = time.perf_counter() - search_start
+    results.sort(key=lambda r: (r["accuracy_mean"], r["roc_auc_mean"] or 0.0), reverse=True)
+    for r in results:
+        print(f"  {r['params']}  accuracy {r['accuracy_mean']:.4f} ± {r['accuracy_std']:.4f}  auc {r['roc_auc_mean']}")
+    best = results[0]
+    print(f"Searched {len(results)} parameter sets x {args.folds} folds in {search_seconds:.1f}s with {args.workers} workers")
+
+    fit_start = time.perf_counter()
+    model = RandomForestClassifier(random_state=args.seed, **best["params"])
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_start
+
+    probs = model.predict_proba(X_test)[:, 1]
+    test_metrics = {
+        "accuracy": round(float(accuracy_score(y_test, (probs > 0.5).astype(np.int8))), 4),
+        "roc_auc": round(float(roc_auc_score(y_test, probs)), 4) if len(np.unique(y_test)) > 1 else None,
+        "rows": int(len(y_test))
+    }
+    print(f"Best {best['params']}: held-out accuracy {test_metrics['accuracy']}, auc {test_metrics['roc_auc']}")
+
+    metadata = {
+        "features": FEATURES,
+        "classes": [int(c) for c in model.classes_],
+        "params": best["params"],
+        "metrics": {"test": test_metrics, "cv": {k: best[k] for k in ("accuracy_mean", "accuracy_std", "roc_auc_mean")}},
+        "search": results,
+        "timing": {
+            "load_seconds": round(load_seconds, 3),
+            "search_seconds": round(search_seconds, 3),
+            "fit_seconds": round(fit_seconds, 3),
+            "total_seconds": round(time.perf_counter() - started, 3)
+        },
+        "data": {"path": os.path.abspath(args.data), "sha256": file_sha256(args.data), "rows": int(len(y)), "train_rows": int(len(y_train))},
+        "folds": args.folds,
+        "seed": args.seed,
+        "workers": args.workers,
+        "sklearn_version": sklearn.__version__,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+    if args.dry_run:
+        print(json.dumps(metadata["timing"]))
+        return
+    path = publish(model, metadata, args.out_dir)
+    print(f"Published {path}")
+
+
+if __name__ == '__main__':
+    main()
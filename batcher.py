@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    # Coalesces single-row prediction requests coming from concurrent request threads.
+    # Rows are queued until `max_batch_size` arrive or the oldest one has waited `max_wait_ms`,
+    # then the whole batch is scored with one call to `score_fn` and every waiting request is resolved.
+    # `score_fn` takes a list of feature rows and returns one result per row.
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._stopped = False
+
+        # Metrics
+        self._batches = 0
+        self._rows = 0
+        self._max_queue_depth = 0
+        self._wait_total = 0.0
+        self._batch_sizes = {}
+
+        self._start()
+        # Threads do not survive fork(): pre-forked workers (serve.py) get a fresh queue and scheduler thread
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._pending = [] # (features, future, enqueued_at)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        future = Future()
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Batcher is stopped")
+            self._pending.append((features, future, time.perf_counter()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+            self._cond.notify()
+        return future
+
+    def predict(self, features, timeout=None):
+        # Blocks the calling request thread until its batch has been scored
+        return self.submit(features).result(timeout)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            # Wait for the batch to fill up, but never longer than max_wait after the first arrival
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            try:
+                results = self.score_fn([features for features, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            with self._cond:
+                self._batches += 1
+                self._rows += len(batch)
+                self._wait_total += sum(started - enqueued_at for _, _, enqueued_at in batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "rows": self._rows,
+                "avg_batch_size": (self._rows / self._batches) if self._batches else 0.0,
+                "avg_queue_wait_ms": (self._wait_total / self._rows * 1000.0) if self._rows else 0.0,
+                "batch_size_counts": {str(k): v for k, v in sorted(self._batch_sizes.items())}
+            }
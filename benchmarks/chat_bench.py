@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+# Per-message cost of the /chat intent matcher as the knowledge base grows.
+#   python benchmarks/chat_bench.py --intents 14 100 1000 5000
+# The real chat_intents.json is padded with synthetic intents. Each size times both of the matcher's
+# paths (the Aho-Corasick automaton and the per-keyword str.find scan it uses up to
+# LINEAR_MAX_KEYWORDS keywords) and the old approach of testing every keyword with a substring
+# check, whose cost grows with the keyword count for any message that matches late or not at all.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from intent_matcher import CompiledIntents, LINEAR_MAX_KEYWORDS
+
+MESSAGES = ["how should I change my diet?", "tips for stress", "what is normal blood pressure",
+            "I can't sleep", "hello", "tell me about cholesterol and exercise",
+            "my doctor said my ldl is high and I get chest pain when I run up the stairs after lunch"]
+
+def knowledge_base(n_intents, rng):
+    with open(os.path.join(ROOT, 'chat_intents.json')) as f:
+        data = json.load(f)
+    while len(data["intents"]) < n_intents:
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))) for _ in range(5)]
+        data["intents"].append({"name": f"synthetic{len(data['intents'])}", "keywords": words, "response": "..."})
+    return data
+
+def linear_match(data, message):
+    # What the old if/elif chain did, generalised to the whole knowledge base
+    text = message.lower()
+    for intent in data["intents"]:
+        for keyword in intent["keywords"]:
+            if keyword.rstrip('*') in text:
+                return intent["response"]
+    return data["default"]
+
+def per_message_us(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled intent matcher against a linear keyword scan")
+    parser.add_argument("--intents", type=int, nargs="+", default=[14, 20, 30, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"linear scan used up to {LINEAR_MAX_KEYWORDS} keywords")
+    print(f"{'intents':>8}{'keywords':>10}{'compile ms':>12}{'automaton µs/msg':>18}{'scan µs/msg':>13}{'old linear µs/msg':>19}{'used':>11}")
+    for n in args.intents:
+        data = knowledge_base(n, rng)
+        start = time.perf_counter()
+        compiled = CompiledIntents(data)
+        compile_ms = (time.perf_counter() - start) * 1000
+        automaton = CompiledIntents(data, linear_max_keywords=0)
+        scan = CompiledIntents(data, linear_max_keywords=float('inf'))
+        # Also a message nothing matches and one for the last intent: the cases a linear scan pays most for
+        messages = MESSAGES + ["is this normal for someone my age", f"what about {data['intents'][-1]['keywords'][0].rstrip('*')}"]
+        slow_repeat = max(1, args.repeat // max(1, n // 100))
+        automaton_us = per_message_us(automaton.match, messages, args.repeat)
+        scan_us = per_message_us(scan.match, messages, slow_repeat)
+        linear_us = per_message_us(lambda m: linear_match(data, m), messages, slow_repeat)
+        keywords = sum(len(i["keywords"]) for i in data["intents"])
+        used = "scan" if compiled.linear else "automaton"
+        print(f"{len(data['intents']):>8}{keywords:>10}{compile_ms:>12.1f}{automaton_us:>18.2f}{scan_us:>13.2f}{linear_us:>19.2f}{used:>11}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Run from anywhere: the data-access layer lives at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+# Concurrency benchmark: the old per-request sqlite3.connect pattern vs the pooled WAL data-access layer.
+# Each client runs the same mix as the routes: a record insert (predict_api) followed by reads
+# (get_records for one patient, login). Like Werkzeug's threaded server, every request runs on a new
+# thread, and a pooled request returns its connection when it ends (server.py's teardown_request).
+
+INSERT_RECORD = "INSERT INTO Records (patient_username, name, age, sex, prediction, score, date, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_RECORDS = "SELECT * FROM Records WHERE patient_username=? ORDER BY id DESC LIMIT 20"
+SELECT_USER = "SELECT * FROM Users WHERE username=? AND password=? AND role=?"
+
+def legacy_op(path, i):
+    # What every route did before: connect, execute, commit, close
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(INSERT_RECORD, (f"patient{i % 50}", "Bench", 50, "Male", 1, 70, "01/01/2026", "{}"))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(SELECT_RECORDS, (f"patient{i % 50}",))
+    c.fetchall()
+    c.execute(SELECT_USER, ("doctor", "doctor123", "Doctor"))
+    c.fetchone()
+    conn.close()
+
+def pooled_op(path, i):
+    try:
+        database.execute(INSERT_RECORD, (f"patient{i % 50}", "Bench", 50, "Male", 1, 70, "01/01/2026", "{}"))
+        database.fetch_all(SELECT_RECORDS, (f"patient{i % 50}",))
+        database.fetch_one(SELECT_USER, ("doctor", "doctor123", "Doctor"))
+    finally:
+        database.release_connection()
+
+def on_request_thread(op, path, i):
+    errors = []
+    def handle():
+        try:
+            op(path, i)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+    thread = threading.Thread(target=handle)
+    thread.start()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+def run(mode, threads, ops_per_thread):
+    workdir = tempfile.mkdtemp(prefix="cardio_bench_")
+    path = os.path.join(workdir, "database.db")
+    database.DB_PATH = path
+    database.init_db()
+    if mode == "legacy":
+        # The pre-pooling database used the default rollback journal
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+    op = legacy_op if mode == "legacy" else pooled_op
+    errors = []
+    done = [0] * threads
+
+    def worker(t):
+        for n in range(ops_per_thread):
+            try:
+                on_request_thread(op, path, t * ops_per_thread + n)
+                done[t] += 1
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    database.close_pool()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    ops = sum(done)
+    return {"mode": mode, "threads": threads, "ops": ops, "errors": len(errors),
+            "seconds": round(elapsed, 3), "ops_per_sec": round(ops / elapsed, 1)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-request connections with the pooled WAL data-access layer")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread")
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        for mode in ("legacy", "pooled"):
+            r = run(mode, threads, args.ops)
+            print(f"{r['mode']:>7} | {r['threads']:>3} threads | {r['ops_per_sec']:>9} ops/s | {r['errors']} errors | {r['seconds']} s")
@@ -0,0 +1,74 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import time
+from urllib.parse import urlparse
+
+# Closed-loop load generator for a running server (python server.py or python serve.py --workers N).
+# Client processes (not threads) generate the load so the client itself is not GIL-bound.
+#   python benchmarks/load_test.py --url http://127.0.0.1:5000 --clients 8 --duration 10 --server-workers 4
+
+SAMPLE_PATIENT = {
+    "age": "58", "sex": "1", "cp": "2", "trestbps": "145", "chol": "250", "fbs": "0",
+    "restecg": "1", "thalach": "130", "exang": "1", "oldpeak": "2.1"
+}
+
+def client_loop(url, path, duration, result_queue):
+    target = urlparse(url)
+    body = json.dumps(SAMPLE_PATIENT)
+    headers = {"Content-Type": "application/json"}
+    conn = None
+    ok = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            conn.request("POST", path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                errors += 1
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            if conn is not None:
+                conn.close()
+            conn = None
+    result_queue.put((ok, errors))
+
+def run(url, path, clients, duration):
+    result_queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client_loop, args=(url, path, duration, result_queue)) for _ in range(clients)]
+    start = time.monotonic()
+    for p in procs:
+        p.start()
+    results = [result_queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.monotonic() - start
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return ok, errors, elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure requests per second per core against a running server")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--path", default="/predict_api")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--server-workers", type=int, default=None,
+                        help="worker processes the server runs (defaults to this machine's core count)")
+    args = parser.parse_args()
+
+    ok, errors, elapsed = run(args.url, args.path, args.clients, args.duration)
+    cores = args.server_workers or os.cpu_count() or 1
+    rps = ok / elapsed
+    print(f"{ok} requests in {elapsed:.1f}s with {args.clients} clients ({errors} errors)")
+    print(f"Throughput: {rps:.1f} req/s, {rps / cores:.1f} req/s per core ({cores} cores)")
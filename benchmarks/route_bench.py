@@ -0,0 +1,228 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import http.client
+import urllib.request
+
+# Repeatable latency/throughput benchmark for every Flask route.
+#   python benchmarks/route_bench.py --records 20000 --concurrency 1 8 --duration 5 --out bench.json
+#   python benchmarks/route_bench.py --out new.json --compare bench.json
+# A fresh database is seeded with synthetic data (ML/generate_heart_csv.py),
+# the server is started against it with serve.py, and each route is driven at every concurrency
+# level. Results (throughput, p50/p95/p99 latency) are written to a JSON file for comparison between commits.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'ML'))
+
+from generate_heart_csv import generate_chunks, write_sqlite
+
+CHAT_MESSAGES = ["how should I change my diet?", "tips for stress", "what is normal blood pressure",
+                 "I can't sleep", "hello", "tell me about cholesterol and exercise"]
+
+def seed(db_path, records, seed_value):
+    # Patients, their records, appointments and prescriptions, written in bulk by the data generator
+    return write_sqlite(generate_chunks(records, seed_value), db_path, seed_value, rows=records)
+
+SAMPLE_PATIENT = {"age": "58", "sex": "1", "cp": "2", "trestbps": "145", "chol": "250", "fbs": "0",
+                  "restecg": "1", "thalach": "130", "exang": "1", "oldpeak": "2.1"}
+
+def random_patient(rng):
+    # A new feature row on every request, so predictions miss the server's prediction cache
+    return {"age": str(rng.randint(29, 77)), "sex": str(rng.randint(0, 1)), "cp": str(rng.randint(0, 3)),
+            "trestbps": str(rng.randint(94, 200)), "chol": str(rng.randint(126, 564)), "fbs": str(rng.randint(0, 1)),
+            "restecg": str(rng.randint(0, 2)), "thalach": str(rng.randint(71, 202)), "exang": str(rng.randint(0, 1)),
+            "oldpeak": str(round(rng.uniform(0, 6.2), 1))}
+
+def random_patient_explained(rng):
+    return {**random_patient(rng), "explain": True}
+
+def random_chat(rng):
+    return {"message": rng.choice(CHAT_MESSAGES)}
+
+def scenarios(n_patients):
+    # name -> (method, path, body); body is None, a fixed payload or a function of the client's RNG
+    return {
+        "predict_api": ("POST", "/predict_api", random_patient),
+        "predict_api_cached": ("POST", "/predict_api", SAMPLE_PATIENT), # every request after the first is a cache hit
+        "predict_api_explain": ("POST", "/predict_api", random_patient_explained),
+        "explain_records": ("GET", f"/explain_records?ids={','.join(str(i) for i in range(1, 51))}", None),
+        "get_records": ("GET", "/get_records", None),
+        "get_records_patient": ("GET", f"/get_records?patient=patient{n_patients // 2}&limit=20", None),
+        "get_appointments": ("GET", "/get_appointments", None),
+        "get_prescriptions": ("GET", "/get_prescriptions", None),
+        "login": ("POST", "/login", {"username": "doctor", "password": "doctor123", "role": "Doctor"}),
+        "chat": ("POST", "/chat", random_chat)
+    }
+
+def client(port, method, path, body, duration, seed_value, out):
+    rng = random.Random(seed_value)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        payload = body(rng) if callable(body) else body
+        data = json.dumps(payload) if payload is not None else None
+        headers = {"Content-Type": "application/json"} if data else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    out.put((latencies, errors))
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def drive(port, name, method, path, body, concurrency, duration):
+    out = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(port, method, path, body, duration, i, out)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for r in results for l in r[0])
+    ms = lambda v: round(v * 1000.0, 3) if v is not None else None
+    return {
+        "route": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(r[1] for r in results),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99))
+    }
+
+def start_server(db_path, port, workers, env_overrides):
+    env = dict(os.environ, CARDIO_DB=db_path, **env_overrides)
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", "serve.py", "--port", str(port), "--workers", str(workers)],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/model_info", timeout=1)
+            return proc
+        except Exception:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Server did not start")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def compare(current, baseline_path, threshold):
+    # Prints per-route deltas against a previous run; returns False if any p95 regressed beyond threshold
+    with open(baseline_path) as f:
+        baseline = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    ok = True
+    print(f"\n{'route':<22}{'conc':>5}{'rps':>10}{'Δrps':>9}{'p95 ms':>10}{'Δp95':>9}")
+    for r in current["results"]:
+        b = baseline.get((r["route"], r["concurrency"]))
+        if not b or not b["p95_ms"] or not r["p95_ms"]:
+            continue
+        d_rps = (r["rps"] - b["rps"]) / b["rps"] * 100 if b["rps"] else 0.0
+        d_p95 = (r["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100
+        flag = "  REGRESSION" if d_p95 > threshold else ""
+        ok = ok and not flag
+        print(f"{r['route']:<22}{r['concurrency']:>5}{r['rps']:>10}{d_rps:>8.1f}%{r['p95_ms']:>10}{d_p95:>8.1f}%{flag}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database and benchmark every route")
+    parser.add_argument("--records", type=int, default=10000, help="synthetic Records rows to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per route and concurrency level")
+    parser.add_argument("--routes", nargs="+", help="subset of routes to run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="serve.py worker processes")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--db", help="seed this database file instead of a temporary one")
+    parser.add_argument("--env", nargs="*", default=[], help="extra server environment, e.g. CARDIO_MICROBATCH=1")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    workdir = None
+    db_path = args.db
+    if not db_path:
+        workdir = tempfile.mkdtemp(prefix="cardio_bench_")
+        db_path = os.path.join(workdir, "database.db")
+
+    started = time.perf_counter()
+    n_patients = seed(db_path, args.records, args.seed)
+    print(f"Seeded {args.records} records for {n_patients} patients in {time.perf_counter() - started:.1f}s")
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    server = start_server(db_path, args.port, args.workers, env_overrides)
+    results = []
+    try:
+        for name, (method, path, body) in scenarios(n_patients).items():
+            if args.routes and name not in args.routes:
+                continue
+            for concurrency in args.concurrency:
+                r = drive(args.port, name, method, path, body, concurrency, args.duration)
+                results.append(r)
+                print(f"{name:<22} c={concurrency:<3} {r['rps']:>9} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "records": args.records,
+            "seed": args.seed,
+            "duration": args.duration,
+            "workers": args.workers,
+            "server_env": env_overrides,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare and not compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from database import (connect, fetch_all, fetch_one, record_to_dict, appointment_to_dict, prescription_to_dict,
+                      APPOINTMENT_WITH_CONTACT, BULK_PATIENT, CHANGELOG_RETENTION, prune_change_log)
+
+# Change feed behind /changes. Triggers append every write to Records, Appointments and Prescriptions
+# to ChangeLog (see database.CHANGE_SCHEMA); read_changes() turns the entries after a client's last
+# seen id into deltas carrying the current rows, and ChangeFeed wakes waiting requests when new
+# entries appear. Entries older than CARDIO_CHANGELOG_RETENTION seconds are pruned (see
+# database.prune_change_log); a client that falls further behind (or more than MAX_CHANGES behind, or past a bulk insert) is told to reload instead.
+
+MAX_CHANGES = 500
+
+ROW_QUERIES = {
+    'Records': ("SELECT * FROM Records WHERE id IN ({})", record_to_dict),
+    'Appointments': (f"SELECT {APPOINTMENT_WITH_CONTACT} FROM Appointments a WHERE a.id IN ({{}})", appointment_to_dict),
+    'Prescriptions': ("SELECT * FROM Prescriptions WHERE id IN ({})", prescription_to_dict)
+}
+
+LATEST_CHANGE = "SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'"
+
+
+def latest_change_id(conn=None):
+    row = (conn.execute(LATEST_CHANGE).fetchone() if conn else fetch_one(LATEST_CHANGE))
+    return row["seq"] if row else 0
+
+
+def read_changes(since, tables, patient=None, limit=MAX_CHANGES):
+    # (last id, deltas, reset). Each delta is {"id", "table", "op": "upsert"|"delete", "row_id", "row"};
+    # several writes to one row collapse into one delta with the row as it is now.
+    last = latest_change_id()
+    first = fetch_one("SELECT MIN(id) AS id FROM ChangeLog")["id"]
+    if since > last or since < (first or last + 1) - 1:
+        return last, [], True
+
+    where = ["id > ?", "id <= ?", f"table_name IN ({', '.join('?' * len(tables))})"]
+    params = [since, last] + list(tables)
+    if patient:
+        where.append("patient_username IN (?, ?)")
+        params += [patient, BULK_PATIENT]
+    rows = fetch_all(f"SELECT id, table_name, row_id, op FROM ChangeLog WHERE {' AND '.join(where)} ORDER BY id LIMIT ?",
+                     params + [limit + 1])
+    if len(rows) > limit or any(r["op"] == 'bulk' for r in rows):
+        return last, [], True
+
+    latest = {}
+    for r in rows:
+        latest[(r["table_name"], r["row_id"])] = r["id"]
+    ids = {}
+    for table, row_id in latest:
+        ids.setdefault(table, []).append(row_id)
+    current = {}
+    for table, row_ids in ids.items():
+        sql, to_dict = ROW_QUERIES[table]
+        for row in fetch_all(sql.format(', '.join('?' * len(row_ids))), row_ids):
+            current[(table, row["id"])] = to_dict(row)
+
+    deltas = []
+    for (table, row_id), change_id in sorted(latest.items(), key=lambda item: item[1]):
+        row = current.get((table, row_id))
+        deltas.append({"id": change_id, "table": table.lower(), "op": "upsert" if row else "delete",
+                       "row_id": row_id, "row": row})
+    return last, deltas, False
+
+
+class ChangeFeed:
+    # One poller thread per process watches the ChangeLog sequence and wakes every waiting /changes
+    # request, so the database is polled at a fixed rate however many dashboards are connected.
+
+    def __init__(self, poll_interval=0.25, retention_seconds=None):
+        self.poll_interval = poll_interval
+        self.retention_seconds = CHANGELOG_RETENTION if retention_seconds is None else retention_seconds
+        self._reset()
+
+        # Like the job queue, the poller does not survive fork(); workers start their own on demand
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._changed = threading.Condition()
+        self._latest = None
+        self._waiters = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = connect()
+        last_prune = 0.0
+        while True:
+            if self._waiters or self._latest is None:
+                try:
+                    latest = latest_change_id(conn)
+                except Exception as e:
+                    print(f"Change feed error: {e}")
+                    latest = self._latest
+                if latest != self._latest:
+                    with self._changed:
+                        self._latest = latest
+                        self._changed.notify_all()
+            if time.monotonic() - last_prune > 3600:
+                last_prune = time.monotonic()
+                try:
+                    self.prune(conn)
+                except Exception as e:
+                    print(f"Change feed prune error: {e}")
+            time.sleep(self.poll_interval)
+
+    def wait(self, since, timeout):
+        # Blocks until an entry newer than `since` exists or the timeout passes; returns the latest id
+        self.start()
+        with self._changed:
+            self._waiters += 1
+            try:
+                self._changed.wait_for(lambda: self._latest is not None and self._latest > since, timeout)
+            finally:
+                self._waiters -= 1
+            return self._latest
+
+    def prune(self, conn):
+        return prune_change_log(conn, self.retention_seconds)
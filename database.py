@@ -1,7 +1,464 @@
+import os
+import sys
+import json
+import queue
 import sqlite3
+import threading
+import time
+from datetime import datetime
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('CARDIO_DB', 'database.db')
+
+# Pragmas applied to every connection. WAL lets readers run alongside a writer,
+# busy_timeout makes writers queue for the lock instead of failing with "database is locked".
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=10000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000"
+]
+
+# Schema versions (PRAGMA user_version):
+#   2 - Records has typed clinical columns, new rows store ISO (YYYY-MM-DD) dates
+#   3 - legacy rows backfilled out of the details JSON blob (python database.py --backfill)
+SCHEMA_VERSION = 3
+
+# Clinical inputs stored as typed Records columns instead of inside the details JSON
+RECORD_FEATURES = ['cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal']
+RECORD_COLUMNS = ['patient_username', 'name', 'age', 'sex', 'prediction', 'score', 'date', 'details'] + RECORD_FEATURES + ['mobile', 'outcome']
+INSERT_RECORD = f"INSERT INTO Records ({', '.join(RECORD_COLUMNS)}) VALUES ({', '.join('?' * len(RECORD_COLUMNS))})"
+
+# Form keys that are either stored in their own column or must never be persisted
+_NOT_EXTRA = set(RECORD_FEATURES) | {'mobile', 'outcome', 'age', 'sex', 'p_name', 'name', 'patientUsername', 'patient_username', 'patientPassword', 'explain'}
+
+# Idle connections are kept in a per-process pool. A request checks one out on its first query and
+# hands it back when it ends (server.py calls release_connection() in teardown_request), so the
+# thread-per-connection dev/serve.py servers reuse connections across clients instead of opening one
+# per keep-alive connection. At most POOL_SIZE idle connections are kept; requests beyond that open
+# extra connections rather than wait, since long-lived /changes streams hold theirs for minutes.
+POOL_SIZE = int(os.environ.get('CARDIO_DB_POOL_SIZE', 8))
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_local = threading.local()
+
+def _reset_pool():
+    # Connections inherited across fork() belong to the parent; a child starts with an empty pool
+    global _pool
+    _pool = queue.LifoQueue(maxsize=POOL_SIZE)
+    _local.conn = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool)
+
+def connect(path=None):
+    # isolation_level=None: transactions are opened explicitly by transaction().
+    # Statements are compiled once per connection and reused from sqlite3's statement cache.
+    # Pooled connections move between threads, but only one thread holds a connection at a time.
+    conn = sqlite3.connect(path or DB_PATH, timeout=10, isolation_level=None, cached_statements=256,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    # The connection this thread has checked out; background threads simply keep theirs
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            conn = connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+def release_connection():
+    # Return this thread's connection to the pool (closed instead if the pool is full)
+    conn = getattr(_local, 'conn', None)
+    _local.conn = None
+    if conn is None or _local.pid != os.getpid():
+        return
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+def close_pool():
+    # Close the idle connections, e.g. before pointing DB_PATH at another file
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+@contextmanager
+def transaction():
+    # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait on busy_timeout
+    # instead of deadlocking when a read transaction tries to upgrade.
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+def fetch_one(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+def fetch_all(sql, params=()):
+    return get_connection().execute(sql, params).fetchall()
+
+def execute(sql, params=()):
+    with transaction() as conn:
+        return conn.execute(sql, params).lastrowid
+
+def today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+def to_iso_date(value):
+    # Legacy rows store MM/DD/YYYY
+    try:
+        return datetime.strptime(value, "%m/%d/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return value
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_outcome(value):
+    # Confirmed diagnosis label: 1 (disease), 0 (no disease) or None when not known yet
+    number = _number(value)
+    return int(number) if number in (0, 1) else None
+
+def record_values(data, prediction, score, date):
+    # Build an INSERT_RECORD row from a predict form payload
+    extras = {k: v for k, v in data.items() if k not in _NOT_EXTRA}
+    values = {
+        'patient_username': data.get('patientUsername') or data.get('patient_username'),
+        'name': data.get('p_name') or data.get('name') or 'Unknown',
+        'age': data.get('age'),
+        'sex': "Male" if str(data.get('sex')) in ("1", "1.0", "Male") else "Female",
+        'prediction': int(prediction),
+        'score': int(score),
+        'date': date,
+        'details': json.dumps(extras) if extras else '{}',
+        'mobile': data.get('mobile') or None,
+        'outcome': to_outcome(data.get('outcome'))
+    }
+    for f in RECORD_FEATURES:
+        values[f] = _number(data.get(f))
+    return tuple(values[c] for c in RECORD_COLUMNS)
+
+def record_to_dict(r):
+    details = {f: r[f] for f in RECORD_FEATURES if r[f] is not None}
+    if not details and r["details"] not in (None, '', '{}'):
+        # Row written before the typed columns existed and not backfilled yet
+        details = {k: v for k, v in json.loads(r["details"]).items() if k != 'patientPassword'}
+    else:
+        details['age'] = r["age"]
+        details['sex'] = 1 if r["sex"] == "Male" else 0
+        if r["mobile"]:
+            details['mobile'] = r["mobile"]
+    return {
+        "id": r["id"],
+        "patient_username": r["patient_username"],
+        "name": r["name"],
+        "age": r["age"],
+        "sex": r["sex"],
+        "prediction": r["prediction"],
+        "score": r["score"],
+        "date": r["date"],
+        "outcome": r["outcome"],
+        "details": details
+    }
+
+def appointment_to_dict(r):
+    appointment = {
+        "id": r["id"],
+        "patient_username": r["patient_username"],
+        "patient_name": r["patient_name"],
+        "appointment_date": r["appointment_date"],
+        "appointment_time": r["appointment_time"],
+        "reason": r["reason"],
+        "status": r["status"]
+    }
+    if "mobile" in r.keys():
+        appointment["mobile"] = r["mobile"]
+    return appointment
+
+def prescription_to_dict(r):
+    return {
+        "id": r["id"],
+        "patient_username": r["patient_username"],
+        "doctor_username": r["doctor_username"],
+        "medication": r["medication"],
+        "dosage": r["dosage"],
+        "frequency": r["frequency"],
+        "date": r["date"]
+    }
+
+# Appointment columns plus the patient's mobile number from their latest record that has one
+# (an index lookup per row through idx_records_patient, instead of the client matching records itself)
+APPOINTMENT_WITH_CONTACT = (
+    "a.*, (SELECT r.mobile FROM Records r WHERE r.patient_username = a.patient_username AND r.mobile IS NOT NULL "
+    "AND r.mobile != '' ORDER BY r.id DESC LIMIT 1) AS mobile"
+)
+
+def migrate_db(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(Records)")}
+    # Confirmed diagnosis, filled in later by a doctor; only labeled rows are used for retraining
+    if 'outcome' not in existing:
+        conn.execute("ALTER TABLE Records ADD COLUMN outcome INTEGER")
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 2:
+        for column in RECORD_FEATURES:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE Records ADD COLUMN {column} REAL")
+        if 'mobile' not in existing:
+            conn.execute("ALTER TABLE Records ADD COLUMN mobile TEXT")
+        conn.execute("PRAGMA user_version = 2")
+
+    # Until legacy rows are converted, /get_records filters and the dashboard stats would skip or
+    # misbucket them, so the backfill is part of the migration. It commits in chunks and only sets
+    # the final user_version once done, so an interrupted startup simply continues where it stopped.
+    has_rows = conn.execute("SELECT 1 FROM Records LIMIT 1").fetchone() or conn.execute("SELECT 1 FROM Prescriptions LIMIT 1").fetchone()
+    if has_rows:
+        print("Converting existing records to the typed schema...")
+    converted = backfill_records(conn=conn)
+    if has_rows:
+        print(f"Converted {converted} records.")
+
+def backfill_records(chunk_size=1000, conn=None):
+    # Move legacy details JSON into the typed columns and convert dates to ISO.
+    # Works through the table by id in chunks so memory stays bounded regardless of table size.
+    conn = conn or connect()
+    converted = 0
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT * FROM Records WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for r in rows:
+            if r["details"] in (None, '', '{}') and r["date"] == to_iso_date(r["date"]):
+                continue
+            data = json.loads(r["details"]) if r["details"] else {}
+            values = dict(zip(RECORD_COLUMNS, record_values(data, r["prediction"], r["score"], to_iso_date(r["date"]))))
+            for f in RECORD_FEATURES + ['mobile']:
+                if values[f] is None:
+                    values[f] = r[f]
+            updates.append(tuple(values[f] for f in ['date', 'details'] + RECORD_FEATURES + ['mobile']) + (r["id"],))
+        if updates:
+            assignments = ', '.join(f"{f} = ?" for f in ['date', 'details'] + RECORD_FEATURES + ['mobile'])
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(f"UPDATE Records SET {assignments} WHERE id = ?", updates)
+            conn.execute("COMMIT")
+            converted += len(updates)
+        last_id = rows[-1]["id"]
+
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT id, date FROM Prescriptions WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        updates = [(to_iso_date(r["date"]), r["id"]) for r in rows if to_iso_date(r["date"]) != r["date"]]
+        if updates:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE Prescriptions SET date = ? WHERE id = ?", updates)
+            conn.execute("COMMIT")
+        last_id = rows[-1]["id"]
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return converted
+
+# Dashboard aggregates kept up to date by triggers on Records, so /stats never scans the table.
+# A record is high risk when score > 50 (same rule as the UI); histogram buckets are 10 points wide.
+STATS_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS StatsRisk (risk TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS StatsScoreHistogram (bucket INTEGER PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS StatsDaily (day TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0, high_risk INTEGER NOT NULL DEFAULT 0)",
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_records_insert AFTER INSERT ON Records BEGIN
+        INSERT INTO StatsRisk (risk, count) VALUES (CASE WHEN NEW.score > 50 THEN 'high' ELSE 'low' END, 1)
+            ON CONFLICT(risk) DO UPDATE SET count = count + 1;
+        INSERT INTO StatsScoreHistogram (bucket, count) VALUES (MIN(MAX(NEW.score, 0) / 10, 9), 1)
+            ON CONFLICT(bucket) DO UPDATE SET count = count + 1;
+        INSERT INTO StatsDaily (day, count, high_risk) VALUES (NEW.date, 1, NEW.score > 50)
+            ON CONFLICT(day) DO UPDATE SET count = count + 1, high_risk = high_risk + excluded.high_risk;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_records_delete AFTER DELETE ON Records BEGIN
+        UPDATE StatsRisk SET count = count - 1 WHERE risk = CASE WHEN OLD.score > 50 THEN 'high' ELSE 'low' END;
+        UPDATE StatsScoreHistogram SET count = count - 1 WHERE bucket = MIN(MAX(OLD.score, 0) / 10, 9);
+        UPDATE StatsDaily SET count = count - 1, high_risk = high_risk - (OLD.score > 50) WHERE day = OLD.date;
+        DELETE FROM StatsDaily WHERE day = OLD.date AND count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_records_update AFTER UPDATE OF score, date ON Records BEGIN
+        UPDATE StatsRisk SET count = count - 1 WHERE risk = CASE WHEN OLD.score > 50 THEN 'high' ELSE 'low' END;
+        UPDATE StatsScoreHistogram SET count = count - 1 WHERE bucket = MIN(MAX(OLD.score, 0) / 10, 9);
+        UPDATE StatsDaily SET count = count - 1, high_risk = high_risk - (OLD.score > 50) WHERE day = OLD.date;
+        DELETE FROM StatsDaily WHERE day = OLD.date AND count <= 0;
+        INSERT INTO StatsRisk (risk, count) VALUES (CASE WHEN NEW.score > 50 THEN 'high' ELSE 'low' END, 1)
+            ON CONFLICT(risk) DO UPDATE SET count = count + 1;
+        INSERT INTO StatsScoreHistogram (bucket, count) VALUES (MIN(MAX(NEW.score, 0) / 10, 9), 1)
+            ON CONFLICT(bucket) DO UPDATE SET count = count + 1;
+        INSERT INTO StatsDaily (day, count, high_risk) VALUES (NEW.date, 1, NEW.score > 50)
+            ON CONFLICT(day) DO UPDATE SET count = count + 1, high_risk = high_risk + excluded.high_risk;
+    END
+    '''
+]
+
+# Per-table change counters bumped by triggers on every write. List endpoints derive their
+# ETag / Last-Modified from them, so an unchanged table is answered with 304 without being queried.
+VERSIONED_TABLES = ['Records', 'Appointments', 'Prescriptions', 'Users']
+VERSION_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS TableVersions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, modified_at REAL NOT NULL DEFAULT 0)"
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_version_{table.lower()}_{op.lower()} AFTER {op} ON {table} BEGIN
+        UPDATE TableVersions SET version = version + 1, modified_at = (julianday('now') - 2440587.5) * 86400.0 WHERE name = '{table}';
+    END
+    """
+    for table in VERSIONED_TABLES for op in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+def init_table_versions(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    for statement in VERSION_SCHEMA:
+        conn.execute(statement)
+    conn.executemany("INSERT OR IGNORE INTO TableVersions (name, version, modified_at) VALUES (?, 0, (julianday('now') - 2440587.5) * 86400.0)",
+                     [(table,) for table in VERSIONED_TABLES])
+    conn.execute("COMMIT")
+
+def table_versions(tables):
+    # {table: (version, modified_at unix time)}
+    rows = fetch_all(f"SELECT name, version, modified_at FROM TableVersions WHERE name IN ({', '.join('?' * len(tables))})", tables)
+    return {r["name"]: (r["version"], r["modified_at"]) for r in rows}
+
+# Row-level change log behind the /changes feed (see change_feed.py). Triggers note which row of
+# Records, Appointments or Prescriptions was written and for which patient; the feed then reads
+# the current rows by id, so clients apply small deltas instead of reloading whole tables.
+CHANGE_TABLES = ['Records', 'Appointments', 'Prescriptions']
+CHANGE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        patient_username TEXT,
+        op TEXT NOT NULL, -- insert, update, delete, bulk
+        created_at REAL NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_changelog_patient ON ChangeLog(patient_username, id)",
+    "CREATE INDEX IF NOT EXISTS idx_changelog_created ON ChangeLog(created_at)"
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_changes_{table.lower()}_{op.lower()} AFTER {op} ON {table} BEGIN
+        INSERT INTO ChangeLog (table_name, row_id, patient_username, op, created_at)
+            VALUES ('{table}', {row}.id, {row}.patient_username, '{op.lower()}', (julianday('now') - 2440587.5) * 86400.0);
+    END
+    """
+    for table in CHANGE_TABLES for op, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+]
+
+# Inserts of at least BULK_MIN_ROWS rows (imports, /predict_batch, the data generator) skip the
+# per-row insert triggers above: bulk_insert() drops them inside the caller's transaction, inserts,
+# applies their effect with one statement per aggregate and recreates them before the commit.
+# The write lock is held throughout, so no other connection ever writes while they are missing.
+# Instead of a ChangeLog row per record, the batch gets one 'bulk' entry for every patient
+# (patient_username BULK_PATIENT), which tells /changes clients to reload.
+BULK_MIN_ROWS = 256
+BULK_PATIENT = '*'
+NOW_UNIX = "(julianday('now') - 2440587.5) * 86400.0"
+
+def bulk_insert(conn, table, sql, values):
+    # Runs executemany(sql, values) on `table` inside the caller's transaction
+    values = values if isinstance(values, list) else list(values)
+    if len(values) < BULK_MIN_ROWS:
+        conn.executemany(sql, values)
+        return
+    triggers = [t for t in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))
+                if t['name'].startswith('trg_') and t['name'].endswith('_insert')]
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    for t in triggers:
+        conn.execute(f"DROP TRIGGER {t['name']}")
+    conn.executemany(sql, values)
+
+    # AUTOINCREMENT ids: everything past last_id is this batch
+    if table == 'Records':
+        conn.execute("INSERT INTO StatsRisk (risk, count) SELECT CASE WHEN score > 50 THEN 'high' ELSE 'low' END, COUNT(*) "
+                     "FROM Records WHERE id > ? GROUP BY 1 ON CONFLICT(risk) DO UPDATE SET count = count + excluded.count", (last_id,))
+        conn.execute("INSERT INTO StatsScoreHistogram (bucket, count) SELECT MIN(MAX(score, 0) / 10, 9), COUNT(*) "
+                     "FROM Records WHERE id > ? GROUP BY 1 ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count", (last_id,))
+        conn.execute("INSERT INTO StatsDaily (day, count, high_risk) SELECT date, COUNT(*), SUM(score > 50) FROM Records WHERE id > ? GROUP BY date "
+                     "ON CONFLICT(day) DO UPDATE SET count = count + excluded.count, high_risk = high_risk + excluded.high_risk", (last_id,))
+    if table in VERSIONED_TABLES:
+        conn.execute(f"UPDATE TableVersions SET version = version + 1, modified_at = {NOW_UNIX} WHERE name = ?", (table,))
+    if table in CHANGE_TABLES:
+        conn.execute(f"INSERT INTO ChangeLog (table_name, row_id, patient_username, op, created_at) VALUES (?, ?, ?, 'bulk', {NOW_UNIX})",
+                     (table, last_id, BULK_PATIENT))
+
+    for t in triggers:
+        conn.execute(t['sql'])
+
+def init_change_log(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    for statement in CHANGE_SCHEMA:
+        conn.execute(statement)
+    conn.execute("COMMIT")
+
+# ChangeLog entries older than CARDIO_CHANGELOG_RETENTION seconds are deleted at startup (init_db),
+# on the job worker's hourly maintenance tick (server.py) and by the /changes poller, so the log
+# stays bounded whether or not a dashboard is connected
+CHANGELOG_RETENTION = float(os.environ.get('CARDIO_CHANGELOG_RETENTION', 86400))
+
+def prune_change_log(conn, retention_seconds=CHANGELOG_RETENTION):
+    return conn.execute("DELETE FROM ChangeLog WHERE created_at < ?", (time.time() - retention_seconds,)).rowcount
+
+def rebuild_stats(conn):
+    # Recompute the aggregates from scratch (one full scan); the triggers keep them current afterwards
+    conn.execute("DELETE FROM StatsRisk")
+    conn.execute("DELETE FROM StatsScoreHistogram")
+    conn.execute("DELETE FROM StatsDaily")
+    conn.execute("INSERT INTO StatsRisk (risk, count) SELECT CASE WHEN score > 50 THEN 'high' ELSE 'low' END, COUNT(*) FROM Records GROUP BY 1")
+    conn.execute("INSERT INTO StatsScoreHistogram (bucket, count) SELECT MIN(MAX(score, 0) / 10, 9), COUNT(*) FROM Records GROUP BY 1")
+    conn.execute("INSERT INTO StatsDaily (day, count, high_risk) SELECT date, COUNT(*), SUM(score > 50) FROM Records GROUP BY date")
+
+def init_stats(conn):
+    is_new = not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='StatsRisk'").fetchone()
+    conn.execute("BEGIN IMMEDIATE")
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    if is_new:
+        rebuild_stats(conn)
+    conn.execute("COMMIT")
 
 def init_db():
-    conn = sqlite3.connect('database.db')
+    conn = connect()
     c = conn.cursor()
     
     # Create Users Table
@@ -58,7 +515,28 @@ def init_db():
         )
     ''')
 
-    
+
+    migrate_db(conn)
+
+    # Indexes for the filtered /get_records queries (newest first, keyset paginated on id)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_patient ON Records(patient_username, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_risk ON Records((score > 50), id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_date ON Records(date)")
+    # Incremental retraining reads labeled rows past a watermark id (ML/retrain_incremental.py)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_labeled ON Records(id) WHERE outcome IS NOT NULL")
+    # Per-patient appointment and prescription lists (dashboards, /get_appointments?patient=...)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_patient ON Appointments(patient_username, appointment_date, appointment_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient ON Prescriptions(patient_username, id)")
+
+    # Keys of background save_prediction jobs already written (server.persist_predictions)
+    c.execute("CREATE TABLE IF NOT EXISTS PersistedJobs (key TEXT PRIMARY KEY, created_at REAL NOT NULL)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_persisted_jobs_created ON PersistedJobs(created_at)")
+
+    init_stats(conn)
+    init_table_versions(conn)
+    init_change_log(conn)
+    prune_change_log(conn)
+
     # Insert default doctor if not exists
     c.execute("SELECT * FROM Users WHERE username='doctor'")
     if not c.fetchone():
@@ -70,3 +548,12 @@ def init_db():
 
 if __name__ == '__main__':
     init_db()
+    if '--backfill' in sys.argv:
+        chunk_size = int(sys.argv[sys.argv.index('--chunk-size') + 1]) if '--chunk-size' in sys.argv else 1000
+        print(f"Backfilled {backfill_records(chunk_size)} records.")
+    if '--rebuild-stats' in sys.argv:
+        conn = connect()
+        conn.execute("BEGIN IMMEDIATE")
+        rebuild_stats(conn)
+        conn.execute("COMMIT")
+        print("Dashboard statistics rebuilt.")
@@ -0,0 +1,123 @@
+import sys
+import numpy as np
+
+
+class FlatForest:
+    # All trees of a fitted RandomForestClassifier flattened into contiguous NumPy arrays.
+    # Node i of the forest is described by feature[i], threshold[i], left[i], right[i] and value[i].
+    # Leaves point to themselves so every row can be pushed down `max_depth` levels without masking.
+    # predict_proba reproduces sklearn bit for bit: inputs are rounded to float32 like sklearn does,
+    # per-tree leaf probabilities are accumulated in tree order and divided by the number of trees.
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, n_features, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if not hasattr(model, 'estimators_'):
+            raise TypeError(f"Cannot flatten {type(model).__name__}: not a fitted tree ensemble")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own_index = np.arange(offset, offset + n)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, own_index, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own_index, tree.children_right + offset))
+
+            # Leaf class probabilities exactly as DecisionTreeClassifier.predict_proba returns them.
+            # Newer sklearn stores fractions in tree_.value, older versions store counts.
+            proba = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            if not np.allclose(normalizer, 1.0):
+                normalizer[normalizer == 0.0] = 1.0
+                proba = proba / normalizer
+            values.append(proba)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_,
+            max_depth=max_depth
+        )
+
+    def apply(self, X):
+        # Leaf node index of every (row, tree) pair
+        with np.errstate(over='ignore'): # too large for float32 becomes inf and is refused below
+            X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        # sklearn refuses these too; NaN would silently take the right branch at every split
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN, infinity or a value too large for float32")
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # cumsum accumulates strictly in tree order, matching sklearn's running sum
+        proba = np.cumsum(self.value[leaves], axis=1)[:, -1]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, path):
+        # .joblib artifacts can be loaded with mmap_mode='r' so several processes share one copy of the arrays
+        if str(path).endswith('.joblib'):
+            import joblib
+            joblib.dump(self, path)
+            return
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 value=self.value, roots=self.roots, classes=self.classes_,
+                 n_features=self.n_features_in_, max_depth=self.max_depth)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        if str(path).endswith('.joblib'):
+            import joblib
+            return joblib.load(path, mmap_mode=mmap_mode)
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+if __name__ == '__main__':
+    # Export step: python flat_forest.py [ML/heart_model.pkl] [ML/heart_model_flat.npz | ML/heart_model.flat.joblib]
+    import joblib
+
+    src = sys.argv[1] if len(sys.argv) > 1 else 'ML/heart_model.pkl'
+    dst = sys.argv[2] if len(sys.argv) > 2 else 'ML/heart_model_flat.npz'
+    flat = FlatForest.from_sklearn(joblib.load(src))
+    flat.save(dst)
+    print(f"Flattened {len(flat.roots)} trees ({len(flat.feature)} nodes) into {dst}")
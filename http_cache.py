@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import os
+import re
+import threading
+from functools import wraps
+from flask import request, Response
+from database import table_versions
+
+try:
+    import brotli # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+# HTTP caching helpers used by server.py:
+#   - conditional(...) gives JSON list endpoints an ETag / Last-Modified derived from the
+#     trigger-maintained table versions (database.TableVersions) and answers 304 before querying;
+#   - compress_response() negotiates br / gzip for text responses;
+#   - fingerprinted HTML/asset serving: pages reference CSS/JS as "file?v=<content hash>", and
+#     requests carrying the current hash are cached by browsers for a year.
+
+COMPRESS_MIN_BYTES = 1024
+# File responses (send_from_directory) are compressed in memory only up to this size; larger files,
+# such as CSV exports from /jobs/<id>/download, are streamed from disk as they are
+COMPRESS_MAX_FILE_BYTES = 512 * 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/css', 'text/csv',
+                      'text/plain', 'text/javascript', 'application/javascript')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+def conditional(*tables):
+    # Decorator: the response only changes when one of `tables` is written (or the query string differs).
+    # Instead of table names, a single function returning them can be given for query-dependent views.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            names = list(tables[0]() if len(tables) == 1 and callable(tables[0]) else tables)
+            versions = table_versions(names)
+            state = ";".join(f"{t}={versions.get(t, (0, 0))[0]}" for t in names) + "|" + request.full_path
+            etag = hashlib.sha1(state.encode()).hexdigest()[:20]
+            modified_at = max((v[1] for v in versions.values()), default=0) or None
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if modified_at:
+                response.last_modified = int(modified_at)
+            response.headers['Cache-Control'] = REVALIDATE_CACHE
+            return response
+        return wrapper
+    return decorator
+
+
+def _encode(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    # after_request hook: compresses buffered text responses above COMPRESS_MIN_BYTES, and file
+    # responses (which count as streamed) up to COMPRESS_MAX_FILE_BYTES
+    if (response.status_code != 200 or (response.is_streamed and not response.direct_passthrough)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    if response.direct_passthrough and (response.content_length is None or response.content_length > COMPRESS_MAX_FILE_BYTES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong ETag belongs to one exact byte sequence; the compressed body is a different one
+        etag = f"{etag}-{encoding}"
+        if request.if_none_match.contains(etag):
+            response.close()
+            not_modified = Response(status=304, headers={'Cache-Control': response.headers.get('Cache-Control', REVALIDATE_CACHE)})
+            not_modified.set_etag(etag)
+            not_modified.vary.add('Accept-Encoding')
+            return not_modified
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(_encode(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        response.set_etag(etag)
+    return response
+
+
+class StaticAssets:
+    # Content hashes of the CSS/JS files and the HTML pages rewritten to reference them.
+    # Both are cached per file modification time, so edits show up without a restart.
+
+    ASSET_REF = re.compile(r'''((?:src|href)=")((?:CSS|JS)/[^"?#]+)(?:\?[^"#]*)?"''')
+
+    def __init__(self, root='.'):
+        self.root = root
+        self._hashes = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def fingerprint(self, name):
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        cached = self._hashes.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[name] = (mtime, digest)
+        return digest
+
+    def page(self, name):
+        # (html, etag) with local asset references fingerprinted
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        cached = self._pages.get(name)
+        if cached and cached[0] == mtime:
+            html = cached[1]
+        else:
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            with self._lock:
+                self._pages[name] = (mtime, html)
+
+        def add_hash(match):
+            asset = match.group(2)
+            if not os.path.isfile(self._path(asset)):
+                return match.group(0)
+            return f'{match.group(1)}{asset}?v={self.fingerprint(asset)}"'
+
+        html = self.ASSET_REF.sub(add_hash, html)
+        return html, hashlib.sha1(html.encode()).hexdigest()[:20]
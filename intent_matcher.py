@@ -0,0 +1,174 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Keyword intent matching for /chat. The knowledge base (chat_intents.json) is compiled into one
+# Aho-Corasick automaton, so a message is scanned once no matter how many intents there are.
+# The automaton walks the message one character at a time in Python, though, so small knowledge
+# bases (up to LINEAR_MAX_KEYWORDS keywords) are matched by searching for each keyword with str.find
+# instead; benchmarks/chat_bench.py shows where the two cross over. Both give the same results.
+#   {"default": "...", "intents": [{"name": "diet", "keywords": ["diet*", "eat"], "response": "..."}]}
+# Keywords match whole words only ("hi" does not match "chip"); a trailing * allows any word ending
+# ("smok*" matches "smoking"). Each matched keyword adds its word count to its intent's score, so
+# phrases like "heart attack" outweigh single words. Ties go to the intent listed first.
+
+INTENTS_PATH = 'chat_intents.json'
+LINEAR_MAX_KEYWORDS = 100
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class CompiledIntents:
+
+    def __init__(self, data, linear_max_keywords=LINEAR_MAX_KEYWORDS):
+        self.default = data["default"]
+        self.names = []
+        self.responses = []
+        # Trie as a list of {char: node}; fail links and per-node outputs (keyword ids) alongside
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._keywords = [] # keyword id -> (length, intent index, weight, whole_word)
+        self._linear = [] # (keyword, keyword id, whole_word) for the str.find search
+
+        for intent in data["intents"]:
+            index = len(self.names)
+            self.names.append(intent.get("name", f"intent{index}"))
+            self.responses.append(intent["response"])
+            for keyword in intent["keywords"]:
+                self._add(keyword, index)
+        self._build_fail_links()
+        self.linear = len(self._keywords) <= linear_max_keywords
+
+    def _add(self, keyword, intent_index):
+        keyword = _WHITESPACE.sub(' ', keyword.strip().lower())
+        whole_word = not keyword.endswith('*')
+        keyword = keyword.rstrip('*')
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self._keywords))
+        self._keywords.append((len(keyword), intent_index, len(keyword.split(' ')), whole_word))
+        self._linear.append((keyword, len(self._keywords) - 1, whole_word))
+
+    def _build_fail_links(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scores(self, message):
+        # {intent index: score}
+        text = _WHITESPACE.sub(' ', message.lower())
+        matched = self._scan_linear(text) if self.linear else self._scan(text)
+        scores = {}
+        for keyword_id in matched:
+            _, intent_index, weight, _ = self._keywords[keyword_id]
+            scores[intent_index] = scores.get(intent_index, 0) + weight
+        return scores
+
+    def _scan_linear(self, text):
+        # Ids of the keywords found in text, searching for each keyword in turn
+        matched = []
+        end_of_text = len(text)
+        for keyword, keyword_id, whole_word in self._linear:
+            if keyword not in text:
+                continue
+            start = text.find(keyword)
+            while start != -1:
+                end = start + len(keyword)
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (not whole_word or end == end_of_text or not text[end].isalnum()):
+                    matched.append(keyword_id)
+                    break
+                start = text.find(keyword, start + 1)
+        return matched
+
+    def _scan(self, text):
+        # Ids of the keywords found in text, from a single pass of the automaton
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self._keywords
+        matched = set()
+        node = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword_id in out[node]:
+                if keyword_id in matched:
+                    continue
+                length, _, _, whole_word = keywords[keyword_id]
+                start = i - length + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if whole_word and i < last and text[i + 1].isalnum():
+                    continue
+                matched.add(keyword_id)
+        return matched
+
+    def match(self, message):
+        # (intent name or None, response)
+        scores = self.scores(message)
+        if not scores:
+            return None, self.default
+        best = min(scores, key=lambda index: (-scores[index], index))
+        return self.names[best], self.responses[best]
+
+
+class IntentMatcher:
+    # Serves matches from the compiled knowledge base and recompiles it when the file changes.
+    # A broken edit is reported and ignored; the previous version keeps answering.
+
+    def __init__(self, path=INTENTS_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self.last_error = None
+        self.reload()
+
+    def reload(self):
+        # Recompiles if the file changed since the last load; returns True when it did
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self._mtime:
+                    return False
+                with open(self.path) as f:
+                    compiled = CompiledIntents(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.last_error = f"Error loading {self.path}: {e}"
+                print(self.last_error)
+                return False
+            self._compiled = compiled
+            self._mtime = mtime
+            self.last_error = None
+            return True
+
+    def match(self, message):
+        if time.monotonic() - self._checked_at > self.check_interval:
+            self.reload()
+        compiled = self._compiled
+        if compiled is None:
+            raise RuntimeError(self.last_error or "No intents loaded")
+        return compiled.match(message)
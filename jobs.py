@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from database import connect
+from metrics import set_route
+
+# Local background job queue stored in its own SQLite file (no external broker).
+# Jobs survive restarts: a job is claimed with a lease, and a worker that dies mid-job simply lets
+# the lease expire so another worker (in this or another serve.py process) picks it up again.
+# Handlers registered with batch=True get every claimed job of their kind in one call, which lets
+# them group-commit the whole batch in a single transaction.
+# Delivery is at least once: a handler's own writes and the job's "done" mark are separate commits,
+# so a worker that dies in between runs the job again. Handlers must be idempotent.
+
+# Runtime data (jobs.db, exports) lives in CARDIO_DATA_DIR, outside the tree the app serves as static files
+DATA_DIR = os.environ.get('CARDIO_DATA_DIR', 'instance')
+JOBS_DB = os.environ.get('CARDIO_JOBS_DB', os.path.join(DATA_DIR, 'jobs.db'))
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS Jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued', -- queued, running, done, failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_after REAL NOT NULL,
+        lease_until REAL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON Jobs(status, run_after, id)"
+]
+
+
+class JobQueue:
+
+    def __init__(self, path=None, batch_size=64, poll_interval=0.2, lease_seconds=300.0):
+        self.path = path or JOBS_DB
+        self.batch_size = max(1, int(batch_size))
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._handlers = {} # kind -> (fn, batch, lease_seconds)
+        self._maintenance = [] # fn() run on the hourly tick, after old jobs are pruned
+        self._initialized = False
+        self._reset()
+
+        # The worker thread does not survive fork(); serve.py workers start their own on demand
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._wake = threading.Condition()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Two connections per process: the worker thread's own, and one shared by every other
+        # thread (enqueue, status lookups) behind _conn_lock. Job queue statements are short, so
+        # request threads wait on the lock far less than they would on SQLite's write lock anyway.
+        self._conn_lock = threading.RLock()
+        self._shared_conn = None
+        self._worker_conn = None
+
+    def _open(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = connect(self.path)
+        if not self._initialized:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._initialized = True
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        if self._thread is not None and threading.current_thread() is self._thread:
+            if self._worker_conn is None:
+                self._worker_conn = self._open()
+            yield self._worker_conn
+            return
+        with self._conn_lock:
+            if self._shared_conn is None:
+                self._shared_conn = self._open()
+            yield self._shared_conn
+
+    def register(self, kind, fn, batch=False, lease_seconds=None):
+        # fn(payload) -> result, or with batch=True fn([payload, ...]) -> [result, ...].
+        # lease_seconds bounds how long a job may run before another worker assumes it died.
+        self._handlers[kind] = (fn, batch, lease_seconds or self.lease_seconds)
+
+    def add_maintenance(self, fn):
+        self._maintenance.append(fn)
+
+    def enqueue(self, kind, payload, max_attempts=5):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        now = time.time()
+        with self._conn() as conn:
+            job_id = conn.execute(
+                "INSERT INTO Jobs (kind, payload, max_attempts, run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), max_attempts, now, now, now)).lastrowid
+        self.start()
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def get(self, job_id):
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM Jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_to_dict(row) if row else None
+
+    def recent(self, status=None, limit=50):
+        with self._conn() as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM Jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM Jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [job_to_dict(r) for r in rows]
+
+    def counts(self):
+        with self._conn() as conn:
+            rows = conn.execute("SELECT kind, status, COUNT(*) AS n FROM Jobs GROUP BY kind, status").fetchall()
+        return [(r["kind"], r["status"], r["n"]) for r in rows]
+
+    def pending(self):
+        # True if jobs are waiting to run, or were running when a previous process stopped
+        with self._conn() as conn:
+            return conn.execute("SELECT 1 FROM Jobs WHERE status IN ('queued', 'running') LIMIT 1").fetchone() is not None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+                self._thread.start()
+
+    def _claim(self):
+        # Oldest ready jobs (queued, or running with an expired lease), marked running in one transaction
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT * FROM Jobs WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY id LIMIT ?", (now, now, self.batch_size)).fetchall()
+                if rows:
+                    conn.executemany("UPDATE Jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                                     [(now + self._handlers.get(r["kind"], (None, None, self.lease_seconds))[2], now, r["id"]) for r in rows])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _finish(self, job, result=None, error=None):
+        now = time.time()
+        with self._conn() as conn:
+            if error is None:
+                # Payloads hold form data; drop them once done
+                conn.execute("UPDATE Jobs SET status = 'done', payload = '{}', result = ?, error = NULL, lease_until = NULL, updated_at = ? WHERE id = ?",
+                             (json.dumps(result), now, job["id"]))
+            elif job["attempts"] + 1 >= job["max_attempts"]:
+                conn.execute("UPDATE Jobs SET status = 'failed', payload = '{}', error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                             (error, now, job["id"]))
+            else:
+                # Exponential backoff: 0.5s, 1s, 2s, ... capped at 30s
+                delay = min(30.0, 0.5 * 2 ** job["attempts"])
+                conn.execute("UPDATE Jobs SET status = 'queued', error = ?, run_after = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                             (error, now + delay, now, job["id"]))
+
+    def _process(self, jobs):
+        by_kind = {}
+        for job in jobs:
+            by_kind.setdefault(job["kind"], []).append(job)
+
+        for kind, group in by_kind.items():
+            set_route(f"job:{kind}")
+            handler = self._handlers.get(kind)
+            if handler is None:
+                for job in group:
+                    self._finish(job, error=f"No handler for job kind '{kind}'")
+                continue
+            fn, batch, _ = handler
+            if batch and len(group) > 1:
+                try:
+                    results = fn([json.loads(job["payload"]) for job in group])
+                except Exception:
+                    # Retry one by one so a single bad job cannot fail the others
+                    traceback.print_exc()
+                else:
+                    with self._conn() as conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        try:
+                            for job, result in zip(group, results):
+                                self._finish(job, result)
+                            conn.execute("COMMIT")
+                        except Exception as e:
+                            # The jobs stay running and are retried once their lease expires
+                            conn.execute("ROLLBACK")
+                            print(f"Job queue error: {e}")
+                    continue
+            for job in group:
+                try:
+                    payload = json.loads(job["payload"])
+                    result = fn([payload])[0] if batch else fn(payload)
+                    self._finish(job, result)
+                except Exception as e:
+                    print(f"Job {job['id']} ({kind}) failed: {e}")
+                    self._finish(job, error=str(e))
+
+    def _run(self):
+        last_prune = 0.0
+        while True:
+            try:
+                jobs = self._claim()
+            except Exception as e:
+                print(f"Job queue error: {e}")
+                jobs = []
+            if jobs:
+                try:
+                    self._process(jobs)
+                except Exception as e:
+                    print(f"Job queue error: {e}")
+                continue
+            if time.monotonic() - last_prune > 3600:
+                last_prune = time.monotonic()
+                for fn in [self.prune] + self._maintenance:
+                    try:
+                        fn()
+                    except Exception as e:
+                        print(f"Job queue maintenance error: {e}")
+            with self._wake:
+                self._wake.wait(self.poll_interval)
+
+    def wait(self, job_id, timeout=10.0):
+        # Blocks until the job is done or failed (used by scripts and tests)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get(job_id)
+            if job and job["status"] in ('done', 'failed'):
+                return job
+            time.sleep(0.01)
+        return self.get(job_id)
+
+    def prune(self, older_than_seconds=86400.0, failed_older_than_seconds=7 * 86400.0):
+        # Failed jobs are kept longer so their errors can be looked at
+        now = time.time()
+        with self._conn() as conn:
+            return conn.execute(
+                "DELETE FROM Jobs WHERE (status = 'done' AND updated_at < ?) OR (status = 'failed' AND updated_at < ?)",
+                (now - older_than_seconds, now - failed_older_than_seconds)).rowcount
+
+
+def job_to_dict(r):
+    return {
+        "id": r["id"],
+        "kind": r["kind"],
+        "status": r["status"],
+        "attempts": r["attempts"],
+        "max_attempts": r["max_attempts"],
+        "result": json.loads(r["result"]) if r["result"] else None,
+        "error": r["error"],
+        "created_at": r["created_at"],
+        "updated_at": r["updated_at"]
+    }
@@ -0,0 +1,176 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics exported in the Prometheus text format on /metrics.
+# Every process keeps its own numbers; under serve.py each worker answers /metrics for itself
+# (the pid label tells them apart).
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        value = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        key = tuple(str(v) for v in labelvalues)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            labels = list(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', repr(float(bound)))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        h = Histogram(name, help, labelnames, buckets)
+        self._histograms.append(h)
+        return h
+
+    def register_collector(self, fn):
+        # fn() -> list of (name, type, help, [(labels dict, value), ...]) evaluated at scrape time
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for h in self._histograms:
+            lines.extend(h.render())
+        for fn in self._collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                lines.append(f"# collector {getattr(fn, '__name__', fn)} failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'cardio_request_duration_seconds', 'Time to handle an HTTP request', ['route', 'method', 'status'])
+SPAN_LATENCY = REGISTRY.histogram(
+    'cardio_span_duration_seconds', 'Time spent in individual hot-path stages of a request', ['route', 'span'])
+
+_current = threading.local()
+
+
+def set_route(route):
+    _current.route = route
+
+
+@contextmanager
+def span(name):
+    # Times one stage of the current request, e.g. span('predict_proba') or span('db.insert_record')
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPAN_LATENCY.observe(time.perf_counter() - start, getattr(_current, 'route', None) or 'none', name)
+
+
+def _process_collector():
+    return [("cardio_process_info", "gauge", "Process serving this scrape", [({"pid": os.getpid()}, 1)])]
+
+
+REGISTRY.register_collector(_process_collector)
+
+
+class SlowRequestProfiler:
+    # Opt-in sampling profiler (CARDIO_PROFILE_SLOW_MS). A background thread samples the stacks of
+    # threads that are serving requests every `interval` seconds. When a request turns out slower
+    # than `threshold`, its samples are appended to `output` in the collapsed "frame;frame;frame count"
+    # format that flamegraph.pl and speedscope read directly.
+
+    def __init__(self, threshold_ms, interval_ms=5.0, output='profiles/slow_requests.folded'):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.output = output
+        self._active = {} # thread id -> (route, start, {stack: count})
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._sample_loop, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+
+    def begin(self, route):
+        self.start() # also restarts the sampler in forked workers
+        with self._lock:
+            self._active[threading.get_ident()] = (route, time.perf_counter(), {})
+
+    def end(self):
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+        if entry is None:
+            return
+        route, start, samples = entry
+        if time.perf_counter() - start < self.threshold or not samples:
+            return
+        os.makedirs(os.path.dirname(self.output) or '.', exist_ok=True)
+        with open(self.output, 'a') as f:
+            for stack, count in samples.items():
+                f.write(f"{route};{stack} {count}\n")
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, (_, _, samples) in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    key = ";".join(reversed(stack))
+                    samples[key] = samples.get(key, 0) + 1
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from flat_forest import FlatForest
+from tree_shap import ForestExplainer
+
+# Versioned artifacts are dropped into MODEL_DIR as heart_model_v<N>.pkl; the highest N wins.
+# Without any, the legacy ML/heart_model.pkl written by ML/train_model.py is used.
+MODEL_DIR = 'ML/models'
+DEFAULT_MODEL = 'ML/heart_model.pkl'
+VERSIONED_ARTIFACT = re.compile(r'^heart_model_v(\d+)\.pkl$')
+
+# A typical patient row used to warm the model up before it serves traffic
+WARMUP_ROW = [55, 1, 1, 130, 240, 0, 1, 150, 0, 1.0]
+
+
+class LoadedModel:
+    # One immutable model version. Requests keep a reference to the instance they started with,
+    # so a hot swap never changes the model underneath an in-flight request.
+
+    def __init__(self, model, version, path, mtime, metadata=None):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.mtime = mtime
+        self.metadata = metadata or {}
+        self.loaded_at = time.time()
+
+        # Scoring goes through the flattened forest when the model is a tree ensemble
+        self.predictor = model
+        flat_path = os.path.splitext(path)[0] + '.flat.joblib'
+        try:
+            if flat_matches(flat_path, path, mtime, self.metadata):
+                self.predictor = FlatForest.load(flat_path, mmap_mode=model_mmap_mode())
+            else:
+                self.predictor = FlatForest.from_sklearn(model)
+        except Exception as e:
+            print(f"Using sklearn predict_proba for model {version} ({e})")
+
+        # Per-feature risk contributions; the leaf paths and lookup tables are built once per version
+        self.explainer = None
+        try:
+            self.explainer = ForestExplainer.from_sklearn(model)
+        except Exception as e:
+            print(f"Explanations unavailable for model {version} ({e})")
+
+    @property
+    def classes_(self):
+        return self.predictor.classes_
+
+    def predict_proba(self, X):
+        return self.predictor.predict_proba(X)
+
+    def explain(self, X):
+        # (rows, features) contributions to the class 1 probability, relative to explainer.expected_value
+        if self.explainer is None:
+            raise ValueError(f"Model {self.version} does not support explanations")
+        return self.explainer.shap_values(X)
+
+    def info(self):
+        info = {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "evaluator": type(self.predictor).__name__,
+            "explanations": self.explainer is not None
+        }
+        if self.metadata:
+            info["params"] = self.metadata.get("params")
+            info["metrics"] = self.metadata.get("metrics")
+            info["trained_at"] = self.metadata.get("created_at")
+        return info
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def flat_matches(flat_path, path, mtime, metadata):
+    # Whether the pre-flattened forest next to an artifact was exported from it. train_pipeline.publish
+    # writes it before the .pkl and records the .pkl's hash in the sidecar; without a recorded hash
+    # the flat file must be newer than the .pkl.
+    if not os.path.exists(flat_path):
+        return False
+    expected = metadata.get('artifact_sha256')
+    if expected:
+        return file_sha256(path) == expected
+    return os.path.getmtime(flat_path) >= mtime
+
+
+def read_metadata(path):
+    # Sidecar written next to versioned artifacts by ML/train_pipeline.py (heart_model_v<N>.json)
+    sidecar = os.path.splitext(path)[0] + '.json'
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar) as f:
+        return json.load(f)
+
+
+def validate_model(model, metadata, expected_features):
+    # Refuse artifacts trained on a different feature order than the server sends
+    n_features = getattr(model, 'n_features_in_', None)
+    if metadata:
+        features = metadata.get('features')
+        if expected_features and features != list(expected_features):
+            raise ValueError(f"model was trained on features {features}, server sends {list(expected_features)}")
+        if n_features is not None and features and n_features != len(features):
+            raise ValueError(f"metadata lists {len(features)} features but the model expects {n_features}")
+        classes = metadata.get('classes')
+        if classes is not None and hasattr(model, 'classes_') and [int(c) for c in model.classes_] != classes:
+            raise ValueError(f"metadata classes {classes} do not match the model's {list(model.classes_)}")
+    elif expected_features and n_features is not None and n_features != len(expected_features):
+        raise ValueError(f"model expects {n_features} features, server sends {len(expected_features)}")
+
+
+def model_mmap_mode():
+    # CARDIO_MODEL_MMAP=r memory-maps the model arrays so worker processes share one copy
+    return os.environ.get('CARDIO_MODEL_MMAP') or None
+
+
+class ModelRegistry:
+
+    def __init__(self, model_dir=MODEL_DIR, default_path=DEFAULT_MODEL, warmup_runs=None, watch_interval=None, expected_features=None):
+        self.model_dir = model_dir
+        self.default_path = default_path
+        self.expected_features = expected_features
+        self.warmup_runs = int(os.environ.get('CARDIO_MODEL_WARMUP', 3)) if warmup_runs is None else warmup_runs
+        self.watch_interval = float(os.environ.get('CARDIO_MODEL_WATCH_SECONDS', 0)) if watch_interval is None else watch_interval
+
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._failed = {} # failed_key() -> error of artifacts that did not load; retried only once changed
+        self.last_error = None
+
+        # After fork() the watcher thread is gone and the lock may be held by a thread that no longer exists
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._load_lock = threading.Lock()
+        if self._watcher is not None:
+            self._watcher = None
+            self.start_watcher()
+
+    def artifacts(self):
+        # (path, version, mtime) of every artifact on disk, newest version first, the legacy default last
+        versions = []
+        if os.path.isdir(self.model_dir):
+            for name in os.listdir(self.model_dir):
+                match = VERSIONED_ARTIFACT.match(name)
+                if match:
+                    versions.append((int(match.group(1)), os.path.join(self.model_dir, name)))
+        found = []
+        for number, path in sorted(versions, reverse=True):
+            try:
+                found.append((path, f"v{number}", os.path.getmtime(path)))
+            except OSError: # removed while listing
+                pass
+        if os.path.exists(self.default_path):
+            mtime = os.path.getmtime(self.default_path)
+            found.append((self.default_path, f"default-{int(mtime)}", mtime))
+        return found
+
+    def latest_artifact(self):
+        # (path, version, mtime) of the newest artifact on disk, or None
+        found = self.artifacts()
+        return found[0] if found else None
+
+    def _load(self, path, version, mtime):
+        import joblib # deferred so importing the server does not pull in sklearn
+
+        model = joblib.load(path, mmap_mode=model_mmap_mode())
+        metadata = read_metadata(path)
+        validate_model(model, metadata, self.expected_features)
+        loaded = LoadedModel(model, version, path, mtime, metadata)
+        for _ in range(self.warmup_runs):
+            X = np.asarray([WARMUP_ROW], dtype=np.float64)
+            loaded.predict_proba(X)
+            loaded.predict_proba(np.repeat(X, 16, axis=0))
+            if loaded.explainer is not None:
+                loaded.explain(X)
+        return loaded
+
+    def current(self):
+        # Lazily loads the newest artifact on first use; returns None if there is no usable model
+        loaded = self._current
+        if loaded is not None:
+            return loaded
+        with self._load_lock:
+            if self._current is None:
+                self._swap_in_latest()
+            if self.watch_interval > 0:
+                self.start_watcher()
+        return self._current
+
+    def loaded_version(self):
+        loaded = self._current
+        return loaded.version if loaded else None
+
+    @staticmethod
+    def failed_key(path, mtime):
+        # A failed artifact is retried once the .pkl or its metadata sidecar changes
+        sidecar = os.path.splitext(path)[0] + '.json'
+        return path, mtime, os.path.getmtime(sidecar) if os.path.exists(sidecar) else None
+
+    def _swap_in_latest(self):
+        # Loads the newest artifact that passes validation. Artifacts that failed are remembered,
+        # so a bad file is not loaded again on every request or watcher tick.
+        found = self.artifacts()
+        if not found:
+            self.last_error = "No model artifact found"
+            return False
+        loaded = self._current
+        errors = []
+        for path, version, mtime in found:
+            if loaded is not None and loaded.path == path and loaded.mtime == mtime:
+                break # nothing newer than the serving model loads
+            key = self.failed_key(path, mtime)
+            if key in self._failed:
+                errors.append(self._failed[key])
+                continue
+            try:
+                new_model = self._load(path, version, mtime)
+            except Exception as e:
+                error = f"Error loading model {path}: {e}"
+                print(error)
+                self._failed[key] = error
+                errors.append(error)
+                continue
+
+            # Single reference assignment: requests see either the old or the new model, never a mix
+            self._current = new_model
+            self.last_error = "; ".join(errors) or None
+            print(f"Model {version} loaded from {path}")
+            return True
+
+        self.last_error = "; ".join(errors) or (None if loaded else "No usable model artifact found")
+        return False
+
+    def reload(self):
+        # Swap in a newer artifact if one appeared; returns True when the model changed
+        with self._load_lock:
+            return self._swap_in_latest()
+
+    def start_watcher(self, interval=None):
+        if interval:
+            self.watch_interval = interval
+        if self._watcher is not None or self.watch_interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.watch_interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import math
+import sqlite3
+import sys
+from database import connect, bulk_insert, INSERT_RECORD, RECORD_FEATURES, record_values, record_to_dict, to_iso_date, today
+
+# Streaming bulk export/import of Records, shared by the /export_records and /import_records
+# routes and the command line:
+#   python records_io.py export records.csv [--format csv|ndjson]
+#   python records_io.py import history.csv [--score] [--batch-size 500]
+# Both directions work on fixed-size chunks, so memory use does not grow with the table or file size.
+
+EXPORT_COLUMNS = ['id', 'patient_username', 'name', 'age', 'sex', 'prediction', 'score', 'date', 'outcome'] + RECORD_FEATURES + ['mobile']
+CHUNK_SIZE = 500
+
+
+def iter_records(where=(), params=(), chunk_size=CHUNK_SIZE, path=None):
+    # Yields Records rows (oldest first) from a single SELECT read in chunks with fetchmany.
+    # A dedicated connection keeps a long export from tying up the request thread's shared one.
+    conn = connect(path)
+    try:
+        sql = "SELECT * FROM Records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cursor = conn.execute(sql + " ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def flat_record(r):
+    # One export row: the record_to_dict fields with the clinical details flattened into columns
+    record = record_to_dict(r)
+    details = record.pop("details")
+    for column in RECORD_FEATURES + ['mobile']:
+        record[column] = details.get(column)
+    return record
+
+
+def export_ndjson(rows):
+    for r in rows:
+        yield json.dumps(flat_record(r)) + "\n"
+
+
+def export_csv(rows, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for i, r in enumerate(rows, 1):
+        writer.writerow(flat_record(r))
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parse_rows(lines, fmt):
+    # Incrementally parses an iterable of text lines (an open file or a request stream)
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+    elif fmt == 'ndjson':
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if line:
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = {"_error": f"Line {number}: {e}"}
+                yield row if isinstance(row, dict) else {"_error": f"Line {number}: expected a JSON object"}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _prepare(row, scored):
+    # INSERT_RECORD values for one imported row, or raises ValueError
+    if not str(row.get('patient_username') or row.get('patientUsername') or '').strip():
+        raise ValueError("missing patient_username")
+    try:
+        age = float(row.get('age'))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid or missing age {row.get('age')!r}")
+    if not math.isfinite(age) or age < 0:
+        raise ValueError(f"invalid age {row.get('age')!r}")
+    if scored is not None:
+        prediction, score = scored
+    elif row.get('prediction') not in (None, '') and row.get('score') not in (None, ''):
+        prediction, score = int(float(row['prediction'])), int(float(row['score']))
+    else:
+        raise ValueError("no prediction/score and scoring is off")
+    date = to_iso_date(row.get('date')) or today()
+    # id/prediction/score/date of exported rows are not form data and must not end up in details
+    data = {k: v for k, v in row.items() if k not in ('id', 'prediction', 'score', 'date')}
+    return record_values(data, prediction, score, date)
+
+
+def _model_row(row):
+    # Exports write sex as Male/Female; the model wants 1/0
+    sex = row.get('sex')
+    if sex in ('Male', 'Female'):
+        row = dict(row, sex=1 if sex == 'Male' else 0)
+    return row
+
+
+def import_records(rows, extract_fn=None, score_fn=None, batch_size=CHUNK_SIZE, path=None, max_errors=20):
+    # Inserts parsed rows in one transaction per batch. With extract_fn (row dict -> feature list)
+    # and score_fn (feature lists -> (predictions, risk_scores)), each batch is scored by the model
+    # in a single call instead of trusting the prediction/score columns in the file.
+    # Bad rows are skipped and the first few reported.
+    conn = connect(path)
+    summary = {"imported": 0, "scored": 0, "skipped": 0, "errors": []}
+
+    def skip(number, message):
+        summary["skipped"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append(f"Row {number}: {message}")
+
+    def flush(batch):
+        scores = [None] * len(batch)
+        if score_fn:
+            predictions, risk_scores = score_fn([features for _, _, features in batch])
+            scores = list(zip(predictions, risk_scores))
+            summary["scored"] += len(batch)
+        values = []
+        for (number, row, _), scored in zip(batch, scores):
+            try:
+                values.append((number, _prepare(row, scored)))
+            except (TypeError, ValueError) as e:
+                skip(number, e)
+        if values:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                try:
+                    bulk_insert(conn, 'Records', INSERT_RECORD, [v for _, v in values])
+                except sqlite3.IntegrityError:
+                    # A row breaks a constraint _prepare does not check: redo the batch row by row, skipping it
+                    conn.execute("ROLLBACK")
+                    conn.execute("BEGIN IMMEDIATE")
+                    inserted = []
+                    for number, v in values:
+                        try:
+                            conn.execute(INSERT_RECORD, v)
+                            inserted.append((number, v))
+                        except sqlite3.IntegrityError as e:
+                            skip(number, e)
+                    values = inserted
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            summary["imported"] += len(values)
+
+    try:
+        batch = []
+        for number, row in enumerate(rows, 1):
+            if "_error" in row:
+                skip(number, row["_error"])
+                continue
+            features = None
+            if score_fn:
+                try:
+                    features = extract_fn(_model_row(row))
+                except (KeyError, TypeError, ValueError) as e:
+                    skip(number, f"invalid or missing feature {e}")
+                    continue
+            batch.append((number, row, features))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        conn.close()
+    return summary
+
+
+def main():
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Stream Records to or from CSV / NDJSON files")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help="file to write (export) or read (import); - for stdout/stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--score", action="store_true", help="score imported rows with the current model")
+    parser.add_argument("--batch-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('ndjson' if args.file.endswith(('.ndjson', '.jsonl')) else 'csv')
+    init_db()
+
+    if args.command == "export":
+        out = sys.stdout if args.file == '-' else open(args.file, 'w', newline='')
+        chunks = export_csv(iter_records(chunk_size=args.batch_size)) if fmt == 'csv' else export_ndjson(iter_records(chunk_size=args.batch_size))
+        for chunk in chunks:
+            out.write(chunk)
+        if out is not sys.stdout:
+            out.close()
+        return
+
+    extract_fn = score_fn = None
+    if args.score:
+        import server
+        model = server.registry.current()
+        if not model:
+            sys.exit(f"Cannot score: {server.registry.last_error}")
+        extract_fn = server.extract_features
+        score_fn = lambda features: server.score_cached(features, model)
+
+    source = sys.stdin if args.file == '-' else open(args.file, newline='')
+    try:
+        summary = import_records(parse_rows(source, fmt), extract_fn, score_fn, args.batch_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(f"Imported {summary['imported']} records ({summary['scored']} scored, {summary['skipped']} skipped)")
+    for error in summary["errors"]:
+        print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Production launcher: loads the model once, then pre-forks worker processes that share it copy-on-write.
+#   python serve.py --workers 4 --port 5000
+# Each worker runs its own threaded WSGI server on the shared listening socket, so CPU-bound
+# predict_proba calls run in parallel across processes instead of queueing on one GIL.
+# SIGTERM / SIGINT shut down gracefully: workers stop accepting, finish in-flight requests, then exit.
+
+
+class InFlightCounter:
+    # WSGI middleware that tracks running requests so a worker can drain them before exiting
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.active += 1
+        try:
+            app_iter = self.app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        from werkzeug.wsgi import ClosingIterator
+        return ClosingIterator(app_iter, [self._done])
+
+    def _done(self):
+        with self.lock:
+            self.active -= 1
+
+
+def run_worker(sock, app, grace_period):
+    from werkzeug.serving import make_server
+
+    counted = InFlightCounter(app)
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, counted, threaded=True, fd=sock.fileno())
+    stopping = threading.Event()
+
+    def shutdown(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            # shutdown() blocks until serve_forever returns, so it cannot run on the serving thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    server.serve_forever()
+
+    deadline = time.monotonic() + grace_period
+    while counted.active > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    os._exit(0)
+
+
+def spawn(sock, app, grace_period):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # Background threads only ever run in the workers, never in the parent that forks them
+            import server
+            server.start_job_worker()
+            run_worker(sock, app, grace_period)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run CardioAI with pre-forked worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--grace-period", type=float, default=10.0, help="seconds to wait for in-flight requests on shutdown")
+    args = parser.parse_args()
+
+    import server
+    from database import init_db
+
+    # One-time setup in the parent: schema/migrations and the model itself
+    init_db()
+    model = server.registry.current()
+    if not model:
+        print(f"Warning: starting without a model ({server.registry.last_error})")
+
+    if not hasattr(os, 'fork'):
+        print("Pre-forking needs os.fork; falling back to a single threaded process.")
+        server.app.run(host=args.host, port=args.port, threaded=True)
+        return
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    # Move everything loaded so far out of the GC's reach, so the collector in the workers
+    # does not touch (and therefore copy) the pages holding the model
+    gc.freeze()
+
+    workers = {spawn(sock, server.app, args.grace_period) for _ in range(args.workers)}
+    print(f"Serving on http://{args.host}:{args.port} with {len(workers)} workers (model {model.version if model else 'none'})")
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping.is_set():
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            stopping.wait(0.5)
+            continue
+        if pid in workers:
+            workers.discard(pid)
+            if not stopping.is_set():
+                print(f"Worker {pid} exited unexpectedly (status {status}); restarting")
+                stopping.wait(1.0) # avoid a tight crash loop
+                workers.add(spawn(sock, server.app, args.grace_period))
+
+    print("Shutting down workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + args.grace_period + 5
+    while workers and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.1)
+        else:
+            workers.discard(pid)
+    for pid in workers:
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
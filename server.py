@@ -1,32 +1,118 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import joblib
-import pandas as pd
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, stream_with_context, abort
+from werkzeug.security import safe_join
+import numpy as np
+import math
 import os
-import sqlite3
+import time
+import io
+import csv
 import json
-from datetime import datetime
-from database import init_db
+import uuid
+import hmac
+from database import (init_db, release_connection, transaction, bulk_insert, fetch_one, fetch_all, execute,
+                      INSERT_RECORD, record_values, record_to_dict, appointment_to_dict, prescription_to_dict, to_outcome,
+                      today, APPOINTMENT_WITH_CONTACT, CHANGE_TABLES, prune_change_log)
+from batcher import MicroBatcher
+from prediction_cache import PredictionCache, canonical_key
+import records_io
+from jobs import JobQueue, DATA_DIR
+from intent_matcher import IntentMatcher
+from change_feed import ChangeFeed, latest_change_id, read_changes
+from http_cache import StaticAssets, conditional, compress_response, IMMUTABLE_CACHE, REVALIDATE_CACHE
+from model_registry import ModelRegistry
+from metrics import REGISTRY, REQUEST_LATENCY, SlowRequestProfiler, span, set_route
 
 app = Flask(__name__, static_folder='.', template_folder='.')
 
-# Ensure DB is initialized
-init_db()
+# Feature order the model was trained on (see ML/train_model.py and ML/train_pipeline.py)
+FEATURES = ['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang', 'oldpeak']
 
-# Load Modell
-try:
-    model = joblib.load('ML/heart_model.pkl')
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Model is loaded lazily on first use and hot-swapped when a newer artifact appears (see model_registry.py).
+# Artifacts whose metadata lists a different feature order are refused.
+registry = ModelRegistry(expected_features=FEATURES)
+
+@app.after_request
+def add_model_version(response):
+    version = registry.loaded_version()
+    if version:
+        response.headers['X-Model-Version'] = version
+    return response
+
+# Opt-in: CARDIO_PROFILE_SLOW_MS=200 dumps sampled stacks of requests slower than 200 ms to profiles/
+profiler = None
+if os.environ.get('CARDIO_PROFILE_SLOW_MS'):
+    profiler = SlowRequestProfiler(float(os.environ['CARDIO_PROFILE_SLOW_MS']),
+                                   interval_ms=float(os.environ.get('CARDIO_PROFILE_INTERVAL_MS', 5)))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    set_route(request.endpoint)
+    if profiler:
+        profiler.begin(request.endpoint or 'none')
+
+@app.after_request
+def record_request_latency(response):
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, request.endpoint or 'none', request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc):
+    if profiler:
+        profiler.end()
+
+@app.teardown_request
+def release_db_connection(exc):
+    release_connection()
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# Pages are served with fingerprinted CSS/JS references (file?v=<hash>); a request with the current
+# hash can be cached forever, everything else is revalidated with its ETag (see http_cache.py)
+assets = StaticAssets('.')
+
+def serve_page(name):
+    html, etag = assets.page(name)
+    response = Response(html, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = REVALIDATE_CACHE
+    return response.make_conditional(request)
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return serve_page('index.html')
+
+# Never served as static files: SQLite databases, the data directory and exports/ (where older
+# versions wrote /export_records extracts). Finished exports are downloaded through /jobs/<id>/download.
+PRIVATE_SUFFIXES = ('.db', '.db-wal', '.db-shm', '.db-journal')
+PRIVATE_DIRS = (DATA_DIR, 'exports')
+
+def is_private(path):
+    full = os.path.realpath(safe_join('.', path) or '.')
+    dirs = [os.path.realpath(d) for d in PRIVATE_DIRS]
+    return path.lower().endswith(PRIVATE_SUFFIXES) or any(full == d or full.startswith(d + os.sep) for d in dirs)
 
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('.', path)
+    if is_private(path):
+        abort(404)
+    if path.endswith('.html'):
+        if not safe_join('.', path) or not os.path.isfile(safe_join('.', path)):
+            abort(404)
+        return serve_page(safe_join('.', path))
+    response = send_from_directory('.', path)
+    version = request.args.get('v')
+    if version and version == assets.fingerprint(safe_join('.', path)):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    else:
+        response.headers['Cache-Control'] = REVALIDATE_CACHE
+    return response
+
+app.after_request(compress_response)
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -36,11 +122,8 @@ def login():
     role = data.get('role', 'Doctor') # Default to Doctor for backward compatibility
     
     try:
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM Users WHERE username=? AND password=? AND role=?", (username, password, role))
-        user = c.fetchone()
-        conn.close()
+        with span('db.select_user'):
+            user = fetch_one("SELECT * FROM Users WHERE username=? AND password=? AND role=?", (username, password, role))
         
         if user:
             redirect_url = "home.html" if role == "Doctor" else "patient_dashboard.html"
@@ -50,116 +133,633 @@ def login():
     except Exception as e:
         return jsonify({"success": False, "message": f"Database error: {str(e)}"})
 
+def extract_features(data):
+    # Mapping frontend keys to model features
+    # sex: 1=Male, 0=Female / fbs: 1 if >120 else 0 / thalach: Max Heart Rate / exang: 1=Yes, 0=No
+    features = [float(data[f]) for f in FEATURES]
+    for f, value in zip(FEATURES, features):
+        # float() accepts "nan" and "inf", which the trees cannot score meaningfully
+        if not math.isfinite(value):
+            raise ValueError(f"{f} must be a finite number")
+    return features
+
+def score_rows(rows, model):
+    # Score a list of feature rows with a single predict_proba call.
+    # The class is derived from the probabilities (same as model.predict) so the trees are only walked once.
+    X = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+    with span('predict_proba'):
+        probs = model.predict_proba(X)
+    predictions = [int(c) for c in model.classes_[probs.argmax(axis=1)]]
+    risk_scores = [int(p * 100) for p in probs[:, 1]] # Probability of class 1 (Disease)
+    return predictions, risk_scores
+
+def explain_rows(rows, model):
+    # Per-feature contributions in risk-score points (see tree_shap.py): base_value plus the
+    # contributions is the row's risk score before it is truncated to an integer
+    X = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+    with span('explain'):
+        contributions = model.explain(X)
+    base_value = round(model.explainer.expected_value * 100, 2)
+    return [{"base_value": base_value, "contributions": {f: round(float(c) * 100, 2) for f, c in zip(FEATURES, row)}}
+            for row in contributions]
+
+def wants_explanation(data=None):
+    # explain=true in the query string or (for predict_api) in the JSON body
+    value = request.args.get('explain')
+    if value is None and isinstance(data, dict):
+        value = data.get('explain')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def score_batched_rows(rows):
+    # Batcher entry point: the whole batch is scored by one model version
+    model = registry.current()
+    if not model:
+        raise RuntimeError("Model not loaded")
+    predictions, risk_scores = score_rows(rows, model)
+    return [(p, r, model.version) for p, r in zip(predictions, risk_scores)]
+
+# Optional request coalescing in front of the model (off by default).
+# CARDIO_MICROBATCH=1 enables it, CARDIO_BATCH_SIZE / CARDIO_BATCH_WAIT_MS tune throughput vs latency.
+batcher = None
+if os.environ.get('CARDIO_MICROBATCH') == '1':
+    batcher = MicroBatcher(score_batched_rows,
+                           max_batch_size=int(os.environ.get('CARDIO_BATCH_SIZE', 32)),
+                           max_wait_ms=float(os.environ.get('CARDIO_BATCH_WAIT_MS', 5)))
+    print(f"Micro-batching enabled (batch size {batcher.max_batch_size}, max wait {batcher.max_wait * 1000:g} ms)")
+
+    def batcher_metrics():
+        stats = batcher.stats()
+        return [
+            ("cardio_batcher_queue_depth", "gauge", "Rows waiting to be scored", [({}, stats["queue_depth"])]),
+            ("cardio_batcher_max_queue_depth", "gauge", "Largest queue depth seen", [({}, stats["max_queue_depth"])]),
+            ("cardio_batcher_rows_total", "counter", "Rows scored by the batcher", [({}, stats["rows"])]),
+            ("cardio_batcher_queue_wait_seconds_avg", "gauge", "Average time a row waited in the queue", [({}, stats["avg_queue_wait_ms"] / 1000.0)]),
+            ("cardio_batcher_batches_total", "counter", "Batches scored, by batch size",
+             [({"size": size}, count) for size, count in stats["batch_size_counts"].items()])
+        ]
+
+    REGISTRY.register_collector(batcher_metrics)
+
+# Cache of recent results in front of the model; CARDIO_PREDICTION_CACHE=0 turns it off.
+# Entries are keyed on the model version, so a hot swap invalidates them automatically.
+prediction_cache = None
+if int(os.environ.get('CARDIO_PREDICTION_CACHE', 4096)) > 0:
+    prediction_cache = PredictionCache(max_entries=int(os.environ.get('CARDIO_PREDICTION_CACHE', 4096)),
+                                       ttl_seconds=float(os.environ.get('CARDIO_PREDICTION_CACHE_TTL', 3600)))
+
+    def prediction_cache_metrics():
+        stats = prediction_cache.stats()
+        return [
+            ("cardio_prediction_cache_hits_total", "counter", "Predictions served from the cache", [({}, stats["hits"])]),
+            ("cardio_prediction_cache_misses_total", "counter", "Predictions that had to run the model", [({}, stats["misses"])]),
+            ("cardio_prediction_cache_evictions_total", "counter", "Entries evicted to stay within the size limit", [({}, stats["evictions"])]),
+            ("cardio_prediction_cache_entries", "gauge", "Entries currently cached", [({}, stats["size"])])
+        ]
+
+    REGISTRY.register_collector(prediction_cache_metrics)
+
+def score_cached(rows, model):
+    # score_rows with the prediction cache in front: only rows not seen before (and each distinct
+    # row only once) reach the model
+    if not prediction_cache:
+        return score_rows(rows, model)
+    results = [prediction_cache.get(model.version, row) for row in rows]
+    misses = {}
+    for i, result in enumerate(results):
+        if result is None:
+            misses.setdefault(canonical_key(rows[i]), []).append(i)
+    if misses:
+        keys = list(misses)
+        predictions, risk_scores = score_rows(keys, model)
+        for key, prediction, risk_score in zip(keys, predictions, risk_scores):
+            prediction_cache.put(model.version, key, (prediction, risk_score))
+            for i in misses[key]:
+                results[i] = (prediction, risk_score)
+    return [r[0] for r in results], [r[1] for r in results]
+
+@app.route('/prediction_cache_stats', methods=['GET'])
+def prediction_cache_stats():
+    if not prediction_cache:
+        return jsonify({"enabled": False})
+    stats = prediction_cache.stats()
+    stats["enabled"] = True
+    return jsonify(stats)
+
+@app.route('/batcher_stats', methods=['GET'])
+def batcher_stats():
+    if not batcher:
+        return jsonify({"enabled": False})
+    stats = batcher.stats()
+    stats["enabled"] = True
+    return jsonify(stats)
+
+@app.route('/model_info', methods=['GET'])
+def model_info():
+    model = registry.current()
+    if not model:
+        return jsonify({"loaded": False, "error": registry.last_error}), 503
+    info = model.info()
+    info["loaded"] = True
+    return jsonify(info)
+
+# /reload_model needs the X-Admin-Token header when CARDIO_ADMIN_TOKEN is set, and otherwise only
+# answers requests from this machine. Set the token when running behind a reverse proxy, where
+# every request appears to come from localhost.
+ADMIN_TOKEN = os.environ.get('CARDIO_ADMIN_TOKEN')
+
+def is_admin_request():
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/reload_model', methods=['POST'])
+def reload_model():
+    # Picks up a newer artifact without restarting; in-flight requests finish on the old model
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    changed = registry.reload()
+    model = registry.current()
+    return jsonify({"reloaded": changed, "version": model.version if model else None, "error": registry.last_error})
+
+def create_patient(c, patient_username, patient_password):
+    # Inserts the patient's login unless the username exists; True if it was created
+    with span('db.select_user'):
+        exists = c.execute("SELECT * FROM Users WHERE username=?", (patient_username,)).fetchone()
+    if exists:
+        return False
+    with span('db.insert_user'):
+        c.execute("INSERT INTO Users (username, password, role) VALUES (?, ?, 'Patient')", (patient_username, patient_password))
+    return True
+
+def save_prediction(c, data, prediction, risk_score, date, is_new_patient=None):
+    # Persists one predict_api submission on connection c (inside the caller's transaction).
+    # is_new_patient is given when the login was already created by the caller (see predict_api).
+    patient_username = data.get('patientUsername')
+    patient_password = data.get('patientPassword')
+    p_name = data.get('p_name', 'Unknown')
+
+    if is_new_patient is None:
+        is_new_patient = bool(patient_password) and create_patient(c, patient_username, patient_password)
+
+    # Insert the current actual Record (clinical inputs go into typed columns, the password is never stored)
+    with span('db.insert_record'):
+        c.execute(INSERT_RECORD, record_values(data, prediction, risk_score, date))
+
+    # Auto-populate 2 historical records if this is a brand new patient
+    if is_new_patient:
+        # Mock details
+        base = {"patientUsername": patient_username, "p_name": p_name, "age": data.get('age'), "sex": data.get('sex')}
+        mock_details1 = dict(base, trestbps="120", chol="190", thalach="145")
+        mock_details2 = dict(base, trestbps="135", chol="210", thalach="130")
+        with span('db.insert_history'):
+            # Insert historical record 1 (Past)
+            c.execute(INSERT_RECORD, record_values(mock_details1, 0, 30, "2026-01-15"))
+            # Insert historical record 2 (Further Past)
+            c.execute(INSERT_RECORD, record_values(mock_details2, 1, 65, "2025-10-05"))
+
+def persist_predictions(jobs):
+    # Background handler: every queued submission of one batch is group-committed in a single transaction.
+    # A job that is run again (see jobs.py) finds its key in PersistedJobs and is not saved twice.
+    with span('db.transaction'), transaction() as c:
+        now = time.time()
+        for job in jobs:
+            if job.get("key") and not c.execute("INSERT OR IGNORE INTO PersistedJobs (key, created_at) VALUES (?, ?)",
+                                                 (job["key"], now)).rowcount:
+                continue
+            save_prediction(c, job["data"], job["prediction"], job["risk_score"], job["date"], job.get("new_patient", False))
+        # Re-runs happen within a lease and a few retries, long before a key is a day old
+        c.execute("DELETE FROM PersistedJobs WHERE created_at < ?", (now - 86400,))
+    return [None] * len(jobs)
+
+RECORD_FEATURE_COLUMNS = ", ".join(["id", "sex"] + [f for f in FEATURES if f != 'sex'])
+
+def record_features(r):
+    # Model inputs of a stored record (sex is stored as Male/Female), or None if one is missing
+    values = [r[f] if f != 'sex' else (1 if r["sex"] == "Male" else 0) for f in FEATURES]
+    return None if any(v is None for v in values) else values
+
+def rescore_records(job):
+    # Background handler: re-runs the current model over stored records (optionally filtered like
+    # /get_records), walking the table by id so each chunk is scored and updated in one go
+    model = registry.current()
+    if not model:
+        raise RuntimeError("Model not loaded")
+    where, params = record_filters(job.get("filters", {}))
+    where.append("id > ?")
+    updated = skipped = 0
+    last_id = 0
+    while True:
+        rows = fetch_all(f"SELECT {RECORD_FEATURE_COLUMNS} FROM Records WHERE {' AND '.join(where)} ORDER BY id LIMIT 1000", params + [last_id])
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        ids, features = [], []
+        for r in rows:
+            values = record_features(r)
+            if values is None:
+                skipped += 1
+                continue
+            ids.append(r["id"])
+            features.append(values)
+        if not ids:
+            continue
+        predictions, risk_scores = score_cached(features, model)
+        with transaction() as c:
+            c.executemany("UPDATE Records SET prediction = ?, score = ? WHERE id = ?", zip(predictions, risk_scores, ids))
+        updated += len(ids)
+    return {"updated": updated, "skipped": skipped, "model_version": model.version}
+
+EXPORT_DIR = os.path.join(DATA_DIR, 'exports')
+
+def export_records_job(job):
+    # Background handler: writes a /export_records extract to EXPORT_DIR for later download
+    fmt = job.get("format", "ndjson")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    name = f"records-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.monotonic_ns() % 1000000}.{fmt}"
+    where, params = record_filters(job.get("filters", {}))
+    rows = records_io.iter_records(where, params)
+    chunks = records_io.export_csv(rows) if fmt == 'csv' else records_io.export_ndjson(rows)
+    path = os.path.join(EXPORT_DIR, name)
+    with open(path + ".tmp", "w", newline='') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(path + ".tmp", path)
+    return {"file": name, "bytes": os.path.getsize(path)}
+
+# Background worker for persistence and long-running work, queued in its own SQLite file (see jobs.py).
+# CARDIO_ASYNC_PERSIST=1 makes predict_api return before its records are written.
+ASYNC_PERSIST = os.environ.get('CARDIO_ASYNC_PERSIST') == '1'
+job_queue = JobQueue(batch_size=int(os.environ.get('CARDIO_JOBS_BATCH', 64)))
+job_queue.register('save_prediction', persist_predictions, batch=True)
+job_queue.register('rescore_records', rescore_records, lease_seconds=3600)
+job_queue.register('export_records', export_records_job, lease_seconds=3600)
+
+def prune_changes():
+    with transaction() as c:
+        prune_change_log(c)
+
+job_queue.add_maintenance(prune_changes)
+# The worker thread starts on the first enqueue, or when a serving process starts (serve.py workers
+# after fork, __main__ below) so jobs left over from a previous run are picked up. Never at import:
+# serve.py imports this module in the parent before forking.
+
+def start_job_worker():
+    if ASYNC_PERSIST or job_queue.pending():
+        job_queue.start()
+
+def job_metrics():
+    return [("cardio_jobs", "gauge", "Jobs in the background queue by kind and status",
+             [({"kind": kind, "status": status}, n) for kind, status, n in job_queue.counts()])]
+
+REGISTRY.register_collector(job_metrics)
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    counts = {}
+    for kind, status, n in job_queue.counts():
+        counts.setdefault(kind, {})[status] = n
+    return jsonify({"counts": counts, "jobs": job_queue.recent(request.args.get('status'), min(request.args.get('limit', 50, type=int), 500))})
+
+@app.route('/jobs/<int:job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/download', methods=['GET'])
+def job_download(job_id):
+    job = job_queue.get(job_id)
+    if not job or job["kind"] != 'export_records' or job["status"] != 'done':
+        return jsonify({"error": "No finished export with this id"}), 404
+    return send_from_directory(EXPORT_DIR, job["result"]["file"], as_attachment=True)
+
+@app.route('/rescore_records', methods=['POST'])
+def rescore_records_api():
+    # Queues a re-score of stored records with the current model; poll /jobs/<id> for progress
+    filters = request.get_json(silent=True) or {}
+    try:
+        record_filters(filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"job_id": job_queue.enqueue('rescore_records', {"filters": filters}, max_attempts=3)}), 202
+
 @app.route('/predict_api', methods=['POST'])
 def predict_api():
+    model = registry.current()
     if not model:
         return jsonify({"error": "Model not loaded"}), 500
         
     try:
-        data = request.json
+        with span('parse'):
+            data = request.json
         # Extract features in the order the model expects
         # Based on train_model.py, columns are: age,sex,cp,trestbps,chol,fbs,restecg,thalach,exang,oldpeak,slope,ca,thal
-        
-        # Mapping frontend keys to model features
-        features = [
-            float(data['age']),
-            float(data['sex']), # 1=Male, 0=Female
-            float(data['cp']),
-            float(data['trestbps']),
-            float(data['chol']),
-            float(data['fbs']), # 1 if >120 else 0
-            float(data['restecg']),
-            float(data['thalach']), # Max Heart Rate
-            float(data['exang']), # 1=Yes, 0=No
-            float(data['oldpeak'])
-        ]
-        
-        prediction = model.predict([features])[0]
-        # model.predict_proba might be available for "score" but standard RF classifier returns class
-        # We'll simulate a score or use predict_proba if available
-        
-        risk_score = 0
-        try:
-            probs = model.predict_proba([features])[0]
-            risk_score = int(probs[1] * 100) # Probability of class 1 (Disease)
-        except:
-            risk_score = 100 if prediction == 1 else 0
+
+        with span('features'):
+            features = extract_features(data)
+        cached = prediction_cache.get(model.version, features) if batcher and prediction_cache else None
+        if cached:
+            prediction, risk_score = cached
+            model_version = model.version
+        elif batcher:
+            with span('batcher_wait'):
+                prediction, risk_score, model_version = batcher.predict(features)
+            if prediction_cache:
+                prediction_cache.put(model_version, features, (prediction, risk_score))
+        else:
+            predictions, risk_scores = score_cached([features], model)
+            prediction = predictions[0]
+            risk_score = risk_scores[0]
+            model_version = model.version
 
         result = {
             "prediction": int(prediction), # 1 or 0
-            "risk_score": risk_score
+            "risk_score": risk_score,
+            "model_version": model_version
         }
+        if wants_explanation(data):
+            result["explanation"] = explain_rows([features], model)[0]
         
-        # Form details
-        patient_username = data.get('patientUsername')
-        patient_password = data.get('patientPassword')
-        p_name = data.get('p_name', 'Unknown')
-        
-        # Save to DB
-        if patient_username:
-            conn = sqlite3.connect('database.db')
-            c = conn.cursor()
-            
-            is_new_patient = False
-            if patient_password:
-                # Insert User if not exists
-                c.execute("SELECT * FROM Users WHERE username=?", (patient_username,))
-                if not c.fetchone():
-                    c.execute("INSERT INTO Users (username, password, role) VALUES (?, ?, 'Patient')", (patient_username, patient_password))
-                    is_new_patient = True
-                    
-            # Insert the current actual Record
-            details_str = json.dumps(data)
-            date_str = datetime.now().strftime("%m/%d/%Y")
-            c.execute("INSERT INTO Records (patient_username, name, age, sex, prediction, score, date, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                      (patient_username, p_name, data.get('age'), "Male" if str(data.get('sex'))=="1" else "Female", int(prediction), risk_score, date_str, details_str))
-            
-            # Auto-populate 2 historical records if this is a brand new patient
-            if is_new_patient:
-                # Mock details
-                mock_details1 = json.dumps({"trestbps": "120", "chol": "190", "thalach": "145"})
-                mock_details2 = json.dumps({"trestbps": "135", "chol": "210", "thalach": "130"})
-                # Insert historical record 1 (Past)
-                c.execute("INSERT INTO Records (patient_username, name, age, sex, prediction, score, date, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                          (patient_username, p_name, data.get('age'), "Male" if str(data.get('sex'))=="1" else "Female", 0, 30, "01/15/2026", mock_details1))
-                # Insert historical record 2 (Further Past)
-                c.execute("INSERT INTO Records (patient_username, name, age, sex, prediction, score, date, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                          (patient_username, p_name, data.get('age'), "Male" if str(data.get('sex'))=="1" else "Female", 1, 65, "10/05/2025", mock_details2))
-
-            conn.commit()
-            conn.close()
-            
-        return jsonify(result)
+        # Save to DB, either right away or through the background job queue (CARDIO_ASYNC_PERSIST=1)
+        if data.get('patientUsername'):
+            if ASYNC_PERSIST:
+                # The password never goes into jobs.db: a new patient's login is created right away
+                # and the job only carries whether the mock history still has to be added
+                new_patient = False
+                if data.get('patientPassword'):
+                    with span('db.transaction'), transaction() as c:
+                        new_patient = create_patient(c, data['patientUsername'], data['patientPassword'])
+                job_data = {k: v for k, v in data.items() if k != 'patientPassword'}
+                with span('enqueue'):
+                    result["job_id"] = job_queue.enqueue('save_prediction', {
+                        "data": job_data, "prediction": int(prediction), "risk_score": risk_score, "date": today(),
+                        "new_patient": new_patient, "key": uuid.uuid4().hex})
+            else:
+                with span('db.transaction'), transaction() as c:
+                    save_prediction(c, data, prediction, risk_score, today())
+
+        with span('serialize'):
+            return jsonify(result)
         
     except Exception as e:
         print(f"Prediction Error: {e}")
         return jsonify({"error": str(e)}), 400
 
+def parse_batch_body():
+    # Accepts either a JSON array of feature objects or a CSV body with a header row
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    rows = request.get_json()
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of feature rows")
+    return rows
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    model = registry.current()
+    if not model:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    try:
+        with span('parse'):
+            rows = parse_batch_body()
+        if not rows:
+            return jsonify([])
+
+        features = []
+        with span('features'):
+            for i, row in enumerate(rows):
+                try:
+                    features.append(extract_features(row))
+                except (KeyError, TypeError, ValueError) as e:
+                    raise ValueError(f"Row {i}: invalid or missing feature {e}")
+
+        predictions, risk_scores = score_cached(features, model)
+        explanations = explain_rows(features, model) if wants_explanation() else None
+
+        results = []
+        to_save = []
+        date_str = today()
+        for i, (row, prediction, risk_score) in enumerate(zip(rows, predictions, risk_scores)):
+            results.append({"prediction": prediction, "risk_score": risk_score, "model_version": model.version})
+            if explanations:
+                results[-1]["explanation"] = explanations[i]
+
+            # Only rows tied to a patient are persisted (same rule as predict_api)
+            if row.get('patientUsername') or row.get('patient_username'):
+                to_save.append(record_values(row, prediction, risk_score, date_str))
+
+        if to_save:
+            with span('db.insert_records'), transaction() as conn:
+                bulk_insert(conn, 'Records', INSERT_RECORD, to_save)
+
+        with span('serialize'):
+            return jsonify(results)
+
+    except Exception as e:
+        print(f"Batch Prediction Error: {e}")
+        return jsonify({"error": str(e)}), 400
+
+MAX_PAGE_SIZE = 500
+
+@app.route('/explain_records', methods=['GET'])
+def explain_records():
+    # Feature contributions for stored records, ids=1,2,3 (up to MAX_PAGE_SIZE), in one model call.
+    # Returns {id: explanation}; records without complete inputs are left out.
+    model = registry.current()
+    if not model:
+        return jsonify({"error": "Model not loaded"}), 500
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of record ids"}), 400
+    if len(ids) > MAX_PAGE_SIZE:
+        return jsonify({"error": f"At most {MAX_PAGE_SIZE} ids per request"}), 400
+    if not ids:
+        return jsonify({})
+
+    try:
+        with span('db.select_records'):
+            rows = fetch_all(f"SELECT {RECORD_FEATURE_COLUMNS} FROM Records WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        explained = [(r["id"], values) for r, values in ((r, record_features(r)) for r in rows) if values is not None]
+        if not explained:
+            return jsonify({})
+        explanations = explain_rows([values for _, values in explained], model)
+        with span('serialize'):
+            return jsonify({str(record_id): e for (record_id, _), e in zip(explained, explanations)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def record_filters(args):
+    # WHERE clauses shared by /get_records and /export_records: patient, risk (high|low),
+    # date_from / date_to (YYYY-MM-DD)
+    where = []
+    params = []
+
+    patient = args.get('patient')
+    if patient:
+        where.append("patient_username = ?")
+        params.append(patient)
+
+    risk = args.get('risk')
+    if risk:
+        if risk not in ('high', 'low'):
+            raise ValueError("risk must be 'high' or 'low'")
+        where.append("(score > 50) = ?")
+        params.append(1 if risk == 'high' else 0)
+
+    date_from = args.get('date_from')
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+
+    date_to = args.get('date_to')
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+
+    return where, params
+
 @app.route('/get_records', methods=['GET'])
+@conditional('Records')
 def get_records():
-    # Fetch all records
+    # Optional filters (see record_filters), plus cursor (return records older than this id)
+    # and limit (page size). The response stays a plain list; X-Next-Cursor is set when another page exists,
+    # X-Change-Id is the /changes position to follow updates from.
     try:
-        conn = sqlite3.connect('database.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM Records ORDER BY id DESC")
-        rows = c.fetchall()
-        conn.close()
-        
-        records = []
-        for r in rows:
-            records.append({
-                "id": r["id"],
-                "patient_username": r["patient_username"],
-                "name": r["name"],
-                "age": r["age"],
-                "sex": r["sex"],
-                "prediction": r["prediction"],
-                "score": r["score"],
-                "date": r["date"],
-                "details": json.loads(r["details"]) if r["details"] else {}
-            })
-        return jsonify(records)
+        try:
+            where, params = record_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        cursor = request.args.get('cursor', type=int)
+        if cursor:
+            where.append("id < ?")
+            params.append(cursor)
+
+        change_id = latest_change_id()
+        sql = "SELECT * FROM Records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC"
+
+        limit = request.args.get('limit', type=int)
+        if limit:
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            # Fetch one extra row to know whether there is a next page
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        with span('db.select_records'):
+            rows = fetch_all(sql, params)
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+
+        with span('serialize'):
+            response = jsonify([record_to_dict(r) for r in rows])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['X-Change-Id'] = str(change_id)
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/export_records', methods=['GET'])
+def export_records():
+    # Streams every matching record (same filters as /get_records) as NDJSON (default) or CSV.
+    # Rows are read and written in chunks, so memory use does not depend on the table size.
+    # ?async=1 writes the file in the background job queue instead; fetch it from /jobs/<id>/download
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    try:
+        where, params = record_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.args.get('async') == '1':
+        filters = {k: v for k, v in request.args.items() if k in ('patient', 'risk', 'date_from', 'date_to')}
+        return jsonify({"job_id": job_queue.enqueue('export_records', {"format": fmt, "filters": filters}, max_attempts=3)}), 202
+
+    rows = records_io.iter_records(where, params)
+    if fmt == 'csv':
+        body, mimetype = records_io.export_csv(rows), 'text/csv'
+    else:
+        body, mimetype = records_io.export_ndjson(rows), 'application/x-ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=records.{fmt}'
+    return response
+
+@app.route('/import_records', methods=['POST'])
+def import_records():
+    # Streams a CSV (text/csv) or NDJSON (application/x-ndjson) body into Records in batched
+    # transactions. ?score=1 scores every row with the current model instead of using the
+    # prediction/score columns in the file.
+    fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    extract_fn = score_fn = None
+    if request.args.get('score') == '1':
+        model = registry.current()
+        if not model:
+            return jsonify({"error": "Model not loaded"}), 500
+        extract_fn = extract_features
+        score_fn = lambda features: score_cached(features, model)
+
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        summary = records_io.import_records(records_io.parse_rows(lines, fmt), extract_fn, score_fn,
+                                            batch_size=request.args.get('batch_size', records_io.CHUNK_SIZE, type=int))
+        return jsonify(summary)
+    except Exception as e:
+        print(f"Import Error: {e}")
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/record_outcome', methods=['POST'])
+def record_outcome():
+    # Doctors confirm the actual diagnosis of a record (1 = disease, 0 = none, null to clear).
+    # Labeled records are what ML/retrain_incremental.py learns from.
+    try:
+        data = request.json
+        record_id = int(data.get('id'))
+        outcome = data.get('outcome')
+        if outcome is not None and to_outcome(outcome) is None:
+            return jsonify({"success": False, "error": "outcome must be 0, 1 or null"}), 400
+
+        with span('db.update_outcome'), transaction() as c:
+            updated = c.execute("UPDATE Records SET outcome = ? WHERE id = ?", (to_outcome(outcome), record_id)).rowcount
+        if not updated:
+            return jsonify({"success": False, "error": "Record not found"}), 404
+        return jsonify({"success": True})
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"Outcome Error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/stats', methods=['GET'])
+@conditional('Records')
+def stats():
+    # Dashboard counters read from the trigger-maintained summary tables (see database.STATS_SCHEMA)
+    try:
+        days = max(1, min(request.args.get('days', 30, type=int), 366))
+
+        risk = {r["risk"]: r["count"] for r in fetch_all("SELECT risk, count FROM StatsRisk")}
+        histogram = {r["bucket"]: r["count"] for r in fetch_all("SELECT bucket, count FROM StatsScoreHistogram")}
+        daily = fetch_all("SELECT day, count, high_risk FROM StatsDaily ORDER BY day DESC LIMIT ?", (days,))
+
+        return jsonify({
+            "total": risk.get('high', 0) + risk.get('low', 0),
+            "high_risk": risk.get('high', 0),
+            "low_risk": risk.get('low', 0),
+            "score_histogram": [
+                {"range": f"{b * 10}-{b * 10 + 9 if b < 9 else 100}", "count": histogram.get(b, 0)}
+                for b in range(10)
+            ],
+            "daily": [{"date": r["day"], "count": r["count"], "high_risk": r["high_risk"]} for r in reversed(daily)]
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -176,41 +776,43 @@ def schedule_appointment():
         if not all([patient_username, patient_name, date, time, reason]):
             return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-        c.execute("INSERT INTO Appointments (patient_username, patient_name, appointment_date, appointment_time, reason) VALUES (?, ?, ?, ?, ?)",
-                  (patient_username, patient_name, date, time, reason))
-        conn.commit()
-        conn.close()
+        with span('db.insert_appointment'):
+            execute("INSERT INTO Appointments (patient_username, patient_name, appointment_date, appointment_time, reason) VALUES (?, ?, ?, ?, ?)",
+                    (patient_username, patient_name, date, time, reason))
 
         return jsonify({"success": True})
     except Exception as e:
         print(f"Appointment Error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def appointment_tables():
+    # with_contact also reads Records, so new records must change the ETag too
+    return ['Appointments', 'Records'] if request.args.get('with_contact') else ['Appointments']
+
 @app.route('/get_appointments', methods=['GET'])
+@conditional(appointment_tables)
 def get_appointments():
+    # Optional: patient=<username> for one patient's appointments, with_contact=1 to include each
+    # patient's mobile number. X-Change-Id is the /changes position to follow updates from.
     try:
-        conn = sqlite3.connect('database.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        change_id = latest_change_id()
+        columns = APPOINTMENT_WITH_CONTACT if request.args.get('with_contact') else "a.*"
+        sql = f"SELECT {columns} FROM Appointments a"
+        params = []
+        patient = request.args.get('patient')
+        if patient:
+            sql += " WHERE a.patient_username = ?"
+            params.append(patient)
         # Order by closest date first
-        c.execute("SELECT * FROM Appointments ORDER BY appointment_date ASC, appointment_time ASC")
-        rows = c.fetchall()
-        conn.close()
-        
-        appointments = []
-        for r in rows:
-            appointments.append({
-                "id": r["id"],
-                "patient_username": r["patient_username"],
-                "patient_name": r["patient_name"],
-                "appointment_date": r["appointment_date"],
-                "appointment_time": r["appointment_time"],
-                "reason": r["reason"],
-                "status": r["status"]
-            })
-        return jsonify(appointments)
+        sql += " ORDER BY a.appointment_date ASC, a.appointment_time ASC"
+
+        with span('db.select_appointments'):
+            rows = fetch_all(sql, params)
+
+        with span('serialize'):
+            response = jsonify([appointment_to_dict(r) for r in rows])
+        response.headers['X-Change-Id'] = str(change_id)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -223,17 +825,14 @@ def add_prescription():
         medication = data.get('medication')
         dosage = data.get('dosage')
         frequency = data.get('frequency')
-        date_str = datetime.now().strftime("%m/%d/%Y")
+        date_str = today()
 
         if not all([patient_username, medication, dosage, frequency]):
             return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-        conn = sqlite3.connect('database.db')
-        c = conn.cursor()
-        c.execute("INSERT INTO Prescriptions (patient_username, doctor_username, medication, dosage, frequency, date) VALUES (?, ?, ?, ?, ?, ?)",
-                  (patient_username, doctor_username, medication, dosage, frequency, date_str))
-        conn.commit()
-        conn.close()
+        with span('db.insert_prescription'):
+            execute("INSERT INTO Prescriptions (patient_username, doctor_username, medication, dosage, frequency, date) VALUES (?, ?, ?, ?, ?, ?)",
+                    (patient_username, doctor_username, medication, dosage, frequency, date_str))
 
         return jsonify({"success": True})
     except Exception as e:
@@ -241,67 +840,98 @@ def add_prescription():
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/get_prescriptions', methods=['GET'])
+@conditional('Prescriptions')
 def get_prescriptions():
+    # Optional patient=<username>; X-Change-Id as for /get_appointments
     try:
-        conn = sqlite3.connect('database.db')
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM Prescriptions ORDER BY id DESC")
-        rows = c.fetchall()
-        conn.close()
-        
-        prescriptions = []
-        for r in rows:
-            prescriptions.append({
-                "id": r["id"],
-                "patient_username": r["patient_username"],
-                "doctor_username": r["doctor_username"],
-                "medication": r["medication"],
-                "dosage": r["dosage"],
-                "frequency": r["frequency"],
-                "date": r["date"]
-            })
-        return jsonify(prescriptions)
+        change_id = latest_change_id()
+        patient = request.args.get('patient')
+        with span('db.select_prescriptions'):
+            if patient:
+                rows = fetch_all("SELECT * FROM Prescriptions WHERE patient_username = ? ORDER BY id DESC", (patient,))
+            else:
+                rows = fetch_all("SELECT * FROM Prescriptions ORDER BY id DESC")
+
+        with span('serialize'):
+            response = jsonify([prescription_to_dict(r) for r in rows])
+        response.headers['X-Change-Id'] = str(change_id)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Change feed for dashboards: one poller per process (see change_feed.py), streams close after
+# CARDIO_CHANGES_STREAM_SECONDS and browsers reconnect from the last event id they received
+change_feed = ChangeFeed()
+CHANGES_STREAM_SECONDS = float(os.environ.get('CARDIO_CHANGES_STREAM_SECONDS', 300))
+CHANGES_HEARTBEAT_SECONDS = 15
+MAX_CHANGES_WAIT = 25
+
+def sse(event, data, event_id):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/changes', methods=['GET'])
+def changes():
+    # Inserts, updates and deletes of records, appointments and prescriptions after the
+    # Last-Event-ID header or `since` (default: now). Optional tables=appointments,prescriptions and
+    # patient=<username>. EventSource clients (Accept: text/event-stream) get a stream of
+    # "changes" events; anything else gets one JSON batch, optionally long-polling up to wait seconds.
+    # A "reset" means the client is too far behind for deltas and should reload.
+    names = {t.lower(): t for t in CHANGE_TABLES}
+    requested = [t for t in request.args.get('tables', '').split(',') if t]
+    unknown = [t for t in requested if t not in names]
+    if unknown:
+        return jsonify({"error": f"Unknown tables: {', '.join(unknown)}"}), 400
+    tables = [names[t] for t in requested] or CHANGE_TABLES
+    patient = request.args.get('patient')
+    # A reconnecting EventSource sends Last-Event-ID, which is newer than the since= it was opened with
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    if since is None:
+        since = latest_change_id()
+
+    if request.accept_mimetypes.best != 'text/event-stream':
+        try:
+            wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_CHANGES_WAIT)
+            if wait:
+                change_feed.wait(since, wait)
+            last, deltas, reset = read_changes(since, tables, patient)
+            return jsonify({"last_id": last, "reset": reset, "changes": deltas})
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    def stream(since):
+        yield f"retry: 2000\n\n"
+        deadline = time.monotonic() + CHANGES_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            latest = change_feed.wait(since, min(CHANGES_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+            if latest is None or latest == since:
+                yield ": keepalive\n\n"
+                continue
+            last, deltas, reset = read_changes(since, tables, patient)
+            if reset:
+                yield sse('reset', {"last_id": last}, last)
+            elif deltas:
+                yield sse('changes', deltas, last)
+            since = last
+
+    return Response(stream_with_context(stream(since)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Chat intents live in chat_intents.json and are recompiled when that file changes (see intent_matcher.py)
+intents = IntentMatcher()
+
 @app.route('/chat', methods=['POST'])
 def chat():
-    user_msg = request.json.get("message", "").lower()
-    
-    # Simple keyword-based bot
-    response = "I am an AI assistant here to help you understand your heart health. Feel free to ask me about diet, exercise, stress, or your recent vitals."
-    
-    if "stress" in user_msg or "anxiet" in user_msg or "worry" in user_msg:
-        response = "Chronic stress is bad for the heart. Try deep breathing, meditation, or hobbies you enjoy. If it feels overwhelming, talk to a professional."
-    elif "diet" in user_msg or "eat" in user_msg or "food" in user_msg or "meal" in user_msg:
-        response = "A heart-healthy diet is rich in fruits, vegetables, whole grains, and lean proteins. Try to limit saturated fats, sodium (<1.5g/day), and added sugars. Focus on leafy greens, berries, and omega-3 rich fish."
-    elif "exercise" in user_msg or "workout" in user_msg or "run" in user_msg or "fitness" in user_msg:
-        response = "Regular physical activity strengthens your heart muscle. Aim for at least 150 minutes of moderate aerobic exercise, like brisk walking, every week. Mix in some strength training too!"
-    elif "blood pressure" in user_msg or "bp" in user_msg or "hypertension" in user_msg:
-        response = "Normal blood pressure is generally around 120/80 mmHg. High blood pressure forces your heart to work harder. Keeping active, lowering salt intake, and managing stress helps."
-    elif "cholesterol" in user_msg:
-        response = "There are two main types: LDL (bad) and HDL (good). High LDL builds up in arteries. Eating soluble fiber like oats and beans can help lower LDL."
-    elif "sleep" in user_msg or "insomnia" in user_msg or "tired" in user_msg:
-        response = "Poor sleep is linked to high blood pressure and heart disease. Adults should aim for 7-9 hours of quality sleep per night. Try a consistent bedtime routine!"
-    elif "smoking" in user_msg or "smoke" in user_msg or "tobacco" in user_msg:
-        response = "Smoking is a major risk factor for heart disease. Quitting is one of the best things you can do for your cardiovascular health. There are many programs available to help!"
-    elif "alcohol" in user_msg or "drink" in user_msg:
-        response = "Drinking too much alcohol can raise your blood pressure and add extra calories, which may cause weight gain. If you drink, moderation is key!"
-    elif "weight" in user_msg or "obesity" in user_msg or "fat" in user_msg:
-        response = "Maintaining a healthy weight limits the strain on your heart and circulation. A balanced diet and regular exercise are the best ways to achieve this."
-    elif "sugar" in user_msg or "diabetes" in user_msg:
-        response = "High blood sugar can damage blood vessels and the nerves that control your heart. Managing carbohydrate intake and staying active is crucial."
-    elif "symptom" in user_msg or "pain" in user_msg or "chest" in user_msg:
-        response = "If you are experiencing severe chest pain, shortness of breath, or dizziness, please seek emergency medical attention immediately. I cannot provide medical diagnoses."
-    elif "heart attack" in user_msg:
-        response = "Symptoms of a heart attack can include chest pain, shortness of breath, cold sweat, or pain spreading to the arm or jaw. Call emergency services right away if you suspect this."
-    elif "water" in user_msg or "hydration" in user_msg:
-        response = "Staying hydrated makes it easier for your heart to pump blood. Aim to drink water consistently throughout the day, especially when exercising."
-    elif "hello" in user_msg or "hi" in user_msg or "hey" in user_msg:
-        response = "Hello there! I'm here to answer any questions you have about your cardiovascular health, diet, fitness, or stress."
-        
+    user_msg = request.json.get("message", "")
+    intent, response = intents.match(user_msg)
     return jsonify({"reply": response})
 
 if __name__ == '__main__':
+    # Ensure DB is initialized (serve.py does this once before forking its workers)
+    init_db()
+    # debug=True runs this module twice: a reloader process that only watches files, and a child
+    # (WERKZEUG_RUN_MAIN=true) that serves requests and is the only one that runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_worker()
     app.run(debug=True, port=5000)
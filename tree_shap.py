@@ -0,0 +1,162 @@
+import math
+import numpy as np
+
+
+# Per-leaf lookup tables are used while they hold at most this many floats (64 MB); deeper forests
+# are explained by running the path computation for every row instead
+MAX_TABLE_SIZE = 8_000_000
+
+
+def _path_contributions(o, z, weights, slot_value):
+    # TreeSHAP's extend/unwind for many paths at once. o, z: (rows, leaves, depth) path-condition indicators
+    # and zero fractions; returns the contribution of every path slot. The weight of slot i comes from
+    # prod_j (o_j t + z_j) with i's factor divided back out, weighted by subset size.
+    depth = o.shape[-1]
+    poly = np.zeros(o.shape[:-1] + (depth + 1,))
+    poly[..., 0] = 1.0
+    for j in range(depth):
+        shifted = poly[..., :-1] * o[..., j:j + 1]
+        poly *= z[..., j:j + 1]
+        poly[..., 1:] += shifted
+
+    # Division runs top-down when o_i = 1 (stable for small z) and is a plain scale when o_i = 0
+    inv_z = 1.0 / z
+    weighted = np.zeros(o.shape)
+    unwound = np.zeros(o.shape)
+    for k in range(depth - 1, -1, -1):
+        unwound = np.where(o > 0, poly[..., k + 1:k + 2] - z * unwound, poly[..., k:k + 1] * inv_z)
+        weighted += unwound * weights[..., k:k + 1]
+    return weighted * (o - z) * slot_value
+
+
+class ForestExplainer:
+    # Exact path-dependent TreeSHAP values for a fitted RandomForestClassifier, vectorized over rows and leaves.
+    # Everything that does not depend on the input row is computed once from the trees: for every leaf,
+    # the distinct features on its path, the interval (lo, hi] a row's value must fall in to follow the
+    # path, the fraction of training samples that went the same way (z, merged over repeated splits on a
+    # feature) and the Shapley weights for the path length. A leaf's contributions then only depend on
+    # which of its d path conditions a row satisfies, so they are tabulated for all 2^d patterns and
+    # explaining a row is one comparison and one table lookup per leaf.
+    # Contributions are in probability units of classes_[class_index] and sum, with expected_value,
+    # to the forest's predict_proba for that class.
+
+    def __init__(self, feature, lo, hi, zero_fraction, weights, slot_value, expected_value, classes, n_features,
+                 max_table_size=MAX_TABLE_SIZE):
+        self.feature = feature # (leaves, depth) feature index of each path slot
+        self.lo = lo
+        self.hi = hi
+        self.zero_fraction = zero_fraction
+        self.weights = weights # (leaves, depth) k!(d-k-1)!/d! for paths with d distinct features
+        self.slot_value = slot_value # leaf value / number of trees in used slots, 0 in padding
+        self.expected_value = float(expected_value)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features)
+        self.table = None
+        self.table_offset = None
+        self._build_tables(max_table_size)
+
+    def _build_tables(self, max_table_size):
+        # table[table_offset[l] + pattern] holds leaf l's slot contributions when the conditions set in
+        # the bit pattern hold
+        n_leaves, depth = self.feature.shape
+        path_length = (self.weights > 0).sum(axis=1)
+        sizes = 1 << path_length
+        if sizes.sum() * depth > max_table_size:
+            return
+        self.table_offset = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self.table = np.zeros((sizes.sum(), depth))
+        for d in np.unique(path_length):
+            leaves = np.flatnonzero(path_length == d)
+            patterns = np.arange(1 << d)
+            o = np.zeros((len(patterns), 1, depth))
+            o[:, 0, :d] = (patterns[:, np.newaxis] >> np.arange(d)) & 1
+            for start in range(0, len(leaves), 256):
+                chunk = leaves[start:start + 256]
+                contributions = _path_contributions(np.broadcast_to(o, (len(patterns), len(chunk), depth)),
+                                                    self.zero_fraction[chunk], self.weights[chunk], self.slot_value[chunk])
+                rows = self.table_offset[chunk][np.newaxis, :] + patterns[:, np.newaxis]
+                self.table[rows] = contributions
+
+    @classmethod
+    def from_sklearn(cls, model, class_index=1):
+        if not hasattr(model, 'estimators_'):
+            raise TypeError(f"Cannot explain {type(model).__name__}: not a fitted tree ensemble")
+
+        paths = [] # (features, lo, hi, z, value) per leaf
+        expected_value = 0.0
+        n_trees = len(model.estimators_)
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            cover = tree.weighted_n_node_samples
+            # Leaf probabilities normalised the same way as flat_forest.FlatForest
+            proba = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = proba.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            value = proba[:, class_index] / normalizer
+
+            stack = [(0, {})] # node, {feature: [lo, hi, z]}
+            while stack:
+                node, conditions = stack.pop()
+                left, right = tree.children_left[node], tree.children_right[node]
+                if left == -1:
+                    features = sorted(conditions)
+                    paths.append((features, [conditions[f][0] for f in features], [conditions[f][1] for f in features],
+                                  [conditions[f][2] for f in features], value[node] / n_trees))
+                    expected_value += value[node] * cover[node] / cover[0] / n_trees
+                    continue
+                f, threshold = int(tree.feature[node]), float(tree.threshold[node])
+                lo, hi, z = conditions.get(f, (-np.inf, np.inf, 1.0))
+                stack.append((left, {**conditions, f: (lo, min(hi, threshold), z * cover[left] / cover[node])}))
+                stack.append((right, {**conditions, f: (max(lo, threshold), hi, z * cover[right] / cover[node])}))
+
+        depth = max(1, max(len(p[0]) for p in paths))
+        n_leaves = len(paths)
+        # Unused slots never match (o = 0) and have z = 1, so their factor in the product is 1
+        feature = np.zeros((n_leaves, depth), dtype=np.intp)
+        lo = np.full((n_leaves, depth), np.inf)
+        hi = np.full((n_leaves, depth), np.inf)
+        zero_fraction = np.ones((n_leaves, depth))
+        weights = np.zeros((n_leaves, depth))
+        slot_value = np.zeros((n_leaves, depth))
+        for i, (features, lows, highs, zs, v) in enumerate(paths):
+            d = len(features)
+            feature[i, :d] = features
+            lo[i, :d] = lows
+            hi[i, :d] = highs
+            zero_fraction[i, :d] = zs
+            weights[i, :d] = [math.factorial(k) * math.factorial(d - k - 1) / math.factorial(d) for k in range(d)]
+            slot_value[i, :d] = v
+
+        return cls(feature, lo, hi, zero_fraction, weights, slot_value, expected_value,
+                   np.asarray(model.classes_), model.n_features_in_)
+
+    def shap_values(self, X, chunk_rows=None):
+        # (rows, features) contributions; rows are processed in chunks to bound memory
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        if chunk_rows is None:
+            # About 1M floats per intermediate array
+            chunk_rows = max(1, 1_000_000 // (self.feature.size * (1 if self.table is not None else self.feature.shape[1] + 1)))
+        out = np.empty(X.shape, dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            out[start:start + chunk_rows] = self._shap_chunk(X[start:start + chunk_rows])
+        return out
+
+    def _shap_chunk(self, X):
+        n_rows = X.shape[0]
+        # o[r, l, j]: row r satisfies every condition the path to leaf l puts on its j-th feature
+        values = X[:, self.feature].astype(np.float64)
+        o = (values > self.lo) & (values <= self.hi)
+        if self.table is not None:
+            pattern = (o << np.arange(self.feature.shape[1])).sum(axis=2)
+            contributions = self.table[self.table_offset + pattern]
+        else:
+            contributions = _path_contributions(o.astype(np.float64), self.zero_fraction[np.newaxis],
+                                                self.weights[np.newaxis], self.slot_value[np.newaxis])
+        # Sum the (leaf, slot) contributions into their features
+        index = np.arange(n_rows)[:, np.newaxis] * self.n_features_in_ + self.feature.reshape(1, -1)
+        return np.bincount(index.ravel(), weights=contributions.ravel(),
+                           minlength=n_rows * self.n_features_in_).reshape(n_rows, self.n_features_in_)
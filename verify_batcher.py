@@ -0,0 +1,134 @@
+import csv
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Scratch database, so importing server does not touch database.db
+os.environ.setdefault('CARDIO_DB', os.path.join(tempfile.mkdtemp(), 'verify_batcher.db'))
+
+from batcher import MicroBatcher
+
+# The micro-batcher must hand every request thread the result of its own row, whatever batch it
+# ended up in and however the threads interleave
+
+def run_threads(n, target):
+    errors = []
+
+    def wrapped(i):
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(f"thread {i}: {e}")
+
+    threads = [threading.Thread(target=wrapped, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+def test_batcher():
+    print("Starting Micro-Batcher Verification...")
+
+    # 1. Results routed back to the right thread under concurrency
+    def slow_double(rows):
+        time.sleep(random.uniform(0, 0.002))
+        return [(row[0], row[1] * 2) for row in rows]
+
+    batcher = MicroBatcher(slow_double, max_batch_size=16, max_wait_ms=2)
+
+    def check(i):
+        for j in range(50):
+            row = (i, i * 1000 + j)
+            result = batcher.predict(row, timeout=5)
+            if result != (i, row[1] * 2):
+                raise AssertionError(f"got {result} for {row}")
+
+    errors = run_threads(32, check)
+    if errors:
+        print(f"FAILED: wrong results: {errors[:3]}")
+        exit(1)
+    stats = batcher.stats()
+    if stats["rows"] != 32 * 50:
+        print(f"FAILED: {stats['rows']} rows scored, expected {32 * 50}")
+        exit(1)
+    if stats["batches"] >= stats["rows"]:
+        print("FAILED: no two requests were ever batched together")
+        exit(1)
+    print(f"[PASS] {stats['rows']} concurrent rows routed correctly in {stats['batches']} batches (avg {stats['avg_batch_size']:.1f})")
+
+    # 2. Batch size limit respected
+    if max(int(size) for size in stats["batch_size_counts"]) > 16:
+        print(f"FAILED: batch larger than max_batch_size: {stats['batch_size_counts']}")
+        exit(1)
+    print("[PASS] no batch exceeded max_batch_size")
+    batcher.stop()
+
+    # 3. A failing batch fails only its own requests, and the batcher keeps serving
+    def fail_on_negative(rows):
+        if any(row < 0 for row in rows):
+            raise ValueError("negative row")
+        return [row + 1 for row in rows]
+
+    batcher = MicroBatcher(fail_on_negative, max_batch_size=4, max_wait_ms=1)
+    try:
+        batcher.predict(-1, timeout=5)
+        print("FAILED: score_fn error was not raised to the caller")
+        exit(1)
+    except ValueError:
+        pass
+    if batcher.predict(41, timeout=5) != 42:
+        print("FAILED: batcher stopped working after a failed batch")
+        exit(1)
+    print("[PASS] score_fn errors reach the callers of that batch only")
+
+    # 4. Submitting after stop() is refused instead of hanging
+    batcher.stop()
+    try:
+        batcher.submit(1)
+        print("FAILED: submit() accepted a row after stop()")
+        exit(1)
+    except RuntimeError:
+        pass
+    print("[PASS] stopped batcher refuses new rows")
+
+    # 5. With the real model: batched scores equal unbatched ones
+    import server
+    server.init_db()
+    model = server.registry.current()
+    if not model:
+        print(f"FAILED: model not loaded: {server.registry.last_error}")
+        exit(1)
+    with open('ML/heart.csv') as f:
+        reader = csv.DictReader(f)
+        rows = [[float(r[name]) for name in server.FEATURES] for r, _ in zip(reader, range(200))]
+    batcher = MicroBatcher(server.score_batched_rows, max_batch_size=32, max_wait_ms=2)
+    results = [None] * len(rows)
+
+    def score(i):
+        for k in range(i, len(rows), 20):
+            results[k] = batcher.predict(rows[k], timeout=10)
+
+    errors = run_threads(20, score)
+    batcher.stop()
+    if errors:
+        print(f"FAILED: {errors[:3]}")
+        exit(1)
+    predictions, risk_scores = server.score_rows(rows, model)
+    expected = [(p, r, model.version) for p, r in zip(predictions, risk_scores)]
+    if results != expected:
+        mismatched = sum(a != b for a, b in zip(results, expected))
+        print(f"FAILED: {mismatched} batched results differ from direct scoring")
+        exit(1)
+    print(f"[PASS] {len(rows)} model predictions through the batcher match direct scoring")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_batcher()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Scratch database, so the test data does not end up in database.db
+SCRATCH = tempfile.mkdtemp()
+os.environ.setdefault('CARDIO_DB', os.path.join(SCRATCH, 'verify_change_feed.db'))
+os.environ.setdefault('CARDIO_DATA_DIR', SCRATCH)
+
+import server
+from change_feed import MAX_CHANGES, latest_change_id
+from database import execute, transaction, INSERT_RECORD, record_values
+from records_io import import_records
+
+# /changes: a client polling or streaming from its last id gets exactly the writes made since,
+# collapsed to the current rows, filtered by table and patient, or a reset when deltas cannot work
+
+server.app.testing = True
+client = server.app.test_client()
+
+def add_record(patient='ann', score=60):
+    data = {"patientUsername": patient, "p_name": patient.title(), "age": 50, "sex": 1}
+    with transaction() as c:
+        return c.execute(INSERT_RECORD, record_values(data, int(score > 50), score, "2026-04-01")).lastrowid
+
+def changes(**params):
+    resp = client.get('/changes', query_string=params)
+    if resp.status_code != 200:
+        print(f"FAILED: GET /changes {params} returned {resp.status_code} - {resp.data}")
+        exit(1)
+    return resp.json
+
+def test_change_feed():
+    print("Starting Change Feed Verification...")
+    server.init_db()
+
+    # 1. Inserts arrive as upserts carrying the row
+    since = latest_change_id()
+    first = add_record('ann')
+    second = add_record('bob')
+    batch = changes(since=since)
+    got = [(c["table"], c["op"], c["row_id"], c["row"]["patient_username"]) for c in batch["changes"]]
+    if batch["reset"] or got != [("records", "upsert", first, "ann"), ("records", "upsert", second, "bob")]:
+        print(f"FAILED: expected two record upserts, got {batch}")
+        exit(1)
+    if batch["last_id"] != latest_change_id() or changes(since=batch["last_id"])["changes"]:
+        print("FAILED: polling from last_id returned the same changes again")
+        exit(1)
+    print("[PASS] new records are delivered once, with their rows")
+
+    # 2. Several writes to one row collapse into one delta with the current row; deletes carry no row
+    since = latest_change_id()
+    client.post('/record_outcome', json={"id": first, "outcome": 1})
+    client.post('/record_outcome', json={"id": first, "outcome": 0})
+    execute("DELETE FROM Records WHERE id = ?", (second,))
+    got = changes(since=since)["changes"]
+    if len(got) != 2 or got[0]["row_id"] != first or got[0]["row"]["outcome"] != 0 or \
+            got[1] != {"id": got[1]["id"], "table": "records", "op": "delete", "row_id": second, "row": None}:
+        print(f"FAILED: expected one collapsed upsert and one delete, got {got}")
+        exit(1)
+    print("[PASS] repeated updates collapse to the current row, deletes arrive as deletes")
+
+    # 3. Table and patient filters
+    since = latest_change_id()
+    add_record('ann')
+    add_record('bob')
+    client.post('/add_prescription', json={"patientUsername": "ann", "medication": "Statin", "dosage": "10mg", "frequency": "daily"})
+    client.post('/schedule_appointment', json={"patientUsername": "bob", "patientName": "Bob", "date": "2026-05-01",
+                                               "time": "10:00", "reason": "Checkup"})
+    only_ann = changes(since=since, patient='ann')["changes"]
+    only_prescriptions = changes(since=since, tables='prescriptions')["changes"]
+    if sorted(c["table"] for c in only_ann) != ["prescriptions", "records"] or \
+            any(c["row"]["patient_username"] != 'ann' for c in only_ann):
+        print(f"FAILED: patient=ann returned {only_ann}")
+        exit(1)
+    if [c["table"] for c in only_prescriptions] != ["prescriptions"]:
+        print(f"FAILED: tables=prescriptions returned {only_prescriptions}")
+        exit(1)
+    if client.get('/changes', query_string={"tables": "users"}).status_code != 400:
+        print("FAILED: unknown table was not rejected")
+        exit(1)
+    print("[PASS] patient and table filters only return matching changes")
+
+    # 4. Long polling returns as soon as a write happens
+    since = latest_change_id()
+    threading.Timer(0.3, add_record, args=('ann',)).start()
+    started = time.monotonic()
+    got = changes(since=since, wait=10)["changes"]
+    elapsed = time.monotonic() - started
+    if len(got) != 1 or elapsed > 3:
+        print(f"FAILED: long poll returned {got} after {elapsed:.2f}s")
+        exit(1)
+    print(f"[PASS] long poll returned the record written 0.3s into it after {elapsed:.2f}s")
+
+    # 5. Resets: bulk imports, too many changes, and positions the log no longer covers
+    since = latest_change_id()
+    import_records([{"patient_username": "bulk", "age": 40, "prediction": 0, "score": 20}] * 300)
+    if not changes(since=since, patient='ann')["reset"]:
+        print("FAILED: a bulk import did not reset a patient's feed")
+        exit(1)
+    since = latest_change_id()
+    for _ in range(MAX_CHANGES + 1):
+        add_record('carl')
+    if not changes(since=since)["reset"] or not changes(since=latest_change_id() + 100)["reset"]:
+        print("FAILED: a client too far behind (or ahead) was not told to reset")
+        exit(1)
+    print("[PASS] bulk imports, more than MAX_CHANGES changes and unknown positions reset the client")
+
+    # 6. Server-sent events, resuming from Last-Event-ID
+    server.CHANGES_STREAM_SECONDS = 1.0
+    since = latest_change_id()
+    new_id = add_record('dee')
+    resp = client.get('/changes', query_string={"since": since}, headers={"Accept": "text/event-stream"})
+    events = [e for e in resp.get_data(as_text=True).split("\n\n") if e.startswith("id:")]
+    if len(events) != 1 or "event: changes" not in events[0]:
+        print(f"FAILED: expected one changes event, got {events}")
+        exit(1)
+    lines = dict(line.split(": ", 1) for line in events[0].split("\n"))
+    deltas = json.loads(lines["data"])
+    if int(lines["id"]) != latest_change_id() or [d["row_id"] for d in deltas] != [new_id]:
+        print(f"FAILED: unexpected event {events[0]}")
+        exit(1)
+    resp = client.get('/changes', query_string={"since": since}, headers={"Accept": "text/event-stream", "Last-Event-ID": lines["id"]})
+    if "event:" in resp.get_data(as_text=True):
+        print("FAILED: reconnecting with Last-Event-ID replayed old changes")
+        exit(1)
+    print("[PASS] event stream delivers the change with its id, and Last-Event-ID resumes after it")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_change_feed()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
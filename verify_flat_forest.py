@@ -0,0 +1,90 @@
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from flat_forest import FlatForest
+
+# The model was fitted on a DataFrame; scoring plain arrays is intended here
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Parity check: the flattened evaluator must return exactly the same probabilities as sklearn
+
+def test_parity():
+    print("Starting Flat Forest Parity Check...")
+
+    model = joblib.load('ML/heart_model.pkl')
+    data = pd.read_csv('ML/heart.csv')
+    X = data.drop("target", axis=1).to_numpy(dtype=np.float64)
+
+    flat = FlatForest.from_sklearn(model)
+
+    # 1. Whole dataset in one matrix
+    expected = model.predict_proba(X)
+    actual = flat.predict_proba(X)
+    if not np.array_equal(expected, actual):
+        diff = np.abs(expected - actual).max()
+        print(f"FAILED: probabilities differ on heart.csv (max abs diff {diff})")
+        exit(1)
+    print(f"[PASS] predict_proba bit-identical on {len(X)} rows of heart.csv")
+
+    # 2. Single rows, the way predict_api calls it
+    for row in X[:50]:
+        if not np.array_equal(model.predict_proba(row.reshape(1, -1)), flat.predict_proba(row)):
+            print(f"FAILED: single-row probabilities differ for {row}")
+            exit(1)
+    print("[PASS] single-row predict_proba bit-identical")
+
+    # 3. Values sitting exactly on split thresholds and non-integer inputs
+    rng = np.random.default_rng(7)
+    noisy = X + rng.normal(0, 0.5, X.shape)
+    if not np.array_equal(model.predict_proba(noisy), flat.predict_proba(noisy)):
+        print("FAILED: probabilities differ on perturbed rows")
+        exit(1)
+    on_split = np.repeat(X[:1], len(flat.feature), axis=0)
+    on_split[np.arange(len(flat.feature)), flat.feature] = flat.threshold
+    if not np.array_equal(model.predict_proba(on_split), flat.predict_proba(on_split)):
+        print("FAILED: probabilities differ for values on split thresholds")
+        exit(1)
+    print("[PASS] perturbed and on-threshold rows bit-identical")
+
+    # 4. Non-finite inputs are refused rather than routed down the trees
+    for bad in (np.nan, np.inf, -np.inf, 1e39):
+        row = X[0].copy()
+        row[0] = bad
+        try:
+            flat.predict_proba(row)
+        except ValueError:
+            continue
+        print(f"FAILED: {bad} was scored instead of rejected")
+        exit(1)
+    import server
+    sample = dict(zip(server.FEATURES, X[0]))
+    server.extract_features(sample)
+    for bad in ("nan", "inf", "-Infinity"):
+        try:
+            server.extract_features({**sample, "age": bad})
+        except ValueError:
+            continue
+        print(f"FAILED: extract_features accepted age={bad}")
+        exit(1)
+    print("[PASS] NaN and infinite features rejected")
+
+    # 5. Export round trip
+    flat.save('ML/heart_model_flat_check.npz')
+    loaded = FlatForest.load('ML/heart_model_flat_check.npz')
+    if not np.array_equal(loaded.predict_proba(X), expected):
+        print("FAILED: saved/loaded evaluator differs")
+        exit(1)
+    if not np.array_equal(loaded.predict(X), model.predict(X)):
+        print("FAILED: predicted classes differ")
+        exit(1)
+    print("[PASS] export round trip")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_parity()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
@@ -0,0 +1,103 @@
+import gzip
+import os
+import tempfile
+
+# Scratch database, so the test data does not end up in database.db
+SCRATCH = tempfile.mkdtemp()
+os.environ.setdefault('CARDIO_DB', os.path.join(SCRATCH, 'verify_http_cache.db'))
+os.environ.setdefault('CARDIO_DATA_DIR', SCRATCH)
+
+import server
+from database import transaction, table_versions, INSERT_RECORD, record_values
+from records_io import import_records
+
+# Conditional GETs: list endpoints answer 304 while their tables are unchanged, and every kind of
+# write (single insert, update, bulk import) bumps the table version so the next GET is a 200
+
+server.app.testing = True
+client = server.app.test_client()
+
+def add_record(patient='cache_patient', score=60):
+    data = {"patientUsername": patient, "p_name": "Cache", "age": 50, "sex": 1}
+    with transaction() as c:
+        return c.execute(INSERT_RECORD, record_values(data, int(score > 50), score, "2026-03-01")).lastrowid
+
+def etag_of(url):
+    resp = client.get(url)
+    if resp.status_code != 200 or not resp.headers.get('ETag'):
+        print(f"FAILED: GET {url} returned {resp.status_code} without an ETag")
+        exit(1)
+    return resp.headers['ETag']
+
+def revalidate(url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+def test_http_cache():
+    print("Starting HTTP Cache Verification...")
+    server.init_db()
+    record_id = add_record()
+
+    # 1. Unchanged table: 304 with no body
+    etag = etag_of('/get_records')
+    resp = revalidate('/get_records', etag)
+    if resp.status_code != 304 or resp.data or resp.headers.get('Cache-Control') != 'no-cache':
+        print(f"FAILED: revalidation returned {resp.status_code} with {len(resp.data)} bytes")
+        exit(1)
+    print("[PASS] unchanged /get_records revalidates with an empty 304")
+
+    # 2. Each write bumps the Records version and invalidates the ETag
+    writes = [("insert", lambda: add_record()),
+              ("update", lambda: client.post('/record_outcome', json={"id": record_id, "outcome": 1})),
+              ("bulk import", lambda: import_records([{"patient_username": "bulk", "age": 40, "prediction": 0, "score": 20}] * 300))]
+    for name, write in writes:
+        version = table_versions(['Records'])['Records'][0]
+        write()
+        new_version = table_versions(['Records'])['Records'][0]
+        if new_version <= version:
+            print(f"FAILED: {name} did not bump the Records version ({version} -> {new_version})")
+            exit(1)
+        if revalidate('/get_records', etag).status_code != 200:
+            print(f"FAILED: stale ETag still answered 304 after {name}")
+            exit(1)
+        etag = etag_of('/get_records')
+        print(f"[PASS] {name} bumps the Records version ({version} -> {new_version}) and the old ETag gets a 200")
+
+    # 3. Writes to other tables leave the ETag alone; the query string is part of it
+    prescriptions_etag = etag_of('/get_prescriptions')
+    client.post('/add_prescription', json={"patientUsername": "cache_patient", "medication": "Aspirin", "dosage": "81mg", "frequency": "daily"})
+    if revalidate('/get_records', etag).status_code != 304:
+        print("FAILED: a Prescriptions write invalidated /get_records")
+        exit(1)
+    if revalidate('/get_prescriptions', prescriptions_etag).status_code != 200:
+        print("FAILED: a Prescriptions write did not invalidate /get_prescriptions")
+        exit(1)
+    if etag_of('/get_records?limit=5') == etag:
+        print("FAILED: different query strings share an ETag")
+        exit(1)
+    print("[PASS] ETags only change with their own tables and differ per query string")
+
+    # 4. /get_appointments?with_contact=1 also follows Records
+    plain = etag_of('/get_appointments')
+    with_contact = etag_of('/get_appointments?with_contact=1')
+    add_record()
+    if revalidate('/get_appointments', plain).status_code != 304 or \
+            revalidate('/get_appointments?with_contact=1', with_contact).status_code != 200:
+        print("FAILED: a Records write must invalidate only the with_contact appointment list")
+        exit(1)
+    print("[PASS] a new record invalidates /get_appointments?with_contact=1 but not the plain list")
+
+    # 5. Large JSON responses are compressed when the client accepts it
+    resp = client.get('/get_records', headers={"Accept-Encoding": "gzip"})
+    if resp.headers.get('Content-Encoding') != 'gzip' or gzip.decompress(resp.data) != client.get('/get_records').data:
+        print("FAILED: /get_records was not gzip-compressed correctly")
+        exit(1)
+    print("[PASS] /get_records is gzip-compressed when accepted")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_http_cache()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+# Scratch database and job queue, so nothing here touches database.db or instance/
+SCRATCH = tempfile.mkdtemp()
+os.environ.setdefault('CARDIO_DB', os.path.join(SCRATCH, 'verify_jobs.db'))
+os.environ.setdefault('CARDIO_DATA_DIR', SCRATCH)
+
+from jobs import JobQueue
+
+# Background jobs: failures are retried with exponential backoff until max_attempts, jobs of a
+# worker that died are taken over once their lease expires, and a batch whose "done" commit fails
+# is run again without saving its records twice
+
+def queue(name, **kwargs):
+    return JobQueue(path=os.path.join(SCRATCH, name), poll_interval=0.02, **kwargs)
+
+def test_jobs():
+    print("Starting Job Queue Verification...")
+
+    # 1. Retries back off 0.5s, then 1s, and the job succeeds on its third attempt
+    calls = []
+
+    def flaky(payload):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+        return payload["n"] * 2
+
+    q = queue('retry.db')
+    q.register('flaky', flaky)
+    job = q.wait(q.enqueue('flaky', {"n": 21}), timeout=10)
+    if job["status"] != 'done' or job["result"] != 42 or job["attempts"] != 3:
+        print(f"FAILED: flaky job ended as {job}")
+        exit(1)
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    if not (0.45 <= gaps[0] < 0.9 and 0.95 <= gaps[1] < 1.6):
+        print(f"FAILED: retry delays {gaps}, expected about 0.5s and 1s")
+        exit(1)
+    print(f"[PASS] failed job retried after {gaps[0]:.2f}s and {gaps[1]:.2f}s, then done")
+
+    # 2. A job that keeps failing stops at max_attempts with its error and without its payload
+    q.register('broken', lambda payload: 1 / 0)
+    job = q.wait(q.enqueue('broken', {"secret": "x"}, max_attempts=2), timeout=10)
+    with q._conn() as conn:
+        payload = conn.execute("SELECT payload FROM Jobs WHERE id = ?", (job["id"],)).fetchone()["payload"]
+    if job["status"] != 'failed' or job["attempts"] != 2 or "division by zero" not in (job["error"] or "") or payload != '{}':
+        print(f"FAILED: broken job ended as {job} with payload {payload}")
+        exit(1)
+    print("[PASS] job fails after max_attempts, keeps its error and drops its payload")
+
+    # 3. A job left running by a dead worker is run again once its lease expires
+    with q._conn() as conn:
+        now = time.time()
+        job_id = conn.execute(
+            "INSERT INTO Jobs (kind, payload, status, attempts, run_after, lease_until, created_at, updated_at) "
+            "VALUES ('flaky', '{\"n\": 5}', 'running', 1, ?, ?, ?, ?)", (now, now + 0.3, now, now)).lastrowid
+    if not q.pending():
+        print("FAILED: pending() missed a running job")
+        exit(1)
+    job = q.wait(job_id, timeout=5)
+    if job["status"] != 'done' or job["result"] != 10:
+        print(f"FAILED: abandoned job ended as {job}")
+        exit(1)
+    print("[PASS] job abandoned mid-run is taken over after its lease expires")
+
+    # 4. Batch saves: when marking the batch done fails, the re-run does not save its records twice
+    import server
+    from database import fetch_one, transaction
+    server.init_db()
+    with transaction() as c:
+        server.create_patient(c, 'jobs_patient', 'pw')
+
+    q = queue('persist.db', lease_seconds=0.3)
+    q.register('save_prediction', server.persist_predictions, batch=True)
+    finish = q._finish
+    failures = []
+
+    def failing_finish(job, result=None, error=None):
+        if not failures:
+            failures.append(job["id"])
+            raise sqlite3.OperationalError("disk I/O error")
+        return finish(job, result, error)
+
+    q._finish = failing_finish
+    q.start = lambda: None # enqueue everything first so the worker claims one batch
+    data = {"patientUsername": "jobs_patient", "p_name": "Jobs", "age": 50, "sex": 1, "cp": 1, "trestbps": 120, "chol": 200,
+            "fbs": 0, "restecg": 0, "thalach": 150, "exang": 0, "oldpeak": 1.0}
+    ids = [q.enqueue('save_prediction', {"data": data, "prediction": 1, "risk_score": 70, "date": "2026-02-01",
+                                         "new_patient": False, "key": uuid.uuid4().hex}) for _ in range(10)]
+    del q.start
+    q.start()
+    jobs = [q.wait(job_id, timeout=10) for job_id in ids]
+    if not failures or any(job["status"] != 'done' for job in jobs):
+        print(f"FAILED: batch did not recover: failures {failures}, statuses {[job['status'] for job in jobs]}")
+        exit(1)
+    if max(job["attempts"] for job in jobs) < 2:
+        print("FAILED: the batch was never run a second time")
+        exit(1)
+    saved = fetch_one("SELECT COUNT(*) AS n FROM Records WHERE patient_username = 'jobs_patient'")["n"]
+    if saved != len(ids):
+        print(f"FAILED: {saved} records saved for {len(ids)} jobs")
+        exit(1)
+    print(f"[PASS] batch re-run after a failed commit saved each of the {len(ids)} records once")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_jobs()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import time
+
+# Scratch database and model directory, so nothing here touches database.db or ML/models
+SCRATCH = tempfile.mkdtemp()
+os.environ.setdefault('CARDIO_DB', os.path.join(SCRATCH, 'verify_prediction_cache.db'))
+os.environ.setdefault('CARDIO_DATA_DIR', SCRATCH)
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+import server
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+
+# The prediction cache must never answer with a result computed by a previous model version
+
+server.app.testing = True
+client = server.app.test_client()
+
+PATIENT = {"age": "58", "sex": "1", "cp": "2", "trestbps": "145", "chol": "250", "fbs": "0",
+           "restecg": "1", "thalach": "130", "exang": "1", "oldpeak": "2.1"}
+
+def write_model(model_dir, version, flip_labels):
+    # Small forest on heart.csv; flip_labels trains on inverted targets, so its scores clearly differ
+    data = pd.read_csv('ML/heart.csv')
+    X = data[server.FEATURES].to_numpy(dtype=np.float64)
+    y = 1 - data["target"] if flip_labels else data["target"]
+    model = RandomForestClassifier(n_estimators=20, max_depth=4, random_state=0).fit(X, y)
+    joblib.dump(model, os.path.join(model_dir, f"heart_model_v{version}.pkl"))
+    return model
+
+def expected_score(model):
+    probs = model.predict_proba(np.asarray([[float(PATIENT[f]) for f in server.FEATURES]]))
+    return int(probs[0, 1] * 100)
+
+def test_prediction_cache():
+    print("Starting Prediction Cache Verification...")
+
+    # 1. Switching versions drops every entry of the old one
+    cache = PredictionCache(max_entries=10, ttl_seconds=60)
+    cache.put("v1", [58, 1, 2.0], (1, 80))
+    if cache.get("v1", ["58", "1", "2"]) != (1, 80):
+        print("FAILED: equal vitals in a different form missed the cache")
+        exit(1)
+    if cache.get("v2", [58, 1, 2.0]) is not None:
+        print("FAILED: v1 result served for model v2")
+        exit(1)
+    if cache.get("v1", [58, 1, 2.0]) is not None or cache.stats()["invalidations"] != 1:
+        print("FAILED: v1 entries survived the switch to v2")
+        exit(1)
+    print("[PASS] a new model version invalidates the cache")
+
+    # 2. Size bound and TTL
+    for i in range(25):
+        cache.put("v2", [i], (0, i))
+    if cache.stats()["size"] != 10 or cache.get("v2", [0]) is not None or cache.get("v2", [24]) != (0, 24):
+        print(f"FAILED: LRU bound not kept: {cache.stats()}")
+        exit(1)
+    short = PredictionCache(ttl_seconds=0.05)
+    short.put("v1", [1], (1, 99))
+    time.sleep(0.1)
+    if short.get("v1", [1]) is not None:
+        print("FAILED: expired entry was served")
+        exit(1)
+    print("[PASS] entries are bounded by max_entries and expire after the TTL")
+
+    # 3. End to end: /predict_api after a hot model swap answers with the new model
+    if not server.prediction_cache:
+        print("FAILED: prediction cache disabled (CARDIO_PREDICTION_CACHE=0?)")
+        exit(1)
+    server.init_db()
+    model_dir = os.path.join(SCRATCH, 'models')
+    os.makedirs(model_dir)
+    v1 = write_model(model_dir, 1, flip_labels=False)
+    server.registry = ModelRegistry(model_dir=model_dir, default_path=os.path.join(model_dir, 'none.pkl'),
+                                    warmup_runs=0, watch_interval=0, expected_features=server.FEATURES)
+    server.prediction_cache.clear()
+
+    before = server.prediction_cache.stats()
+    first = client.post('/predict_api', json=PATIENT).json
+    second = client.post('/predict_api', json=PATIENT).json
+    after = server.prediction_cache.stats()
+    if first != second or first["model_version"] != "v1" or first["risk_score"] != expected_score(v1):
+        print(f"FAILED: unexpected v1 answers {first} / {second}")
+        exit(1)
+    if after["hits"] - before["hits"] != 1:
+        print("FAILED: repeated request was not served from the cache")
+        exit(1)
+    print(f"[PASS] repeated request served from the cache (v1 risk score {first['risk_score']})")
+
+    v2 = write_model(model_dir, 2, flip_labels=True)
+    reload = client.post('/reload_model').json
+    if not reload["reloaded"] or reload["version"] != "v2":
+        print(f"FAILED: /reload_model did not pick up v2: {reload}")
+        exit(1)
+    third = client.post('/predict_api', json=PATIENT).json
+    if third["model_version"] != "v2" or third["risk_score"] != expected_score(v2):
+        print(f"FAILED: after the swap got {third}, expected v2 risk score {expected_score(v2)}")
+        exit(1)
+    stats = server.prediction_cache.stats()
+    if stats["model_version"] != "v2" or stats["invalidations"] <= after["invalidations"]:
+        print(f"FAILED: cache not invalidated by the swap: {stats}")
+        exit(1)
+    print(f"[PASS] after the swap to v2 the answer comes from v2 (risk score {third['risk_score']})")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_prediction_cache()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
@@ -0,0 +1,128 @@
+import os
+import random
+import tempfile
+
+# Scratch database, so the test data does not end up in database.db
+os.environ.setdefault('CARDIO_DB', os.path.join(tempfile.mkdtemp(), 'verify_records_api.db'))
+
+import server
+from database import transaction, INSERT_RECORD, record_values
+
+# /get_records: every page of a cursor walk must line up with the unpaginated result, for each
+# filter, and a cursor must keep its place while new records are added
+
+server.app.testing = True
+client = server.app.test_client()
+
+PATIENTS = ['ann', 'bob', 'cy', 'dee', 'eve']
+
+def add_records(n, rng):
+    added = []
+    with transaction() as c:
+        for _ in range(n):
+            data = {"patientUsername": rng.choice(PATIENTS), "p_name": "Test", "age": rng.randint(30, 80), "sex": rng.randint(0, 1)}
+            score = rng.randint(0, 100)
+            date = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            row_id = c.execute(INSERT_RECORD, record_values(data, int(score > 50), score, date)).lastrowid
+            added.append({"id": row_id, "patient": data["patientUsername"], "score": score, "date": date})
+    return added
+
+def walk(params, limit):
+    # All ids over every page of a cursor walk
+    ids = []
+    cursor = None
+    for _ in range(1000):
+        query = dict(params, limit=limit)
+        if cursor:
+            query["cursor"] = cursor
+        resp = client.get('/get_records', query_string=query)
+        if resp.status_code != 200:
+            print(f"FAILED: GET /get_records {query} returned {resp.status_code} - {resp.data}")
+            exit(1)
+        page = resp.json
+        if len(page) > limit:
+            print(f"FAILED: page of {len(page)} rows for limit {limit}")
+            exit(1)
+        ids += [r["id"] for r in page]
+        cursor = resp.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+    print("FAILED: cursor walk never ended")
+    exit(1)
+
+def matches(record, params):
+    if params.get('patient') and record["patient"] != params['patient']:
+        return False
+    if params.get('risk') and (record["score"] > 50) != (params['risk'] == 'high'):
+        return False
+    if params.get('date_from') and record["date"] < params['date_from']:
+        return False
+    if params.get('date_to') and record["date"] > params['date_to']:
+        return False
+    return True
+
+def test_records_api():
+    print("Starting /get_records Verification...")
+    server.init_db()
+    rng = random.Random(5)
+    records = add_records(600, rng)
+
+    # 1. Unpaginated list: everything, newest first
+    resp = client.get('/get_records')
+    all_ids = [r["id"] for r in resp.json]
+    if all_ids != sorted((r["id"] for r in records), reverse=True):
+        print("FAILED: unpaginated /get_records is not every record newest first")
+        exit(1)
+    if 'X-Next-Cursor' in resp.headers:
+        print("FAILED: X-Next-Cursor set without a limit")
+        exit(1)
+    print(f"[PASS] unpaginated list returns all {len(all_ids)} records newest first")
+
+    # 2. Cursor walk, with and without filters, matches the expected rows exactly
+    cases = [{}, {"patient": "bob"}, {"risk": "high"}, {"risk": "low"},
+             {"date_from": "2026-03-01", "date_to": "2026-06-30"},
+             {"patient": "eve", "risk": "high", "date_from": "2026-05-01"}]
+    for params in cases:
+        expected = sorted((r["id"] for r in records if matches(r, params)), reverse=True)
+        for limit in (1, 37, 500):
+            if limit == 1 and len(expected) > 200:
+                continue
+            ids = walk(params, limit)
+            if ids != expected:
+                print(f"FAILED: cursor walk {params} limit {limit}: {len(ids)} ids, expected {len(expected)}")
+                exit(1)
+        print(f"[PASS] cursor walk over {params or 'all records'} returns the {len(expected)} matching records once each")
+
+    # 3. A cursor keeps its place while new records arrive
+    resp = client.get('/get_records', query_string={"limit": 50})
+    first_page = [r["id"] for r in resp.json]
+    cursor = resp.headers['X-Next-Cursor']
+    new_ids = {r["id"] for r in add_records(20, rng)}
+    rest = []
+    while cursor:
+        resp = client.get('/get_records', query_string={"limit": 50, "cursor": cursor})
+        rest += [r["id"] for r in resp.json]
+        cursor = resp.headers.get('X-Next-Cursor')
+    if first_page + rest != all_ids or new_ids & set(rest):
+        print("FAILED: records added mid-walk shifted or leaked into later pages")
+        exit(1)
+    print("[PASS] records added during a walk do not shift its later pages")
+
+    # 4. Bad filters are refused and oversized pages are capped
+    if client.get('/get_records', query_string={"risk": "medium"}).status_code != 400:
+        print("FAILED: invalid risk filter was not rejected")
+        exit(1)
+    resp = client.get('/get_records', query_string={"limit": 100000})
+    if len(resp.json) != server.MAX_PAGE_SIZE or 'X-Next-Cursor' not in resp.headers:
+        print(f"FAILED: limit was not capped at {server.MAX_PAGE_SIZE}")
+        exit(1)
+    print(f"[PASS] invalid filters rejected, page size capped at {server.MAX_PAGE_SIZE}")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_records_api()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
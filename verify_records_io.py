@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+
+# Scratch databases: records are exported from one and imported into another
+SCRATCH = tempfile.mkdtemp()
+os.environ.setdefault('CARDIO_DB', os.path.join(SCRATCH, 'verify_records_io.db'))
+
+import database
+from database import connect, init_db, INSERT_RECORD, RECORD_FEATURES, record_values, rebuild_stats
+from records_io import export_csv, export_ndjson, import_records, iter_records, parse_rows
+
+# Export -> import must reproduce every record field for field, in both formats, and an import
+# must skip (and report) bad rows without losing the good ones around them
+
+def fresh_db(name):
+    path = os.path.join(SCRATCH, name)
+    database.DB_PATH = path
+    init_db()
+    return path
+
+def seed(path, n, rng):
+    rows = []
+    for i in range(n):
+        data = {"patientUsername": f"patient{rng.randint(1, 40)}", "p_name": f"Name, \"{i}\"", "age": rng.randint(30, 80),
+                "sex": rng.randint(0, 1), "mobile": f"+1555{rng.randint(1000000, 9999999)}" if rng.random() < 0.7 else None,
+                "outcome": rng.choice([0, 1, None])}
+        for f in RECORD_FEATURES:
+            data[f] = round(rng.uniform(0, 6), 1) if f == 'oldpeak' else rng.randint(0, 3)
+        score = rng.randint(0, 100)
+        rows.append(record_values(data, int(score > 50), score, f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"))
+    conn = connect(path)
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(INSERT_RECORD, rows)
+    conn.execute("COMMIT")
+    conn.close()
+
+def export(path, fmt):
+    rows = iter_records(path=path, chunk_size=128)
+    return "".join(export_csv(rows, chunk_size=128) if fmt == 'csv' else export_ndjson(rows))
+
+def without_ids(text, fmt):
+    # Parsed export rows with the id column dropped (imported rows get new ids)
+    rows = list(parse_rows(io.StringIO(text, newline=''), fmt))
+    for row in rows:
+        row.pop("id")
+    return rows
+
+def stats(path):
+    conn = connect(path)
+    try:
+        return [conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall() for table in ('StatsRisk', 'StatsScoreHistogram', 'StatsDaily')]
+    finally:
+        conn.close()
+
+def test_records_io():
+    print("Starting Records Import/Export Verification...")
+    rng = random.Random(11)
+    source = fresh_db('source.db')
+    seed(source, 700, rng)
+
+    # 1. Round trip through each format, in batches large enough for the bulk insert path
+    for fmt in ('csv', 'ndjson'):
+        text = export(source, fmt)
+        target = fresh_db(f'target_{fmt}.db')
+        summary = import_records(parse_rows(io.StringIO(text, newline=''), fmt), batch_size=300, path=target)
+        if summary["imported"] != 700 or summary["skipped"]:
+            print(f"FAILED: {fmt} import summary {summary}")
+            exit(1)
+        if without_ids(export(target, fmt), fmt) != without_ids(text, fmt):
+            print(f"FAILED: {fmt} round trip changed the records")
+            exit(1)
+        print(f"[PASS] {fmt} export -> import -> export reproduces all 700 records")
+
+    # 2. Trigger-maintained aggregates after a bulk import equal a full rebuild
+    before = stats(target)
+    conn = connect(target)
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_stats(conn)
+    conn.execute("COMMIT")
+    conn.close()
+    if stats(target) != before:
+        print("FAILED: stats after the bulk import differ from rebuild_stats")
+        exit(1)
+    print("[PASS] stats after a bulk import match a full rebuild")
+
+    # 3. Bad rows are skipped with their row number; the good rows around them are imported
+    good = [json.loads(line) for line in export(source, 'ndjson').splitlines()[:5]]
+    bad = [dict(good[0], patient_username=""), dict(good[0], age="abc"), dict(good[0], age=-4),
+           dict(good[0], age="nan"), dict(good[0], score="")]
+    lines = [json.dumps(good[0]), json.dumps(bad[0]), json.dumps(good[1]), json.dumps(bad[1]), "{not json",
+             json.dumps(good[2]), json.dumps(bad[2]), "[1, 2]", json.dumps(bad[3]), json.dumps(good[3]),
+             json.dumps(bad[4]), json.dumps(good[4])]
+    target = fresh_db('target_bad.db')
+    summary = import_records(parse_rows(io.StringIO("\n".join(lines)), 'ndjson'), batch_size=4, path=target)
+    if summary["imported"] != 5 or summary["skipped"] != 7 or len(summary["errors"]) != 7:
+        print(f"FAILED: bad-row import summary {summary}")
+        exit(1)
+    reported = sorted(int(error.split(":")[0].split()[-1]) for error in summary["errors"])
+    if reported != [2, 4, 5, 7, 8, 9, 11]:
+        print(f"FAILED: errors reported for rows {reported}, expected 2, 4, 5, 7, 8, 9, 11: {summary['errors']}")
+        exit(1)
+    print("[PASS] 7 bad rows skipped and reported by row number, 5 good rows imported")
+
+    # 4. Bad CSV rows likewise
+    rows = list(csv.DictReader(io.StringIO(export(source, 'csv'), newline='')))[:3]
+    rows[1]["age"] = "old"
+    text = io.StringIO(newline='')
+    writer = csv.DictWriter(text, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    target = fresh_db('target_bad_csv.db')
+    summary = import_records(parse_rows(io.StringIO(text.getvalue(), newline=''), 'csv'), path=target)
+    if summary["imported"] != 2 or summary["skipped"] != 1 or not summary["errors"][0].startswith("Row 2:"):
+        print(f"FAILED: CSV bad-row import summary {summary}")
+        exit(1)
+    print("[PASS] bad CSV row skipped, the others imported")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_records_io()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)
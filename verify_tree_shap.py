@@ -0,0 +1,108 @@
+import math
+import time
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from flat_forest import FlatForest
+from tree_shap import ForestExplainer
+
+# The model was fitted on a DataFrame; scoring plain arrays is intended here
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Correctness check for the vectorized TreeSHAP explainer: contributions must add up to the model's
+# probability and match Shapley values computed by brute force over every feature subset.
+
+def subset_values(model, x, masks):
+    # Path-dependent expectation E[f(x) | x_S] for every subset in masks (n_subsets, n_features), averaged over trees
+    total = np.zeros(len(masks))
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        cover = tree.weighted_n_node_samples
+        proba = tree.value[:, 0, :].astype(np.float64)
+        value = proba[:, 1] / proba.sum(axis=1)
+
+        def expect(node):
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == -1:
+                return np.full(len(masks), value[node])
+            f = tree.feature[node]
+            follow = left if np.float32(x[f]) <= tree.threshold[node] else right
+            unknown = (cover[left] * expect(left) + cover[right] * expect(right)) / cover[node]
+            return np.where(masks[:, f], expect(follow), unknown)
+
+        total += expect(0)
+    return total / len(model.estimators_)
+
+def brute_force_shap(model, x):
+    n = len(x)
+    masks = ((np.arange(2 ** n)[:, np.newaxis] >> np.arange(n)) & 1).astype(bool)
+    values = subset_values(model, x, masks)
+    sizes = masks.sum(axis=1)
+    phi = np.zeros(n)
+    for i in range(n):
+        without = ~masks[:, i]
+        weight = np.array([math.factorial(s) * math.factorial(n - s - 1) / math.factorial(n) for s in sizes[without]])
+        with_i = np.flatnonzero(without) | (1 << i)
+        phi[i] = np.sum(weight * (values[with_i] - values[without]))
+    return phi, values[0]
+
+def test_tree_shap():
+    print("Starting TreeSHAP Check...")
+
+    model = joblib.load('ML/heart_model.pkl')
+    data = pd.read_csv('ML/heart.csv')
+    X = data.drop("target", axis=1).to_numpy(dtype=np.float64)
+
+    explainer = ForestExplainer.from_sklearn(model)
+    proba = FlatForest.from_sklearn(model).predict_proba(X)[:, 1]
+
+    # 1. Local accuracy: base value + contributions = predicted probability
+    phi = explainer.shap_values(X)
+    gap = np.abs(explainer.expected_value + phi.sum(axis=1) - proba).max()
+    if gap > 1e-9:
+        print(f"FAILED: contributions do not add up to predict_proba (max abs diff {gap})")
+        exit(1)
+    print(f"[PASS] contributions add up to predict_proba on {len(X)} rows (max diff {gap:.1e})")
+
+    # 2. Exact Shapley values over all 2^n feature subsets
+    rng = np.random.default_rng(3)
+    for row in X[rng.choice(len(X), 5, replace=False)]:
+        expected_phi, base = brute_force_shap(model, row)
+        if abs(base - explainer.expected_value) > 1e-12 or np.abs(explainer.shap_values(row)[0] - expected_phi).max() > 1e-12:
+            print(f"FAILED: contributions differ from brute-force Shapley values for {row}")
+            exit(1)
+    print("[PASS] matches brute-force Shapley values")
+
+    # 3. Batches are split into chunks, and deep forests skip the lookup tables, without changing the result
+    if not np.array_equal(explainer.shap_values(X, chunk_rows=7), phi):
+        print("FAILED: chunked results differ")
+        exit(1)
+    direct = ForestExplainer(explainer.feature, explainer.lo, explainer.hi, explainer.zero_fraction, explainer.weights,
+                             explainer.slot_value, explainer.expected_value, explainer.classes_,
+                             explainer.n_features_in_, max_table_size=0)
+    if direct.table is not None or np.abs(direct.shap_values(X) - phi).max() > 1e-12:
+        print("FAILED: results without lookup tables differ")
+        exit(1)
+    print("[PASS] chunked batches identical, table-free evaluation matches")
+
+    # 4. Latency
+    explainer.shap_values(X[:1])
+    start = time.perf_counter()
+    for row in X[:200]:
+        explainer.shap_values(row)
+    single_ms = (time.perf_counter() - start) / 200 * 1000
+    start = time.perf_counter()
+    explainer.shap_values(X)
+    batch_ms = (time.perf_counter() - start) / len(X) * 1000
+    print(f"[INFO] {explainer.feature.shape[0]} leaves, path depth {explainer.feature.shape[1]}: "
+          f"{single_ms:.2f} ms per single row, {batch_ms:.3f} ms per row batched")
+
+    print("\nALL TESTS PASSED")
+
+if __name__ == "__main__":
+    try:
+        test_tree_shap()
+    except Exception as e:
+        print(f"Test crashed: {e}")
+        exit(1)